@@ -0,0 +1,300 @@
+"""
+Bulk extraction of a directory of statements.
+
+    python -m api.batch ./inbox [--output-dir ./data/output/batch]
+        [--ocr-workers 2] [--llm-concurrency 4] [--force]
+
+Every PDF, image and Excel file under the input directory is extracted to
+<output-dir>/<name>-<hash>.xlsx plus its normalised Parquet ledger. The
+work is split in two stages with their own limits:
+
+- reading, OCR and the local parsers (layout templates, the local Excel
+  parser, the word-position table rebuild) run on a process pool of
+  --ocr-workers, each worker loading the OCR model once;
+- statements the local parsers could not read are sent to the LLM from an
+  event loop in this process, at most --llm-concurrency statements at once
+  (each split into up to llm_max_concurrency concurrent chunk requests).
+
+So OCR of later files overlaps the LLM calls of earlier ones.
+
+manifest.json in the output directory records, per file content hash, the
+file's status, outputs and stage timings, and is rewritten after every
+file. A re-run skips files whose content was already extracted (renamed or
+copied files included); failed files are retried, and --force redoes all.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from api.ocr.llm_client import async_client_scope
+from api.reconciler.config_utils import load_config
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+MANIFEST_FILE = 'manifest.json'
+BATCH_DIR = './data/output/batch'
+
+DONE = "done"
+EMPTY = "empty"
+FAILED = "failed"
+# Statuses a re-run does not redo
+PROCESSED_STATES = (DONE, EMPTY)
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def find_statements(input_dir, exclude_dir=None):
+    """Statement files under input_dir (recursively, sorted), skipping exclude_dir and Office lock files"""
+    from api.pipeline import STATEMENT_EXTENSIONS
+    exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+    paths = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude_dir)
+        for name in sorted(files):
+            if name.lower().endswith(STATEMENT_EXTENSIONS) and not name.startswith("~$"):
+                paths.append(os.path.join(root, name))
+    return paths
+
+
+def read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}}
+
+
+def write_manifest(output_dir, manifest):
+    """Write the manifest (atomic replace, so an interrupted run leaves the previous one intact)"""
+    manifest["updated"] = time.time()
+    tmp_path = os.path.join(output_dir, MANIFEST_FILE + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_FILE))
+
+
+def is_processed(entry):
+    """Whether a manifest entry is finished and its outputs still exist"""
+    if entry is None or entry.get("status") not in PROCESSED_STATES:
+        return False
+    return all(os.path.exists(path) for path in (entry.get("outputs") or {}).values())
+
+
+# ----------------------------------------------------------------------
+# OCR stage: runs in the process pool
+# ----------------------------------------------------------------------
+def init_worker(warm_ocr):
+    """Process pool initializer: import the parsers and load the OCR model once per worker"""
+    import api.ocr.excel_parser  # noqa: F401
+    import api.ocr.image_parser  # noqa: F401
+    if warm_ocr and config.get("ocr_warm_up", True):
+        from api.ocr.model_registry import warm_up
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"OCR warm-up failed: {e}")
+
+
+def prepare_file(path):
+    """
+    Read one statement up to the LLM: {"parsed": parse or None, "text": text
+    for the LLM or None, "raw": the sheet for Excel files, "seconds",
+    "stages": {stage: seconds}}
+    """
+    from api.pipeline import EXCEL_EXTENSIONS
+    from api.ocr.utils import stage_timer
+    # A worker runs one file at a time, so its stage times are this file's
+    stage_timer.reset()
+    start = time.perf_counter()
+    extension = os.path.splitext(path)[1].lower()
+    raw = None
+    if extension in EXCEL_EXTENSIONS:
+        from api.ocr.excel_parser import prepare_sheet
+        raw, parsed, text = prepare_sheet(path)
+    else:
+        from api.ocr.image_parser import prepare_statement
+        with open(path, "rb") as f:
+            parsed, text = prepare_statement(f.read(), extension)
+    return {
+        "parsed": parsed,
+        "text": text,
+        "raw": raw,
+        "seconds": time.perf_counter() - start,
+        "stages": {stage: round(seconds, 3) for stage, (seconds, _) in stage_timer.snapshot().items()},
+    }
+
+
+# ----------------------------------------------------------------------
+# LLM and export stages: run on the event loop in this process
+# ----------------------------------------------------------------------
+async def _parse_with_llm(path, prepared):
+    from api.pipeline import EXCEL_EXTENSIONS
+    from api.ocr import excel_parser, image_parser
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        parsed = await excel_parser.parse_csv_text_async(prepared["text"])
+        await asyncio.to_thread(excel_parser.learn_layout, prepared["raw"], parsed)
+        return parsed
+
+    parsed = await image_parser.parse_text_async(prepared["text"])
+
+    def learn():
+        with open(path, "rb") as f:
+            image_parser.learn_layout(f.read(), extension, parsed)
+    await asyncio.to_thread(learn)
+    return parsed
+
+
+def _export(path, parsed, output_path):
+    """Validated Ledger exported to output_path; returns (transactions, outputs) or (0, {}) if empty"""
+    from api.pipeline import EXCEL_EXTENSIONS
+    from api.ocr import excel_parser, image_parser
+    from api.ocr.utils.export_excel import export_ledger
+    from api.ledger.normalised import ledger_path_for
+    if os.path.splitext(path)[1].lower() in EXCEL_EXTENSIONS:
+        ledger = excel_parser.ledger_from_parsed(parsed)
+    else:
+        ledger = image_parser.ledger_from_parsed(parsed)
+    if ledger is None:
+        return 0, {}
+    export_ledger(ledger, output_path)
+    return len(ledger.transactions), {"xlsx": output_path, "ledger": ledger_path_for(output_path)}
+
+
+async def process_file(path, digest, input_dir, output_dir, pool, llm_slots):
+    """Run one file through the stages; returns its manifest entry"""
+    loop = asyncio.get_running_loop()
+    entry = {"file": os.path.relpath(path, input_dir), "sha256": digest, "status": FAILED,
+             "transactions": 0, "llm": False, "outputs": {}, "timings": {}, "stages": {}, "error": None}
+    try:
+        prepared = await loop.run_in_executor(pool, prepare_file, path)
+        entry["timings"]["prepare"] = round(prepared["seconds"], 3)
+        entry["stages"] = prepared["stages"]
+
+        parsed = prepared["parsed"]
+        if parsed is None and prepared["text"] is not None:
+            async with llm_slots:
+                start = time.perf_counter()
+                parsed = await _parse_with_llm(path, prepared)
+                entry["timings"]["llm"] = round(time.perf_counter() - start, 3)
+            entry["llm"] = True
+
+        start = time.perf_counter()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output_path = os.path.join(output_dir, f"{stem}-{digest[:8]}.xlsx")
+        entry["transactions"], entry["outputs"] = await asyncio.to_thread(_export, path, parsed, output_path)
+        entry["timings"]["export"] = round(time.perf_counter() - start, 3)
+        entry["status"] = DONE if entry["outputs"] else EMPTY
+    except Exception as e:
+        logger.error(f"{entry['file']} failed: {e}")
+        entry["error"] = str(e)
+    entry["finished"] = time.time()
+    return entry
+
+
+async def _run(pending, input_dir, output_dir, manifest, ocr_workers, llm_concurrency):
+    from api.pipeline import EXCEL_EXTENSIONS
+    warm_ocr = any(not path.lower().endswith(EXCEL_EXTENSIONS) for path, _ in pending)
+    # spawn keeps torch/OpenMP state out of the workers
+    pool = ProcessPoolExecutor(max_workers=max(1, ocr_workers), initializer=init_worker, initargs=(warm_ocr,),
+                               mp_context=multiprocessing.get_context("spawn"))
+    llm_slots = asyncio.Semaphore(max(1, llm_concurrency))
+    try:
+        async with async_client_scope():
+            await _run_files(pending, input_dir, output_dir, manifest, pool, llm_slots)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def _run_files(pending, input_dir, output_dir, manifest, pool, llm_slots):
+    tasks = [asyncio.create_task(process_file(path, digest, input_dir, output_dir, pool, llm_slots))
+             for path, digest in pending]
+    for done, task in enumerate(asyncio.as_completed(tasks), 1):
+        entry = await task
+        manifest["files"][entry["sha256"]] = entry
+        write_manifest(output_dir, manifest)
+        seconds = sum(entry["timings"].values())
+        logger.info(f"[{done}/{len(pending)}] {entry['file']}: {entry['status']}, "
+                    f"{entry['transactions']} transactions, {seconds:.2f}s")
+
+
+def run_batch(input_dir, output_dir=None, ocr_workers=None, llm_concurrency=None, force=False):
+    """Extract every statement under input_dir that is not already in the manifest; returns the manifest"""
+    output_dir = output_dir or config.get("batch_output_dir", BATCH_DIR)
+    ocr_workers = ocr_workers or config.get("batch_ocr_workers", 2)
+    llm_concurrency = llm_concurrency or config.get("batch_llm_concurrency", 4)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = read_manifest(output_dir)
+    manifest["input_dir"] = os.path.abspath(input_dir)
+    pending = []
+    seen = {}
+    skipped = 0
+    for path in find_statements(input_dir, exclude_dir=output_dir):
+        digest = file_hash(path)
+        if digest in seen:
+            logger.info(f"Skipping {path}: same content as {seen[digest]}")
+            continue
+        seen[digest] = path
+        if not force and is_processed(manifest["files"].get(digest)):
+            skipped += 1
+            continue
+        pending.append((path, digest))
+    logger.info(f"{len(pending)} statements to extract, {skipped} already done")
+    if not pending:
+        return manifest
+
+    start = time.perf_counter()
+    asyncio.run(_run(pending, input_dir, output_dir, manifest, ocr_workers, llm_concurrency))
+    wall = time.perf_counter() - start
+    digests = {digest for _, digest in pending}
+    counts = {}
+    for digest in digests:
+        status = manifest["files"][digest]["status"]
+        counts[status] = counts.get(status, 0) + 1
+    logger.info(f"Extracted {len(pending)} statements in {wall:.1f}s ({60 * len(pending) / wall:.1f}/min): "
+                + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract a directory of bank statements")
+    parser.add_argument("input_dir")
+    parser.add_argument("--output-dir", default=config.get("batch_output_dir", BATCH_DIR))
+    parser.add_argument("--ocr-workers", type=int, default=config.get("batch_ocr_workers", 2),
+                        help="processes reading and OCR'ing statements")
+    parser.add_argument("--llm-concurrency", type=int, default=config.get("batch_llm_concurrency", 4),
+                        help="statements being parsed by the LLM at once")
+    parser.add_argument("--force", action="store_true", help="re-extract files already in the manifest")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        logger.error(f"Not a directory: {args.input_dir}")
+        return 1
+    manifest = run_batch(args.input_dir, args.output_dir, args.ocr_workers, args.llm_concurrency, args.force)
+    failed = [entry["file"] for entry in manifest["files"].values() if entry["status"] == FAILED]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
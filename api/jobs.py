@@ -0,0 +1,380 @@
+"""
+Local background job runner.
+
+Jobs run on a bounded worker pool (threads by default, processes for the
+headless service). Every job gets its own work directory under data/jobs
+holding its inputs, outputs and a status.json file, so concurrent jobs
+never overwrite each other's files and status can be polled from any
+process. Cancellation is cooperative: a CANCEL marker in the work directory
+is checked at each progress report, which extraction makes after every
+OCR'd page and parsed LLM chunk, and whenever streamed rows arrive.
+
+Work directories are deleted job_retention_hours (config, default 24; 0
+keeps them) after the job's last activity: its last status update or the
+last write to any of its files, such as a workbook saved back from the
+editor. The extracted workbooks, ledgers and reports in them expire with
+the directory, so download anything worth keeping.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from api.reconciler.config_utils import load_config
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = './data/jobs'
+STATUS_FILE = 'status.json'
+CANCEL_FILE = 'CANCEL'
+PARTIAL_ROWS_FILE = 'partial_rows.ndjson'
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Submitting a job sweeps expired work directories at most this often
+CLEANUP_INTERVAL = 600
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _write_status(work_dir, **fields):
+    """Merge fields into the job's status file (atomic replace)"""
+    status = read_status(work_dir) or {}
+    status.update(fields)
+    status["updated"] = time.time()
+    tmp_path = os.path.join(work_dir, STATUS_FILE + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(status, f, default=str)
+    os.replace(tmp_path, os.path.join(work_dir, STATUS_FILE))
+    return status
+
+
+def read_partial_rows(work_dir):
+    """Rows streamed so far by a running extraction (a live preview, not the final ledger), in chunk order"""
+    chunks = {}
+    try:
+        with open(os.path.join(work_dir, PARTIAL_ROWS_FILE), "r") as f:
+            for line in f:
+                # The last line may still be being written
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if entry.get("discard"):
+                    chunks.pop(entry["chunk"], None)
+                else:
+                    chunks.setdefault(entry["chunk"], []).append(entry["row"])
+    except FileNotFoundError:
+        pass
+    return [row for chunk in sorted(chunks) for row in chunks[chunk]]
+
+
+def read_status(work_dir):
+    try:
+        with open(os.path.join(work_dir, STATUS_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class JobContext:
+    """Handed to a task: its work directory, progress reporting and cancellation checks"""
+
+    def __init__(self, job_id, work_dir):
+        self.job_id = job_id
+        self.work_dir = work_dir
+        self._lock = threading.Lock()
+
+    def cancelled(self):
+        return os.path.exists(os.path.join(self.work_dir, CANCEL_FILE))
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def progress(self, stage, fraction, message=None):
+        """Report the current stage; raises JobCancelled if cancellation was requested"""
+        self.check_cancelled()
+        with self._lock:
+            fields = {"stage": stage, "progress": round(float(fraction), 3)}
+            if message is not None:
+                fields["message"] = message
+            _write_status(self.work_dir, **fields)
+
+    def stream_rows(self, rows, chunk=0):
+        """
+        Append streamed transaction rows of one chunk of the statement to the
+        job's live preview. None discards that chunk's rows so far (they came
+        from a response that was rejected and is being retried). Raises
+        JobCancelled if cancellation was requested, ending the LLM stream.
+        """
+        self.check_cancelled()
+        with self._lock:
+            with open(self.path(PARTIAL_ROWS_FILE), "a") as f:
+                if rows is None:
+                    f.write(json.dumps({"chunk": chunk, "discard": True}) + "\n")
+                for row in rows or []:
+                    f.write(json.dumps({"chunk": chunk, "row": row}, default=str) + "\n")
+
+    def path(self, *parts):
+        return os.path.join(self.work_dir, *parts)
+
+
+# ----------------------------------------------------------------------
+# Tasks. Each takes a JobContext plus JSON/bytes parameters and returns a
+# JSON-serialisable result dict.
+# ----------------------------------------------------------------------
+def extract_task(ctx, file_bytes, file_name):
+    from api.pipeline import extract_ledger, extraction_progress
+    from api.ocr.utils.export_excel import export_ledger
+    from api.ledger.normalised import ledger_path_for
+
+    ctx.progress("extract", 0.0)
+    ledger = extract_ledger(file_bytes, file_name, on_rows=ctx.stream_rows,
+                            progress=extraction_progress(ctx.progress, 0.0, 0.9))
+    if ledger is None:
+        raise ValueError(f"No transactions found in {file_name}")
+    ctx.progress("export", 0.9)
+    output_path = ctx.path(os.path.splitext(os.path.basename(file_name))[0] + '.xlsx')
+    export_ledger(ledger, output_path)
+    return {"xlsx": output_path, "ledger": ledger_path_for(output_path), "transactions": len(ledger)}
+
+
+def reconcile_task(ctx, file_bytes1, file_name1, file_bytes2, file_name2, output_formats=None):
+    from api.reconciler.main_processor import reconcile
+
+    ctx.progress("load", 0.0)
+    paths = []
+    for index, (file_bytes, file_name) in enumerate([(file_bytes1, file_name1), (file_bytes2, file_name2)], 1):
+        path = ctx.path(f"input{index}{os.path.splitext(file_name)[1] or '.xlsx'}")
+        with open(path, "wb") as f:
+            f.write(file_bytes)
+        paths.append(path)
+
+    ctx.progress("reconcile", 0.2)
+    outputs, result = reconcile(paths[0], paths[1], output_formats, output_dir=ctx.work_dir)
+    if result is None:
+        raise ValueError("Reconciliation failed: the ledgers could not be loaded")
+    result.save(ctx.path("match_result.npz"))
+    return {"outputs": outputs, "summary": result.summary(), "match_result": ctx.path("match_result.npz")}
+
+
+def pipeline_task(ctx, file_bytes1, file_name1, file_bytes2, file_name2, output_formats=None):
+    from api.pipeline import reconcile_statements
+
+    outputs, result, ledgers = reconcile_statements(
+        file_bytes1, file_name1, file_bytes2, file_name2,
+        output_formats=output_formats, output_dir=ctx.work_dir,
+        export_dir=ctx.work_dir, progress=ctx.progress
+    )
+    if result is None:
+        raise ValueError("Reconciliation failed")
+    result.save(ctx.path("match_result.npz"))
+    return {
+        "outputs": outputs,
+        "summary": result.summary(),
+        "exports": {key: value["export_path"] for key, value in ledgers.items()},
+        "match_result": ctx.path("match_result.npz"),
+    }
+
+
+TASKS = {
+    "extract": extract_task,
+    "reconcile": reconcile_task,
+    "pipeline": pipeline_task,
+}
+
+
+def run_job(task_name, job_id, work_dir, params):
+    """Worker entry point (top-level so process pools can pickle it)"""
+    ctx = JobContext(job_id, work_dir)
+    if ctx.cancelled():
+        _write_status(work_dir, state=CANCELLED)
+        return None
+    _write_status(work_dir, state=RUNNING, started=time.time())
+    try:
+        result = TASKS[task_name](ctx, **params)
+    except JobCancelled:
+        _write_status(work_dir, state=CANCELLED, finished=time.time())
+        logger.info(f"Job {job_id} cancelled")
+        return None
+    except Exception as e:
+        _write_status(work_dir, state=FAILED, error=str(e),
+                      traceback=traceback.format_exc(), finished=time.time())
+        logger.error(f"Job {job_id} failed: {e}")
+        return None
+    _write_status(work_dir, state=DONE, progress=1.0, result=result, finished=time.time())
+    return result
+
+
+def _last_activity(work_dir):
+    """Latest of the job's status update and its files' modification times"""
+    status = read_status(work_dir) or {}
+    times = [status.get("updated") or 0, os.path.getmtime(work_dir)]
+    for name in os.listdir(work_dir):
+        try:
+            times.append(os.path.getmtime(os.path.join(work_dir, name)))
+        except OSError:
+            pass
+    return max(times)
+
+
+def cleanup_jobs(jobs_dir=JOBS_DIR, max_age_hours=24, keep=()):
+    """
+    Delete the work directories (uploaded statements and outputs) of jobs
+    with no activity (status update or file write) for more than
+    max_age_hours, except the job ids in keep; max_age_hours 0 keeps all.
+    Jobs that never finished (the process running them died) expire the
+    same way. Returns the removed job ids.
+    """
+    if not max_age_hours or not os.path.isdir(jobs_dir):
+        return []
+    cutoff = time.time() - max_age_hours * 3600
+    removed = []
+    for job_id in os.listdir(jobs_dir):
+        work_dir = os.path.join(jobs_dir, job_id)
+        if job_id in keep or not os.path.isdir(work_dir):
+            continue
+        if _last_activity(work_dir) >= cutoff:
+            continue
+        shutil.rmtree(work_dir, ignore_errors=True)
+        removed.append(job_id)
+    if removed:
+        logger.info(f"Removed {len(removed)} expired job directories from {jobs_dir}")
+    return removed
+
+
+def _noop():
+    return os.getpid()
+
+
+class JobRunner:
+    """Submit tasks to a bounded worker pool and poll them by job id"""
+
+    def __init__(self, max_workers=None, executor="thread", jobs_dir=JOBS_DIR, initializer=None,
+                 retention_hours=None):
+        config = load_config()
+        if max_workers is None:
+            max_workers = config.get("job_workers", 2)
+        if retention_hours is None:
+            retention_hours = config.get("job_retention_hours", 24)
+        self.jobs_dir = jobs_dir
+        self.retention_hours = retention_hours
+        os.makedirs(jobs_dir, exist_ok=True)
+        if executor == "process":
+            # spawn keeps torch/OpenMP state out of the workers
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        elif executor == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job",
+                                                initializer=initializer)
+        else:
+            raise ValueError(f"Unknown executor: {executor}")
+        self._max_workers = max_workers
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self.cleanup()
+
+    def prestart(self):
+        """Start the pool's workers now so their initializer (e.g. model warm-up) runs before the first job"""
+        for _ in range(self._max_workers):
+            self._executor.submit(_noop)
+
+    def work_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def cleanup(self):
+        """Delete expired job directories (see cleanup_jobs), never those of jobs still in the pool"""
+        self._last_cleanup = time.time()
+        return cleanup_jobs(self.jobs_dir, self.retention_hours, keep=set(self.active_jobs()))
+
+    def submit(self, task_name, **params):
+        if task_name not in TASKS:
+            raise ValueError(f"Unknown task: {task_name}")
+        if time.time() - self._last_cleanup > CLEANUP_INTERVAL:
+            self.cleanup()
+        job_id = uuid.uuid4().hex
+        work_dir = self.work_dir(job_id)
+        os.makedirs(work_dir)
+        _write_status(work_dir, id=job_id, task=task_name, state=QUEUED, stage=None,
+                      progress=0.0, created=time.time())
+        future = self._executor.submit(run_job, task_name, job_id, work_dir, params)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return job_id
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def status(self, job_id):
+        """Status dict of a job, or None if the id is unknown"""
+        if not job_id or os.path.basename(job_id) != job_id:
+            return None
+        return read_status(self.work_dir(job_id))
+
+    def cancel(self, job_id):
+        """Cancel a queued job immediately, or ask a running one to stop at its next stage"""
+        status = self.status(job_id)
+        if status is None or status.get("state") in FINISHED_STATES:
+            return False
+        open(os.path.join(self.work_dir(job_id), CANCEL_FILE), "w").close()
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            _write_status(self.work_dir(job_id), state=CANCELLED, finished=time.time())
+        return True
+
+    def files(self, job_id):
+        """Output files in a job's work directory"""
+        work_dir = self.work_dir(job_id)
+        if not os.path.isdir(work_dir):
+            return []
+        return sorted(name for name in os.listdir(work_dir)
+                      if name not in (STATUS_FILE, CANCEL_FILE, PARTIAL_ROWS_FILE) and not name.endswith(".tmp")
+                      and not name.startswith("input"))
+
+    def partial_rows(self, job_id):
+        if self.status(job_id) is None:
+            return []
+        return read_partial_rows(self.work_dir(job_id))
+
+    def active_jobs(self):
+        with self._lock:
+            return list(self._futures)
+
+    def shutdown(self, wait=True):
+        """Stop the pool; jobs still queued are marked cancelled"""
+        with self._lock:
+            pending = list(self._futures.items())
+        for job_id, future in pending:
+            if future.cancel():
+                _write_status(self.work_dir(job_id), state=CANCELLED, finished=time.time())
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+
+
+def default_runner():
+    """Process-wide thread-backed runner shared by all Streamlit sessions"""
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner()
+        return _default_runner
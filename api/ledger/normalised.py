@@ -0,0 +1,152 @@
+"""
+Normalised ledger interchange format.
+
+A normalised ledger is a Parquet file with typed transaction columns
+(date, description, debit, credit, balance) and the statement metadata
+(account, ledger, opening and closing balance) stored in the Parquet
+schema metadata. The extractor writes it next to its Excel export and the
+reconciler reads it directly, so Excel is only a human-facing export.
+"""
+import os
+import json
+import math
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FORMAT_VERSION = 1
+METADATA_KEY = b"ledger_parser"
+LEDGER_EXTENSION = ".parquet"
+
+LEDGER_COLUMNS = ["date", "description", "debit", "credit", "balance"]
+REQUIRED_COLUMNS = ["date", "description", "debit", "credit"]
+
+LEDGER_SCHEMA = pa.schema([
+    ("date", pa.timestamp("ns")),
+    ("description", pa.string()),
+    ("debit", pa.float64()),
+    ("credit", pa.float64()),
+    ("balance", pa.float64()),
+])
+
+# Labels used by the metadata block of the Excel export
+METADATA_LABELS = {
+    "account": "account",
+    "ledger": "ledger",
+    "opening balance": "opening_balance",
+    "closing balance": "closing_balance",
+}
+
+
+class Ledger:
+    """Transactions of one statement plus its header metadata"""
+
+    def __init__(self, transactions, account=None, ledger=None,
+                 opening_balance=None, closing_balance=None):
+        self.transactions = normalise_transactions(transactions)
+        self.account = account
+        self.ledger = ledger
+        self.opening_balance = _to_float(opening_balance)
+        self.closing_balance = _to_float(closing_balance)
+
+    def metadata(self):
+        return {
+            "account": self.account,
+            "ledger": self.ledger,
+            "opening_balance": self.opening_balance,
+            "closing_balance": self.closing_balance,
+        }
+
+    def __len__(self):
+        return len(self.transactions)
+
+
+def _to_float(value):
+    if value is None:
+        return None
+    try:
+        value = float(str(value).replace(",", "")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def normalise_transactions(df):
+    """Coerce a transaction table to the canonical columns and dtypes"""
+    df = pd.DataFrame(df).copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing and not df.empty:
+        raise ValueError(f"Ledger is missing columns: {missing}")
+
+    out = pd.DataFrame(index=range(len(df)))
+    values = df.reset_index(drop=True)
+    out["date"] = pd.to_datetime(values["date"], errors="coerce") if "date" in values else pd.NaT
+    out["description"] = (values["description"].astype("string")
+                          if "description" in values else pd.Series(dtype="string"))
+    for col in ("debit", "credit"):
+        out[col] = pd.to_numeric(values[col], errors="coerce").fillna(0.0) if col in values else 0.0
+    out["balance"] = pd.to_numeric(values["balance"], errors="coerce") if "balance" in values else float("nan")
+    out["date"] = out["date"].astype("datetime64[ns]")
+    out[["debit", "credit", "balance"]] = out[["debit", "credit", "balance"]].astype("float64")
+    return out[LEDGER_COLUMNS]
+
+
+def ledger_path_for(output_path):
+    """Path of the normalised ledger that sits next to an Excel export"""
+    return os.path.splitext(output_path)[0] + LEDGER_EXTENSION
+
+
+def write_ledger(ledger, path):
+    table = pa.Table.from_pandas(ledger.transactions, schema=LEDGER_SCHEMA, preserve_index=False)
+    meta = dict(ledger.metadata(), format_version=FORMAT_VERSION)
+    table = table.replace_schema_metadata({METADATA_KEY: json.dumps(meta).encode("utf-8")})
+    pq.write_table(table, path)
+    return path
+
+
+def read_ledger(path):
+    """Read a normalised ledger; Excel exports are accepted as a fallback"""
+    if str(path).lower().endswith(LEDGER_EXTENSION):
+        table = pq.read_table(path)
+        raw = (table.schema.metadata or {}).get(METADATA_KEY)
+        meta = json.loads(raw) if raw else {}
+        return Ledger(
+            table.to_pandas(),
+            account=meta.get("account"),
+            ledger=meta.get("ledger"),
+            opening_balance=meta.get("opening_balance"),
+            closing_balance=meta.get("closing_balance"),
+        )
+    return read_excel_ledger(path)
+
+
+def read_excel_ledger(path):
+    """
+    Read an Excel export of a ledger. The header row is located by its
+    'date' cell rather than assumed, so both the extractor's layout and the
+    editor's re-saved layout are understood.
+    """
+    raw = pd.read_excel(path, sheet_name=0, header=None)
+    date_mask = raw[0].astype(str).str.strip().str.lower().eq("date")
+    if not date_mask.any():
+        raise ValueError(f"Could not detect 'date' header row in {path}")
+    header_idx = date_mask.idxmax()
+
+    meta = {}
+    for _, row in raw.iloc[:header_idx].iterrows():
+        label = str(row[0]).strip().rstrip(":").lower()
+        if label in METADATA_LABELS and len(row) > 1:
+            value = row[1]
+            meta[METADATA_LABELS[label]] = None if pd.isna(value) or value == "N/A" else value
+
+    table = raw.iloc[header_idx + 1:].reset_index(drop=True)
+    table.columns = [str(c).strip() for c in raw.iloc[header_idx]]
+    table = table.dropna(how="all")
+    return Ledger(
+        table,
+        account=meta.get("account"),
+        ledger=meta.get("ledger"),
+        opening_balance=meta.get("opening_balance"),
+        closing_balance=meta.get("closing_balance"),
+    )
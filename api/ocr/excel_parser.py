@@ -1,16 +1,24 @@
 import os
-from openai import OpenAI
+import asyncio
 from dotenv import load_dotenv
 import pandas as pd
-import json
 import numpy as np
 from api.ocr.utils.validate_and_fix import validate_and_fix
-from api.ocr.utils.export_excel import export_to_excel
-from datetime import datetime
+from api.ocr.utils.export_excel import export_ledger, output_path_for
+from api.ledger.normalised import Ledger
+from api.ocr.local_excel_parser import parse_excel_locally
+from api.ocr.layout_templates import extract_excel_with_template, learn_excel_template
+from api.ocr.utils.llm_schema import columnar_prompt
+from api.ocr.utils.llm_parse import parse_statement, parse_statement_async, for_chunk
+from api.ocr.utils.chunking import merge_parsed_chunks, split_csv_chunks, parse_chunks
+from api.ocr.utils.balance_chain import repair_chunks
+from api.ocr.llm_client import with_async_client
+from api.ocr.utils.stage_timer import timed
+from api.reconciler.config_utils import load_config
 
 load_dotenv()
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+config = load_config()
 
 def excel_to_csv_text(file_path):
     try:
@@ -20,10 +28,7 @@ def excel_to_csv_text(file_path):
         print(f"Failed to read Excel: {e}")
         return ""
 
-def parse_excel_with_openai(csv_text):
-    """Use OpenAI to parse Excel CSV text into structured JSON"""
-
-    system_prompt = """
+SYSTEM_PROMPT = """
 You are a bank statement parser. Extract structured financial data from the CSV below.
 
 Return a JSON object with:
@@ -40,41 +45,116 @@ Return a JSON object with:
             "balance": float (don't calculate)
         }
     Handle multi-line entries and currency symbols."""
-    
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": csv_text}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    return json.loads(response.choices[0].message.content)
-
-
-def process_excel_bank_statement(file_path):
-    csv_text = excel_to_csv_text(file_path)
-    if not csv_text:
-        return pd.DataFrame()
 
-    parsed = parse_excel_with_openai(csv_text)
+COLUMNAR_PROMPT = columnar_prompt("You are a bank statement parser. Extract structured financial data from the CSV below.")
 
+def parse_excel_with_openai(csv_text, on_rows=None):
+    """Use OpenAI to parse Excel CSV text into structured JSON"""
+    return parse_statement(csv_text, SYSTEM_PROMPT, COLUMNAR_PROMPT, "csv", on_rows)
+
+async def parse_excel_with_openai_async(csv_text, on_rows=None):
+    """Async variant of parse_excel_with_openai for concurrent chunks"""
+    return await parse_statement_async(csv_text, SYSTEM_PROMPT, COLUMNAR_PROMPT, "csv", on_rows)
+
+def _csv_chunks(csv_text):
+    rows_per_chunk = config.get("llm_rows_per_chunk", 150)
+    chunks = split_csv_chunks(csv_text, rows_per_chunk) if rows_per_chunk > 0 else [csv_text]
+    return chunks if len(chunks) > 1 else [csv_text]
+
+def _repair(parsed_chunks, chunks):
+    if not config.get("balance_repair_enabled", True):
+        return parsed_chunks
+    # Re-send only the row chunks whose balances do not chain
+    return repair_chunks(parsed_chunks, lambda i, hint: parse_excel_with_openai(chunks[i] + hint),
+                         config.get("balance_repair_tolerance", 0.01))
+
+async def _parse_csv_chunks(chunks, on_rows=None, progress=None):
+    """Parse row chunks concurrently, each streaming its rows as its own preview chunk"""
+    async def parse_async(index):
+        return await parse_excel_with_openai_async(chunks[index], for_chunk(on_rows, index))
+    return await parse_chunks(range(len(chunks)), parse_async, config.get("llm_max_concurrency", 4), progress)
+
+def parse_csv_text(csv_text, on_rows=None, progress=None):
+    """Parse CSV text, splitting long sheets into row chunks (header repeated) parsed concurrently"""
+    chunks = _csv_chunks(csv_text)
+    if len(chunks) == 1:
+        if progress is not None:
+            progress("llm", 0.0)
+        parsed_chunks = [parse_excel_with_openai(csv_text, on_rows)]
+    else:
+        parsed_chunks = asyncio.run(with_async_client(_parse_csv_chunks(chunks, on_rows, progress)))
+    return merge_parsed_chunks(_repair(parsed_chunks, chunks))
+
+async def parse_csv_text_async(csv_text, on_rows=None):
+    """parse_csv_text for callers already running an event loop (inside async_client_scope)"""
+    chunks = _csv_chunks(csv_text)
+    parsed_chunks = await _parse_csv_chunks(chunks, on_rows)
+    return merge_parsed_chunks(await asyncio.to_thread(_repair, parsed_chunks, chunks))
+
+@timed("read")
+def read_raw_sheet(file_path):
+    """First sheet without a header row, for the local parsers; rewinds file-like inputs"""
+    try:
+        return pd.read_excel(file_path, header=None)
+    except Exception as e:
+        print(f"Failed to read Excel: {e}")
+        return None
+    finally:
+        if hasattr(file_path, "seek"):
+            file_path.seek(0)
+
+def parse_excel_locally_or_none(raw):
+    """Try the deterministic parser; None when it is unsure and the LLM should be used"""
+    min_confidence = config.get("local_excel_min_confidence", 0.95)
+    if min_confidence > 1:
+        return None
+    parsed, confidence = parse_excel_locally(raw)
+    if parsed is None or confidence < min_confidence:
+        print(f"Local Excel parser confidence {confidence:.2f}, falling back to the LLM")
+        return None
     return parsed
 
-def excel_parser(file_path):
-    parsed_data = process_excel_bank_statement(file_path)
+def prepare_sheet(file_path):
+    """
+    Everything before the LLM: returns (raw, parsed, csv_text), raw being
+    the sheet for learning its layout. parsed is set when a layout template
+    or the local parser read the sheet, csv_text (for the LLM) otherwise;
+    both are None if the file could not be read.
+    """
+    raw = read_raw_sheet(file_path)
+    if raw is not None:
+        parsed = extract_excel_with_template(raw) or parse_excel_locally_or_none(raw)
+        if parsed is not None:
+            return raw, parsed, None
+    return raw, None, excel_to_csv_text(file_path) or None
+
+def learn_layout(raw, parsed):
+    """Remember the sheet's layout from the LLM parse so the next sheet like it skips the LLM"""
+    if raw is None:
+        return
+    try:
+        learn_excel_template(raw, parsed)
+    except Exception as e:
+        print(f"Could not learn spreadsheet layout: {e}")
 
+def process_excel_bank_statement(file_path, on_rows=None, progress=None):
+    raw, parsed, csv_text = prepare_sheet(file_path)
+    if parsed is not None:
+        return parsed
+    if not csv_text:
+        return pd.DataFrame()
+
+    parsed = parse_csv_text(csv_text, on_rows, progress)
+    learn_layout(raw, parsed)
+    return parsed
+
+def ledger_from_parsed(parsed_data):
+    """Validated Ledger from a sheet parse, or None if it holds no transactions"""
     all_transactions = []
     opening_balance = None
     closing_balance = None
     account_name = None
     ledger_name = None
-    output_path = ''
-
-    current_time = datetime.now()
-    time_str = current_time.strftime("_%Y%m%d_%H%M%S")
-    output_path = './data/output/' + os.path.splitext(file_path.name)[0] + time_str + '.xlsx'
 
     if isinstance(parsed_data, dict):
         all_transactions.extend(parsed_data.get("transactions", []))
@@ -87,6 +167,9 @@ def excel_parser(file_path):
 
     df = pd.DataFrame(all_transactions) if all_transactions else pd.DataFrame()
 
+    if df.empty:
+        print("No transactions found in the document")
+        return None
 
     if not opening_balance:
         if df['balance'].iloc[0]:
@@ -95,17 +178,18 @@ def excel_parser(file_path):
             opening_balance = 0
 
     df = validate_and_fix(ledger_name, opening_balance, df)
-    if not df.empty:
-        df = validate_and_fix(ledger_name, opening_balance, df)
-        export_to_excel(
-            df,
-            output_path=output_path,
-            account=account_name,
-            ledger=ledger_name,
-            opening_balance=opening_balance,
-            closing_balance=closing_balance
-        )
-    else:
-        print("No transactions found in the document")
+    return Ledger(df, account=account_name, ledger=ledger_name,
+                  opening_balance=opening_balance, closing_balance=closing_balance)
+
+def extract_excel_ledger(file_path, on_rows=None, progress=None):
+    """Parse an Excel statement (path or file-like) into a Ledger, or None if nothing was found"""
+    return ledger_from_parsed(process_excel_bank_statement(file_path, on_rows, progress))
+
+def excel_parser(file_path):
+    output_path = output_path_for(file_path.name)
+
+    ledger = extract_excel_ledger(file_path)
+    if ledger is not None:
+        export_ledger(ledger, output_path)
 
     return output_path
\ No newline at end of file
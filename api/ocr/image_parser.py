@@ -2,47 +2,131 @@ import os
 import torch
 torch.classes.__path__ = []
 
-from datetime import datetime
-import tempfile
-from openai import OpenAI
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
+import queue
+import asyncio
+import logging
+import threading
 from dotenv import load_dotenv
+from PIL import Image, ImageOps
 import pandas as pd
-import json
+import io
 import numpy as np
 from api.ocr.utils.validate_and_fix import validate_and_fix
-from api.ocr.utils.export_excel import export_to_excel
+from api.ocr.utils.export_excel import export_ledger, output_path_for
+from api.ledger.normalised import Ledger
+from api.ocr.model_registry import run_predictor
+from api.ocr.utils.pdf_pages import open_pdf, render_page, iter_batches
+from api.ocr.utils.text_layer import page_text_layer, page_text_runs
+from api.ocr.utils.preprocess import preprocess_page
+from api.ocr.utils.ocr_cache import cached_ocr
+from api.ocr.layout_templates import extract_pdf_with_template, learn_pdf_template
+from api.ocr.ocr_tables import export_lines, local_parse_or_text
+from api.ocr.utils.chunking import merge_parsed_chunks, split_text_chunks, parse_chunks
+from api.ocr.utils.balance_chain import repair_chunks
+from api.ocr.utils.llm_schema import columnar_prompt
+from api.ocr.utils.llm_parse import parse_statement, parse_statement_async, for_chunk
+from api.ocr.llm_client import with_async_client
+from api.ocr.utils.stage_timer import timed
+from api.reconciler.config_utils import load_config
+from api.jobs import JobCancelled
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+config = load_config()
+logger = logging.getLogger(__name__)
 
-def extract_text_with_doctr(file_bytes, file_extension):
-    """Extract text using Doctrine OCR from bytes"""
-    model = ocr_predictor(pretrained=True)
-    
-    # Save bytes to a temporary file
-    with tempfile.NamedTemporaryFile(suffix=file_extension, delete=False) as tmp:
-        tmp.write(file_bytes)
-        tmp_path = tmp.name
-    
+# Same separator doctr's Document.render() puts between pages
+PAGE_BREAK = "\n\n"
+
+@timed("ocr")
+def _recognise(images):
+    """Pre-process and OCR page images; returns doctr pages"""
+    return run_predictor([preprocess_page(image) for image in images]).pages
+
+def _ocr_pages(pages):
+    """
+    OCR a batch of (page_index, image) and yield (page_index, text, lines),
+    lines being the words grouped into positioned lines; cached pages skip OCR
+    """
+    if not pages:
+        return
+    for index, text, export in cached_ocr(pages, _recognise):
+        yield index, text, export_lines(export)
+
+def iter_pdf_page_texts(file_bytes, dpi=None, batch_size=None, pages=None):
+    """Yield (page_index, text) for every page of a PDF (or only the given page indices)"""
+    for index, text, _ in iter_pdf_page_layouts(file_bytes, dpi, batch_size, pages):
+        yield index, text
+
+def iter_pdf_page_layouts(file_bytes, dpi=None, batch_size=None, pages=None, progress=None):
+    """
+    Yield (page_index, text, lines) for every page of a PDF (or only the
+    given page indices), in page order; lines are the page's positioned
+    text runs grouped into lines.
+
+    Pages with a usable text layer are read directly without OCR. The rest
+    are rendered lazily and OCR'd in batches, with each batch's images
+    released once recognised, so memory stays bounded by the batch size
+    rather than the page count. progress, if given, is called as
+    progress("ocr", fraction of pages read) after every page (it may raise
+    to stop before the next batch).
+    """
+    dpi = dpi or config.get("ocr_pdf_dpi", 144)
+    use_text_layer = config.get("use_text_layer", True)
+    min_chars = config.get("text_layer_min_chars", 40)
+    pdf = open_pdf(file_bytes)
     try:
-        if file_extension.lower() in ('.png', '.jpg', '.jpeg', '.webp'):
-            doc = DocumentFile.from_images(tmp_path)
-        elif file_extension.lower() == '.pdf':
-            doc = DocumentFile.from_pdf(tmp_path)
-        else:
-            raise ValueError("Unsupported file format")
-        
-        result = model(doc)
-        return result.render()
+        indices = range(len(pdf)) if pages is None else list(pages)
+        batch_size = batch_size or config.get("ocr_batch_size", 4) or len(pdf)
+        pending = []
+        text_pages = 0
+        done = 0
+
+        def counted(layouts):
+            nonlocal done
+            for layout in layouts:
+                yield layout
+                done += 1
+                if progress is not None:
+                    progress("ocr", done / len(indices))
+
+        if progress is not None:
+            progress("ocr", 0.0)
+        for index in indices:
+            text = page_text_layer(pdf, index, min_chars) if use_text_layer else None
+            if text is not None:
+                # Flush queued scanned pages first to keep page order
+                yield from counted(_ocr_pages(pending))
+                pending = []
+                text_pages += 1
+                yield from counted([(index, text, page_text_runs(pdf, index, min_chars))])
+                continue
+            pending.append((index, render_page(pdf, index, dpi)))
+            if len(pending) >= batch_size:
+                yield from counted(_ocr_pages(pending))
+                pending = []
+        yield from counted(_ocr_pages(pending))
+        print(f"Read {text_pages} of {len(pdf)} pages from the text layer, OCR'd the rest")
     finally:
-        # Clean up the temporary file
-        os.unlink(tmp_path)
+        pdf.close()
 
-def parse_with_openai(text):
-    """Use OpenAI to extract transaction table"""
-    system_prompt = """
+def extract_pages_with_doctr(file_bytes, file_extension, progress=None):
+    """OCR a PDF or image from bytes into a list of (page_index, text, lines)"""
+    if file_extension.lower() == '.pdf':
+        return list(iter_pdf_page_layouts(file_bytes, progress=progress))
+
+    if file_extension.lower() not in ('.png', '.jpg', '.jpeg', '.webp'):
+        raise ValueError("Unsupported file format")
+    # Decode in memory; honour the EXIF orientation of phone photos
+    image = np.asarray(ImageOps.exif_transpose(Image.open(io.BytesIO(file_bytes))).convert("RGB"))
+    if progress is not None:
+        progress("ocr", 0.0)
+    return list(_ocr_pages([(0, image)]))
+
+def extract_text_with_doctr(file_bytes, file_extension):
+    """Extract text using Doctrine OCR from bytes"""
+    return PAGE_BREAK.join(text for _, text, _ in extract_pages_with_doctr(file_bytes, file_extension))
+
+SYSTEM_PROMPT = """
     Extract transactions into JSON array with:
     - Account: [Full account name]
     - Ledger: [Bank name]
@@ -57,47 +141,227 @@ def parse_with_openai(text):
             "balance": float (don't calculate)
         }
     Handle multi-line entries and currency symbols."""
-    
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    return json.loads(response.choices[0].message.content)
 
-def process_statements(file_bytes, file_extension):
+COLUMNAR_PROMPT = columnar_prompt("Extract the bank statement transactions from the OCR text below.")
+
+def parse_with_openai(text, on_rows=None):
+    """Use OpenAI to extract transaction table"""
+    return parse_statement(text, SYSTEM_PROMPT, COLUMNAR_PROMPT, "ocr", on_rows)
+
+async def parse_with_openai_async(text, on_rows=None):
+    """Async variant of parse_with_openai for overlapping requests"""
+    return await parse_statement_async(text, SYSTEM_PROMPT, COLUMNAR_PROMPT, "ocr", on_rows)
+
+class _ProducerStopped(Exception):
+    pass
+
+def _ocr_chunks_to_queue(file_bytes, pages_per_chunk, chunk_queue, stop, progress=None):
+    """
+    Producer: OCR the PDF and put (chunk_index, text, page_indices,
+    page_lines) on the queue as chunks fill up. Stops before the next OCR
+    batch once the stop event is set (the consumer has finished or failed).
+    """
+    def check(stage, fraction):
+        # Called after every page, so before each new batch is rendered and OCR'd
+        if stop.is_set():
+            raise _ProducerStopped()
+        if progress is not None:
+            progress(stage, fraction)
+
     try:
-        text = extract_text_with_doctr(file_bytes, file_extension)
+        pages = iter_pdf_page_layouts(file_bytes, progress=check)
+        for chunk_index, batch in enumerate(iter_batches(pages, pages_per_chunk)):
+            chunk_queue.put((chunk_index, PAGE_BREAK.join(text for _, text, _ in batch),
+                             [index for index, _, _ in batch], [lines for _, _, lines in batch]))
+    except _ProducerStopped:
+        pass
+    except Exception as e:
+        chunk_queue.put(e)
+    finally:
+        chunk_queue.put(None)
+
+async def _parse_chunks_from_queue(chunk_queue, on_rows=None, progress=None):
+    """
+    Consumer: send each OCR'd chunk to the model as soon as it arrives,
+    unless its table can be rebuilt locally from the word positions.
+    Returns the parsed chunks with their texts and page indices, in page order.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, config.get("llm_max_concurrency", 4)))
+    tasks = {}
+    chunks = {}
+    done = 0
+
+    async def parse_limited(text, chunk_index):
+        nonlocal done
+        async with semaphore:
+            parsed = await parse_with_openai_async(text, for_chunk(on_rows, chunk_index))
+        done += 1
+        if progress is not None:
+            # Chunks still being OCR'd are not counted yet
+            progress("llm", done / len(tasks))
+        return parsed
+
+    while True:
+        item = await loop.run_in_executor(None, chunk_queue.get)
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            raise item
+        # Fail as soon as a chunk's request has, rather than after the last page
+        for task in tasks.values():
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+        chunk_index, text, page_indices, page_lines = item
         if not text.strip():
-            print("No text found in file")
-            return None
-        return parse_with_openai(text)              
+            continue
+        parsed, llm_text = local_parse_or_text(page_lines, text)
+        if parsed is not None:
+            if on_rows is not None:
+                on_rows(parsed["transactions"], chunk=chunk_index)
+            tasks[chunk_index] = loop.create_future()
+            tasks[chunk_index].set_result(parsed)
+        else:
+            text = llm_text
+            tasks[chunk_index] = asyncio.create_task(parse_limited(text, chunk_index))
+        chunks[chunk_index] = (text, page_indices)
+    order = sorted(tasks)
+    results = await asyncio.gather(*(tasks[i] for i in order))
+    return results, [chunks[i][0] for i in order], [chunks[i][1] for i in order]
+
+def repair_parsed_chunks(parsed_chunks, chunk_text):
+    """Re-parse only the chunks whose balances do not chain; chunk_text(i) gives the text to re-send"""
+    if not config.get("balance_repair_enabled", True):
+        return parsed_chunks
+    return repair_chunks(parsed_chunks, lambda i, hint: parse_with_openai(chunk_text(i) + hint),
+                         config.get("balance_repair_tolerance", 0.01))
+
+def process_pdf_streaming(file_bytes, pages_per_chunk, on_rows=None, progress=None):
+    """
+    OCR and LLM-parse a PDF with the two stages overlapped: page chunks go
+    onto a queue as soon as they are recognised and are parsed while OCR
+    continues on later pages. Partial results are merged in page order.
+    """
+    chunk_queue = queue.Queue()
+    stop = threading.Event()
+    producer = threading.Thread(target=_ocr_chunks_to_queue,
+                                args=(file_bytes, pages_per_chunk, chunk_queue, stop, progress),
+                                name="ocr-producer", daemon=True)
+    producer.start()
+    try:
+        parsed_chunks, texts, pages = asyncio.run(
+            with_async_client(_parse_chunks_from_queue(chunk_queue, on_rows, progress)))
+    finally:
+        # On a consumer error, don't OCR the remaining pages before it surfaces
+        stop.set()
+        producer.join()
+    if not parsed_chunks:
+        logger.warning("No text found in file")
+        return None
+
+    def reread(chunk_index):
+        # Re-OCR the chunk's pages at a higher resolution before re-parsing
+        dpi = config.get("ocr_repair_dpi", 0)
+        if not dpi:
+            return texts[chunk_index]
+        return PAGE_BREAK.join(text for _, text in iter_pdf_page_texts(file_bytes, dpi=dpi, pages=pages[chunk_index]))
+
+    return merge_parsed_chunks(repair_parsed_chunks(parsed_chunks, reread))
+
+def _text_chunks(text):
+    chunks = split_text_chunks(text, config.get("llm_chunk_max_chars", 12000),
+                               page_break=PAGE_BREAK,
+                               header_lines=config.get("llm_chunk_header_lines", 5))
+    return chunks if len(chunks) > 1 else [text]
+
+async def _parse_text_chunks(chunks, on_rows=None, progress=None):
+    """Parse chunks concurrently, each streaming its rows as its own preview chunk"""
+    async def parse_async(index):
+        return await parse_with_openai_async(chunks[index], for_chunk(on_rows, index))
+    return await parse_chunks(range(len(chunks)), parse_async, config.get("llm_max_concurrency", 4), progress)
+
+def parse_text(text, on_rows=None, progress=None):
+    """
+    Parse OCR text, splitting long documents into page-aligned chunks that
+    are sent concurrently and merged back in order.
+    """
+    chunks = _text_chunks(text)
+    if len(chunks) == 1:
+        if progress is not None:
+            progress("llm", 0.0)
+        parsed_chunks = [parse_with_openai(text, on_rows)]
+    else:
+        parsed_chunks = asyncio.run(with_async_client(_parse_text_chunks(chunks, on_rows, progress)))
+    return merge_parsed_chunks(repair_parsed_chunks(parsed_chunks, chunks.__getitem__))
+
+async def parse_text_async(text, on_rows=None):
+    """parse_text for callers already running an event loop (inside async_client_scope)"""
+    chunks = _text_chunks(text)
+    parsed_chunks = await _parse_text_chunks(chunks, on_rows)
+    # Repairs are rare and use the blocking client
+    parsed_chunks = await asyncio.to_thread(repair_parsed_chunks, parsed_chunks, chunks.__getitem__)
+    return merge_parsed_chunks(parsed_chunks)
+
+def learn_layout(file_bytes, file_extension, parsed):
+    """Remember a digital PDF's layout from its parse so the next statement like it skips OCR and the LLM"""
+    if file_extension.lower() != '.pdf':
+        return
+    try:
+        learn_pdf_template(file_bytes, parsed)
+    except Exception as e:
+        print(f"Could not learn PDF layout: {e}")
+
+def prepare_statement(file_bytes, file_extension, progress=None):
+    """
+    Everything before the LLM: a learned layout template, then OCR (or the
+    text layer) and the word-position table rebuild. Returns (parsed, None)
+    when the statement was read locally, (None, text for the LLM) otherwise,
+    or (None, None) if the file has no text.
+    """
+    if file_extension.lower() == '.pdf':
+        parsed = extract_pdf_with_template(file_bytes)
+        if parsed is not None:
+            return parsed, None
+
+    pages = extract_pages_with_doctr(file_bytes, file_extension, progress)
+    text = PAGE_BREAK.join(text for _, text, _ in pages)
+    if not text.strip():
+        logger.warning("No text found in file")
+        return None, None
+    parsed, text = local_parse_or_text([lines for _, _, lines in pages], text)
+    if parsed is not None:
+        learn_layout(file_bytes, file_extension, parsed)
+    return parsed, text
+
+def process_statements(file_bytes, file_extension, on_rows=None, progress=None):
+    try:
+        pages_per_chunk = config.get("llm_pages_per_chunk", 5)
+        if file_extension.lower() == '.pdf' and pages_per_chunk > 0:
+            parsed = extract_pdf_with_template(file_bytes)
+            if parsed is not None:
+                return parsed
+            parsed = process_pdf_streaming(file_bytes, pages_per_chunk, on_rows, progress)
+        else:
+            parsed, text = prepare_statement(file_bytes, file_extension, progress)
+            if text is None:
+                return parsed
+            parsed = parse_text(text, on_rows, progress)
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error processing file: {str(e)}")
         return None
 
-def image_parser(uploaded_file):
+    learn_layout(file_bytes, file_extension, parsed)
+    return parsed
+
+def ledger_from_parsed(parsed_data):
+    """Validated Ledger from a statement parse, or None if it holds no transactions"""
     all_transactions = []
     opening_balance = None
     closing_balance = None
     account_name = None
     ledger_name = None
-    output_path = ''
-
-    current_time = datetime.now()
-    time_str = current_time.strftime("_%Y%m%d_%H%M%S")
-    output_path = './data/output/' + os.path.splitext(uploaded_file.name)[0] + time_str + '.xlsx'
-    # Get file extension
-    file_extension = os.path.splitext(uploaded_file.name)[1]
-    
-    # Read file bytes
-    file_bytes = uploaded_file.read()
-    
-    parsed_data = process_statements(file_bytes, file_extension)
 
     if parsed_data and isinstance(parsed_data, dict):
         all_transactions.extend(parsed_data.get("transactions", []))
@@ -114,18 +378,28 @@ def image_parser(uploaded_file):
         else:
             opening_balance = 0
     
-    if not df.empty:
-        df = validate_and_fix(ledger_name, opening_balance, df)
-        closing_balance = df['balance'].iloc[-1]
-        export_to_excel(
-            df,
-            output_path=output_path,
-            account=account_name,
-            ledger=ledger_name,
-            opening_balance=opening_balance,
-            closing_balance=closing_balance
-        )
-    else:
+    if df.empty:
         print("No transactions found in the document")
+        return None
+
+    df = validate_and_fix(ledger_name, opening_balance, df)
+    closing_balance = df['balance'].iloc[-1]
+    return Ledger(df, account=account_name, ledger=ledger_name,
+                  opening_balance=opening_balance, closing_balance=closing_balance)
+
+def extract_image_ledger(file_bytes, file_name, on_rows=None, progress=None):
+    """OCR and parse a PDF/image statement into a Ledger, or None if nothing was found"""
+    file_extension = os.path.splitext(file_name)[1]
+    return ledger_from_parsed(process_statements(file_bytes, file_extension, on_rows, progress))
+
+def image_parser(uploaded_file):
+    output_path = output_path_for(uploaded_file.name)
+    
+    # Read file bytes
+    file_bytes = uploaded_file.read()
+    
+    ledger = extract_image_ledger(file_bytes, uploaded_file.name)
+    if ledger is not None:
+        export_ledger(ledger, output_path)
 
     return output_path
\ No newline at end of file
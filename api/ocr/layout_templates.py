@@ -0,0 +1,562 @@
+"""
+Per-bank layout templates.
+
+Most statements we receive come from a few dozen recurring layouts. After a
+statement has been parsed by the generic path (LLM), its layout is learned
+by locating the parsed values in the source: which spreadsheet column or
+which horizontal band of a digital PDF page holds the date, debit, credit
+and balance, what the header row says, and how the bank and account are
+labelled. The learned template is only kept if re-extracting the same
+statement with it reproduces the LLM's result.
+
+Templates are plain JSON files under layout_templates_dir, one per layout,
+and can be edited by hand (field mapping, column bands, date order).
+Later statements whose header row matches a template are extracted
+locally; if the result does not check out (balance chain) the caller falls
+back to the generic path.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import pandas as pd
+from api.ocr.local_excel_parser import (
+    HEADER_SCAN_ROWS, OPENING_PATTERN, CLOSING_PATTERN, TOTAL_PATTERN,
+    normalise_label, label_value, parse_amounts, parse_dates, parse_table, balance_chain_score,
+    plain_transactions,
+)
+from api.ocr.utils.pdf_pages import open_pdf
+from api.ocr.utils.text_layer import page_text_runs
+from api.reconciler.config_utils import load_config
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+TEMPLATES_DIR = config.get("layout_templates_dir", "./data/templates")
+EXCEL = "excel"
+PDF = "pdf"
+AMOUNT_FIELDS = ("debit", "credit", "balance")
+# Header cells of a PDF layout may drift this many points between statements
+POSITION_TOLERANCE = 12.0
+# Share of parsed values that must be found in a column to learn it
+MIN_COLUMN_MATCH = 0.8
+
+_loaded = {"stamp": None, "templates": []}
+
+
+def _enabled():
+    return config.get("layout_templates_enabled", True)
+
+
+def _min_confidence():
+    return config.get("layout_template_min_confidence", 0.95)
+
+
+def fingerprint(kind, header_labels, positions=(), bank_marker=None):
+    """Stable id of a layout: header text, rounded column positions and bank marker"""
+    digest = hashlib.sha1()
+    digest.update(kind.encode("utf-8"))
+    digest.update("|".join(header_labels).encode("utf-8"))
+    digest.update("|".join(str(int(round(p / 10.0))) for p in positions).encode("utf-8"))
+    digest.update((bank_marker or "").lower().encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text or "").lower()).strip("-")[:40]
+
+
+def template_path(template):
+    name = _slug(template.get("bank")) or template["kind"]
+    return os.path.join(TEMPLATES_DIR, f"{name}-{template['fingerprint']}.json")
+
+
+def load_templates():
+    """All templates on disk; re-read whenever a file is added, removed or edited"""
+    try:
+        names = sorted(n for n in os.listdir(TEMPLATES_DIR) if n.endswith(".json"))
+    except OSError:
+        return []
+    paths = [os.path.join(TEMPLATES_DIR, n) for n in names]
+    stamp = tuple((p, os.path.getmtime(p)) for p in paths if os.path.exists(p))
+    if stamp != _loaded["stamp"]:
+        templates = []
+        for path in paths:
+            try:
+                with open(path, "r") as f:
+                    templates.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable layout template {path}: {e}")
+        _loaded.update(stamp=stamp, templates=templates)
+    return _loaded["templates"]
+
+
+def save_template(template):
+    os.makedirs(TEMPLATES_DIR, exist_ok=True)
+    template = dict(template, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+    path = template_path(template)
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(template, f, indent=4)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved layout template {path}")
+    return path
+
+
+def _bank_marker(bank, text):
+    """The bank name if the statement itself prints it, so it can be required on later matches"""
+    if bank and str(bank).strip().lower() in text.lower():
+        return str(bank).strip()
+    return None
+
+
+def _bank_matches(template, text):
+    marker = template.get("bank_marker")
+    return not marker or marker.lower() in text.lower()
+
+
+def _account_label(account, labelled_rows):
+    """Label printed next to the account name in the statement, e.g. 'Account Name:'"""
+    if not account:
+        return None
+    for cells in labelled_rows:
+        for position, cell in enumerate(cells[:-1]):
+            following = " ".join(cells[position + 1:]).strip().lower()
+            if str(account).strip().lower() in following and normalise_label(cell):
+                return normalise_label(cell).rstrip(":").strip()
+    return None
+
+
+def _transactions_frame(parsed):
+    df = pd.DataFrame(parsed.get("transactions") or [])
+    if df.empty or "date" not in df:
+        return None
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+    for field in AMOUNT_FIELDS:
+        df[field] = pd.to_numeric(df[field], errors="coerce") if field in df else float("nan")
+    return df
+
+
+def _amount_targets(transactions, field):
+    values = transactions[field].abs().round(2)
+    return set(values[values > 0])
+
+
+def _same_result(local, transactions):
+    """Does a template extraction reproduce the generic parse?"""
+    if local is None:
+        return False
+    local_df = pd.DataFrame(local.get("transactions") or [])
+    if len(local_df) != len(transactions):
+        return False
+    for field in ("debit", "credit"):
+        if abs(local_df[field].sum() - transactions[field].fillna(0).sum()) > 0.01:
+            return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# Spreadsheets: columns are identified by index
+# ----------------------------------------------------------------------
+
+def _excel_labels(raw, row_index):
+    labels = [normalise_label(v) for v in raw.iloc[row_index]]
+    while labels and not labels[-1]:
+        labels.pop()
+    return labels
+
+
+def _excel_text(raw):
+    return " ".join(raw.astype("string").fillna("").agg(" ".join, axis=1))
+
+
+def find_excel_template(raw):
+    """(header_index, template) for the first row matching a stored layout, or (None, None)"""
+    templates = [t for t in load_templates() if t.get("kind") == EXCEL]
+    if not templates:
+        return None, None
+    for row_index in range(min(HEADER_SCAN_ROWS, len(raw))):
+        labels = _excel_labels(raw, row_index)
+        if not any(labels):
+            continue
+        for template in templates:
+            if template.get("header") == labels and _bank_matches(template, _excel_text(raw.iloc[:row_index])):
+                return row_index, template
+    return None, None
+
+
+def extract_excel_with_template(raw):
+    """Parse a sheet with a stored layout; None if no layout matches or the result does not check out"""
+    if not _enabled():
+        return None
+    header_index, template = find_excel_template(raw)
+    if template is None:
+        return None
+    mapping = {int(column["index"]): column["field"] for column in template["columns"]}
+    if max(mapping) >= raw.shape[1]:
+        return None
+    parsed, confidence = parse_table(raw, header_index, mapping, template.get("dayfirst"))
+    if parsed is None or confidence < _min_confidence():
+        print(f"Layout template {template['fingerprint']} did not fit (confidence {confidence:.2f})")
+        return None
+    preamble = raw.iloc[:header_index]
+    if template.get("account_label"):
+        parsed["Account"] = label_value(preamble, (template["account_label"],)) or parsed["Account"]
+    parsed["Ledger"] = parsed["Ledger"] or template.get("bank")
+    print(f"Extracted with layout template {template['fingerprint']} ({template.get('bank')})")
+    return parsed
+
+
+def _best_amount_column(body, candidates, targets):
+    best = (0.0, None)
+    for column in candidates:
+        values = parse_amounts(body[column]).abs().round(2)
+        values = values[values > 0]
+        if values.empty:
+            continue
+        score = values.isin(targets).mean() * min(1.0, len(values) / len(targets))
+        if score > best[0]:
+            best = (score, column)
+    return best[1] if best[0] >= MIN_COLUMN_MATCH else None
+
+
+def learn_excel_template(raw, parsed):
+    """Learn and store the layout of a sheet from its generic parse; returns the template or None"""
+    if not _enabled() or not isinstance(parsed, dict):
+        return None
+    transactions = _transactions_frame(parsed)
+    if transactions is None or len(transactions) < 3:
+        return None
+    llm_dates = set(transactions["date"].dropna())
+
+    best = (0, None, None, None)
+    for column in raw.columns:
+        for dayfirst in (True, False):
+            hits = parse_dates(raw[column], dayfirst).dt.normalize().isin(llm_dates)
+            if hits.sum() > best[0]:
+                best = (hits.sum(), column, dayfirst, hits)
+    matched, date_column, dayfirst, hits = best
+    if matched < MIN_COLUMN_MATCH * len(transactions):
+        return None
+
+    first_data = int(hits.to_numpy().argmax())
+    header_index = next((i for i in range(first_data - 1, -1, -1) if raw.iloc[i].notna().sum() >= 2), None)
+    if header_index is None:
+        return None
+    body = raw.iloc[header_index + 1:]
+
+    mapping = {date_column: "date"}
+    remaining = [c for c in raw.columns if c != date_column]
+    debit = _best_amount_column(body, remaining, _amount_targets(transactions, "debit") or {-1})
+    credit = _best_amount_column(body, remaining, _amount_targets(transactions, "credit") or {-1})
+    if debit is not None and debit == credit:
+        mapping[debit] = "amount"
+    else:
+        if debit is None or credit is None:
+            return None
+        mapping[debit] = "debit"
+        mapping[credit] = "credit"
+    remaining = [c for c in remaining if c not in mapping]
+    balance = _best_amount_column(body, remaining, _amount_targets(transactions, "balance") or {-1})
+    if balance is not None:
+        mapping[balance] = "balance"
+        remaining.remove(balance)
+    text_lengths = {c: body[c].astype("string").str.len().mean() for c in remaining
+                    if body[c].astype("string").str.contains("[A-Za-z]").fillna(False).mean() > 0.5}
+    if text_lengths:
+        mapping[max(text_lengths, key=text_lengths.get)] = "description"
+
+    local, confidence = parse_table(raw, header_index, mapping, dayfirst)
+    if confidence < _min_confidence() or not _same_result(local, transactions):
+        print("Learned spreadsheet layout did not reproduce the parse; not saving a template")
+        return None
+
+    labels = _excel_labels(raw, header_index)
+    preamble = raw.iloc[:header_index]
+    preamble_text = _excel_text(preamble)
+    bank_marker = _bank_marker(parsed.get("Ledger"), preamble_text)
+    rows = [[str(v) for v in row if not pd.isna(v)] for _, row in preamble.iterrows()]
+    template = {
+        "kind": EXCEL,
+        "fingerprint": fingerprint(EXCEL, labels, bank_marker=bank_marker),
+        "bank": parsed.get("Ledger"),
+        "bank_marker": bank_marker,
+        "account_label": _account_label(parsed.get("Account"), rows),
+        "header": labels,
+        "dayfirst": bool(dayfirst),
+        "columns": [{"index": int(column), "field": field, "label": labels[column] if column < len(labels) else ""}
+                    for column, field in sorted(mapping.items())],
+    }
+    save_template(template)
+    return template
+
+
+# ----------------------------------------------------------------------
+# Digital PDFs: columns are horizontal bands in PDF points
+# ----------------------------------------------------------------------
+
+def _run_centre(run):
+    return (run[0] + run[2]) / 2
+
+
+def _pdf_pages(file_bytes):
+    """Per page, the text layer grouped into lines of runs; None if any page is scanned"""
+    pdf = open_pdf(file_bytes)
+    try:
+        pages = [page_text_runs(pdf, index, config.get("text_layer_min_chars", 40)) for index in range(len(pdf))]
+    finally:
+        pdf.close()
+    if not pages or any(page is None for page in pages):
+        return None
+    return pages
+
+
+def _line_labels(line):
+    return [normalise_label(run[4]) for run in line]
+
+
+def _pdf_text(pages):
+    return " ".join(run[4] for lines in pages for line in lines for run in line)
+
+
+def _header_matches(template, line):
+    header = template.get("header") or []
+    if _line_labels(line) != [cell["label"] for cell in header]:
+        return False
+    return all(abs(run[0] - cell["left"]) <= POSITION_TOLERANCE for run, cell in zip(line, header))
+
+
+def find_pdf_template(pages):
+    templates = [t for t in load_templates() if t.get("kind") == PDF]
+    if not templates:
+        return None
+    text = _pdf_text(pages)
+    for lines in pages:
+        for line in lines:
+            for template in templates:
+                if _header_matches(template, line) and _bank_matches(template, text):
+                    return template
+    return None
+
+
+def _column_for(run, columns):
+    """Template column a run falls in (largest horizontal overlap), or None for description text"""
+    best = (0.0, None)
+    for column in columns:
+        overlap = min(run[2], column["right"]) - max(run[0], column["left"])
+        if overlap > best[0]:
+            best = (overlap, column["field"])
+    return best[1]
+
+
+def _read_pdf_rows(pages, template):
+    """Collect raw cell strings per transaction line using the template's column bands"""
+    columns = template["columns"]
+    rows = []
+    opening = closing = None
+    for lines in pages:
+        header_seen = not any(_header_matches(template, line) for line in lines)
+        previous = None
+        for line in lines:
+            if not header_seen:
+                header_seen = _header_matches(template, line)
+                continue
+            cells = {}
+            description = []
+            for run in line:
+                field = _column_for(run, columns)
+                if field is None:
+                    description.append(run[4])
+                else:
+                    cells[field] = (cells.get(field, "") + " " + run[4]).strip()
+            line_text = " ".join(run[4] for run in line)
+            amount_run = cells.get("balance") or next((cells[f] for f in ("amount", "credit", "debit") if f in cells), None)
+            if OPENING_PATTERN.search(line_text):
+                opening = opening if opening is not None else amount_run
+                previous = None
+                continue
+            if CLOSING_PATTERN.search(line_text):
+                closing = amount_run or closing
+                previous = None
+                continue
+            if TOTAL_PATTERN.search(line_text):
+                previous = None
+                continue
+            if "date" in cells:
+                rows.append(dict(cells, description=" ".join(description)))
+                previous = line
+                continue
+            # A text-only line directly below a row continues its description
+            height = max(previous[0][3] - previous[0][1], 1.0) if previous else 0
+            close_below = previous is not None and min(r[1] for r in previous) - max(r[3] for r in line) < height
+            if description and not cells and close_below:
+                rows[-1]["description"] = (rows[-1]["description"] + " " + " ".join(description)).strip()
+                previous = line
+            else:
+                previous = None
+    return rows, opening, closing
+
+
+def parse_positioned_rows(pages, template):
+    """Read pages of positioned lines with a layout's column bands; returns (parsed or None, confidence)"""
+    rows, opening, closing = _read_pdf_rows(pages, template)
+    if not rows:
+        return None, 0.0
+    raw = pd.DataFrame(rows)
+    df = pd.DataFrame(index=raw.index)
+    df["date"] = parse_dates(raw["date"], template.get("dayfirst"))
+    df["description"] = raw["description"].astype("string").str.strip()
+    if "amount" in raw:
+        amount = parse_amounts(raw["amount"])
+        df["debit"] = (-amount).clip(lower=0).fillna(0.0)
+        df["credit"] = amount.clip(lower=0).fillna(0.0)
+    else:
+        for field in ("debit", "credit"):
+            df[field] = parse_amounts(raw[field]).abs().fillna(0.0) if field in raw else 0.0
+    df["balance"] = parse_amounts(raw["balance"]) if "balance" in raw else float("nan")
+    parsed_share = df["date"].notna().mean()
+    df = df[df["date"].notna()].reset_index(drop=True)
+    if df.empty:
+        return None, 0.0
+
+    opening_balance = parse_amounts(pd.Series([opening], dtype="string")).iloc[0] if opening else None
+    if opening_balance is None or pd.isna(opening_balance):
+        opening_balance = None
+        if df["balance"].notna().iloc[0]:
+            opening_balance = df["balance"].iloc[0] + df["debit"].iloc[0] - df["credit"].iloc[0]
+    closing_balance = parse_amounts(pd.Series([closing], dtype="string")).iloc[0] if closing else None
+    if closing_balance is None or pd.isna(closing_balance):
+        closing_balance = df["balance"].dropna().iloc[-1] if df["balance"].notna().any() else None
+
+    chain = balance_chain_score(df, float(opening_balance or 0.0))
+    confidence = parsed_share if chain is None else min(parsed_share, chain)
+
+    account = None
+    if template.get("account_label"):
+        for line in pages[0]:
+            labels = _line_labels(line)
+            if template["account_label"] in [label.rstrip(":").strip() for label in labels]:
+                position = [label.rstrip(":").strip() for label in labels].index(template["account_label"])
+                account = " ".join(run[4] for run in line[position + 1:]).strip() or None
+                break
+    parsed = {
+        "Account": account,
+        "Ledger": template.get("bank"),
+        "opening_balance": None if opening_balance is None else float(opening_balance),
+        "closing_balance": None if closing_balance is None else float(closing_balance),
+        "transactions": plain_transactions(df),
+    }
+    return parsed, confidence
+
+
+def extract_pdf_with_template(file_bytes):
+    """Parse a digital PDF with a stored layout; None if it is scanned, unknown or does not check out"""
+    if not _enabled():
+        return None
+    pages = _pdf_pages(file_bytes)
+    if pages is None:
+        return None
+    template = find_pdf_template(pages)
+    if template is None:
+        return None
+    parsed, confidence = parse_positioned_rows(pages, template)
+    if parsed is None or confidence < _min_confidence():
+        print(f"Layout template {template['fingerprint']} did not fit (confidence {confidence:.2f})")
+        return None
+    print(f"Extracted with layout template {template['fingerprint']} ({template.get('bank')})")
+    return parsed
+
+
+def _band(runs):
+    centres = sorted(_run_centre(run) for run in runs)
+    median = centres[len(centres) // 2]
+    near = [run for run in runs if abs(_run_centre(run) - median) <= POSITION_TOLERANCE * 2]
+    return median, min(run[0] for run in near), max(run[2] for run in near)
+
+
+def learn_pdf_template(file_bytes, parsed):
+    """Learn and store the layout of a digital PDF from its generic parse; returns the template or None"""
+    if not _enabled() or not isinstance(parsed, dict):
+        return None
+    transactions = _transactions_frame(parsed)
+    if transactions is None or len(transactions) < 3:
+        return None
+    pages = _pdf_pages(file_bytes)
+    if pages is None:
+        return None
+
+    runs = [(page, line_index, run) for page, lines in enumerate(pages)
+            for line_index, line in enumerate(lines) for run in line]
+    texts = pd.Series([run[4] for _, _, run in runs], dtype="string")
+    llm_dates = set(transactions["date"].dropna())
+
+    best = (0, None, None)
+    for dayfirst in (True, False):
+        hits = parse_dates(texts, dayfirst).dt.normalize().isin(llm_dates)
+        if hits.sum() > best[0]:
+            best = (hits.sum(), dayfirst, hits)
+    matched, dayfirst, date_hits = best
+    if matched < MIN_COLUMN_MATCH * len(transactions):
+        return None
+
+    amounts = parse_amounts(texts).abs().round(2)
+    # Dates such as 01.02 also read as amounts; only consider runs that are not dates
+    amounts = amounts.where(~date_hits)
+    bands = {"date": _band([runs[i][2] for i in date_hits[date_hits].index])}
+    for field in AMOUNT_FIELDS:
+        targets = _amount_targets(transactions, field)
+        if not targets:
+            continue
+        hits = amounts.isin(targets)
+        if hits.sum() >= MIN_COLUMN_MATCH * len(targets):
+            bands[field] = _band([runs[i][2] for i in hits[hits].index])
+    if "debit" in bands and "credit" in bands and abs(bands["debit"][0] - bands["credit"][0]) <= POSITION_TOLERANCE:
+        bands["amount"] = bands.pop("debit")
+        bands.pop("credit")
+    elif not ({"debit", "credit"} <= set(bands) or ("debit" in bands and "balance" in bands)
+              or ("credit" in bands and "balance" in bands)):
+        return None
+
+    # Header: the closest line above the first dated line with a cell in most bands
+    first_page, first_line = next((runs[i][0], runs[i][1]) for i in date_hits[date_hits].index)
+    header_line = None
+    for line in reversed(pages[first_page][:first_line]):
+        if len(line) >= 3:
+            header_line = line
+            break
+    if header_line is None:
+        return None
+
+    columns = [{"field": field, "left": round(left, 1), "right": round(right, 1)}
+               for field, (_, left, right) in sorted(bands.items(), key=lambda item: item[1][0])]
+    # Widen each band to the header cell above it so short values still land in it
+    for column in columns:
+        for run in header_line:
+            if column["left"] <= _run_centre(run) <= column["right"]:
+                column["left"] = round(min(column["left"], run[0]), 1)
+                column["right"] = round(max(column["right"], run[2]), 1)
+
+    header = [{"label": label, "left": round(run[0], 1)} for label, run in zip(_line_labels(header_line), header_line)]
+    text = _pdf_text(pages)
+    bank_marker = _bank_marker(parsed.get("Ledger"), text)
+    template = {
+        "kind": PDF,
+        "fingerprint": fingerprint(PDF, [cell["label"] for cell in header],
+                                   [cell["left"] for cell in header], bank_marker),
+        "bank": parsed.get("Ledger"),
+        "bank_marker": bank_marker,
+        "account_label": _account_label(parsed.get("Account"), [[run[4] for run in line] for line in pages[0]]),
+        "header": header,
+        "dayfirst": bool(dayfirst),
+        "columns": columns,
+    }
+
+    local, confidence = parse_positioned_rows(pages, template)
+    if confidence < _min_confidence() or not _same_result(local, transactions):
+        print("Learned PDF layout did not reproduce the parse; not saving a template")
+        return None
+    save_template(template)
+    return template
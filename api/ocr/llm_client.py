@@ -0,0 +1,90 @@
+"""
+LLM client selection for the statement parsers.
+
+llm_provider (or the LLM_PROVIDER environment variable) picks the client:
+
+    "openai"  the OpenAI API; llm_base_url points it at any
+              OpenAI-compatible server instead (e.g. a local stand-in)
+    "fake"    the deterministic in-process stand-in from
+              api.ocr.utils.fake_llm, with simulated latency and no network
+
+The blocking client is shared by the whole process. An async client's
+connection pool belongs to the event loop it was first used on, so async
+code gets its client from async_client(), inside async_client_scope(): each
+asyncio.run() opens its own client and closes it with the loop.
+"""
+import os
+import contextlib
+import contextvars
+from dotenv import load_dotenv
+from api.reconciler.config_utils import load_config
+
+load_dotenv()
+config = load_config()
+
+
+def provider():
+    return os.getenv("LLM_PROVIDER") or config.get("llm_provider", "openai")
+
+
+def endpoint():
+    """Where requests go: the provider, plus llm_base_url for an OpenAI-compatible server"""
+    if provider() == "fake" or not config.get("llm_base_url"):
+        return provider()
+    return f"{provider()}@{config['llm_base_url']}"
+
+
+_async_client = contextvars.ContextVar("async_llm_client", default=None)
+
+
+def _options():
+    options = {"api_key": os.getenv("OPENAI_API_KEY")}
+    if config.get("llm_base_url"):
+        options["base_url"] = config["llm_base_url"]
+    return options
+
+
+def create_client():
+    """Blocking client with the OpenAI chat completions interface"""
+    if provider() == "fake":
+        from api.ocr.utils.fake_llm import FakeClient
+        return FakeClient()
+    from openai import OpenAI
+    return OpenAI(**_options())
+
+
+def create_async_client():
+    if provider() == "fake":
+        from api.ocr.utils.fake_llm import AsyncFakeClient
+        return AsyncFakeClient()
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(**_options())
+
+
+@contextlib.asynccontextmanager
+async def async_client_scope():
+    """Open an async client for the running event loop and close it on exit; nested scopes reuse it"""
+    if _async_client.get() is not None:
+        yield _async_client.get()
+        return
+    client = create_async_client()
+    token = _async_client.set(client)
+    try:
+        yield client
+    finally:
+        _async_client.reset(token)
+        await client.close()
+
+
+async def with_async_client(coroutine):
+    """Await coroutine inside async_client_scope(), e.g. asyncio.run(with_async_client(main()))"""
+    async with async_client_scope():
+        return await coroutine
+
+
+def async_client():
+    """The async client of the current async_client_scope()"""
+    client = _async_client.get()
+    if client is None:
+        raise RuntimeError("No async LLM client: run inside async_client_scope()")
+    return client
@@ -0,0 +1,234 @@
+"""
+Deterministic parser for spreadsheet statements.
+
+Spreadsheets are already tabular, so most of them can be read without the
+LLM: the header row is sniffed by matching column synonyms, amounts and
+dates are parsed column-wise with pandas, and opening/closing balance rows
+are picked out by their labels. A confidence score (share of rows that
+parsed cleanly, and of balances that chain) decides whether the result is
+used or the caller falls back to the LLM.
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# Scan this many rows from the top of the sheet for the header row
+HEADER_SCAN_ROWS = 40
+
+COLUMN_SYNONYMS = {
+    "date": ["date", "value date", "transaction date", "txn date", "trans date",
+             "posting date", "post date", "booking date", "entry date", "value dt", "tran date"],
+    "description": ["description", "narration", "narrative", "details", "particulars",
+                    "transaction details", "transaction description", "remarks", "memo"],
+    "debit": ["debit", "debits", "withdrawal", "withdrawals", "withdrawal amount", "debit amount",
+              "dr", "dr amount", "paid out", "money out", "payments"],
+    "credit": ["credit", "credits", "deposit", "deposits", "deposit amount", "credit amount",
+               "cr", "cr amount", "paid in", "money in", "receipts"],
+    "balance": ["balance", "running balance", "available balance", "ledger balance",
+                "closing balance", "balance amount"],
+    "amount": ["amount", "transaction amount", "amount (aed)", "amount aed"],
+}
+
+OPENING_PATTERN = re.compile(r"opening balance|balance brought forward|brought forward|previous balance|b/f\b", re.I)
+CLOSING_PATTERN = re.compile(r"closing balance|balance carried forward|carried forward|c/f\b", re.I)
+TOTAL_PATTERN = re.compile(r"^\s*(?:grand\s+)?total", re.I)
+
+ACCOUNT_LABELS = ("account name", "account holder", "customer name", "name", "account")
+BANK_LABELS = ("bank name", "bank")
+
+_SYNONYM_LOOKUP = {synonym: field for field, synonyms in COLUMN_SYNONYMS.items() for synonym in synonyms}
+
+
+def normalise_label(value):
+    if pd.isna(value):
+        return ""
+    return re.sub(r"[^a-z0-9()/ ]", "", str(value).strip().lower()).strip()
+
+
+def sniff_header(raw):
+    """
+    Find the header row and map its columns to ledger fields.
+    Returns (row_index, {column_index: field}) or (None, {}).
+    """
+    best = (None, {})
+    for row_index in range(min(HEADER_SCAN_ROWS, len(raw))):
+        mapping = {}
+        for column_index, value in raw.iloc[row_index].items():
+            field = _SYNONYM_LOOKUP.get(normalise_label(value))
+            if field and field not in mapping.values():
+                mapping[column_index] = field
+        fields = set(mapping.values())
+        has_amounts = {"debit", "credit"} <= fields or "amount" in fields
+        if "date" in fields and has_amounts and len(mapping) > len(best[1]):
+            best = (row_index, mapping)
+    return best
+
+
+def parse_amounts(series):
+    """Vectorised amount parsing: currency symbols, thousands separators, (negatives), trailing CR/DR"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    text = series.astype("string").str.strip()
+    negative = text.str.startswith("(").fillna(False) | text.str.upper().str.endswith("DR").fillna(False)
+    cleaned = text.str.replace(r"(?i)\b(cr|dr)\b|[^0-9.\-]", "", regex=True)
+    values = pd.to_numeric(cleaned, errors="coerce")
+    return values.where(~negative, -values.abs()).astype("float64")
+
+
+def parse_dates(series, dayfirst=None):
+    """
+    Vectorised date parsing. Unless dayfirst is given, text dates are parsed
+    both day-first and month-first and the reading that parses more rows
+    (then keeps them in order) wins.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    text = series.where(series.notna()).astype("string").str.strip()
+    candidates = []
+    for dayfirst in ((True, False) if dayfirst is None else (dayfirst,)):
+        parsed = pd.to_datetime(text, errors="coerce", dayfirst=dayfirst, format="mixed")
+        valid = parsed.dropna()
+        ordered = valid.is_monotonic_increasing or valid.is_monotonic_decreasing
+        candidates.append((parsed.notna().sum(), ordered, dayfirst, parsed))
+    candidates.sort(key=lambda c: (c[0], c[1], c[2]), reverse=True)
+    return candidates[0][3]
+
+
+def label_value(raw, labels):
+    """Value next to the first preamble cell whose text is one of labels"""
+    for _, row in raw.iterrows():
+        cells = list(row)
+        for position, cell in enumerate(cells):
+            label = normalise_label(cell).rstrip(":").strip()
+            if label in labels:
+                for value in cells[position + 1:]:
+                    if not pd.isna(value) and str(value).strip():
+                        return str(value).strip()
+    return None
+
+
+def label_amount(raw, labels):
+    """label_value parsed as an amount ("AED 1,000.00" -> 1000.0), None if missing or not a number"""
+    value = label_value(raw, labels)
+    if value is None:
+        return None
+    amount = parse_amounts(pd.Series([value])).iloc[0]
+    return None if pd.isna(amount) else float(amount)
+
+
+def plain_transactions(df):
+    """Transaction rows as an LLM parse has them: ISO date strings, floats, None for a missing balance"""
+    plain = pd.DataFrame({
+        "date": df["date"].dt.strftime("%Y-%m-%d"),
+        "description": df["description"].astype("string").fillna("").astype(str),
+        "debit": df["debit"].astype("float64"),
+        "credit": df["credit"].astype("float64"),
+        "balance": df["balance"].astype("float64").astype(object),
+    })
+    plain["balance"] = plain["balance"].where(df["balance"].notna().to_numpy(), None)
+    return plain.to_dict("records")
+
+
+def _row_text(table):
+    return table.astype("string").fillna("").agg(" ".join, axis=1)
+
+
+def balance_chain_score(df, opening_balance):
+    """Share of rows whose balance equals the previous balance plus credit minus debit"""
+    balance = df["balance"].to_numpy(dtype="float64")
+    if len(balance) < 2 or np.isnan(balance).all():
+        return None
+    previous = np.concatenate([[opening_balance], balance[:-1]])
+    expected = previous + df["credit"].to_numpy() - df["debit"].to_numpy()
+    # Some banks list newest first, in which case the chain runs backwards
+    forward = np.isclose(expected, balance, atol=0.01)
+    following = np.concatenate([balance[1:], [np.nan]])
+    backward = np.isclose(following + df["credit"].to_numpy() - df["debit"].to_numpy(), balance, atol=0.01)
+    return max(forward[1:].sum(), backward[:-1].sum()) / (len(balance) - 1)
+
+
+def parse_excel_locally(raw):
+    """
+    Parse a raw sheet (read with header=None) into the same dict shape the
+    LLM returns. Returns (parsed, confidence); parsed is None if no header
+    row could be found.
+    """
+    header_index, mapping = sniff_header(raw)
+    if header_index is None:
+        return None, 0.0
+    return parse_table(raw, header_index, mapping)
+
+
+def parse_table(raw, header_index, mapping, dayfirst=None):
+    """
+    Parse the rows below header_index using a known {column_index: field}
+    mapping. Returns (parsed, confidence) like parse_excel_locally.
+    """
+    preamble = raw.iloc[:header_index]
+    table = raw.iloc[header_index + 1:].dropna(how="all").reset_index(drop=True)
+    columns = {field: table[column] for column, field in mapping.items()}
+    text = _row_text(table)
+
+    df = pd.DataFrame(index=table.index)
+    df["date"] = parse_dates(columns["date"], dayfirst)
+    if "description" in columns:
+        df["description"] = columns["description"].astype("string").str.strip().fillna("")
+    else:
+        df["description"] = ""
+    if "debit" in columns and "credit" in columns:
+        df["debit"] = parse_amounts(columns["debit"]).abs().fillna(0.0)
+        df["credit"] = parse_amounts(columns["credit"]).abs().fillna(0.0)
+    else:
+        amount = parse_amounts(columns["amount"])
+        df["debit"] = (-amount).clip(lower=0).fillna(0.0)
+        df["credit"] = amount.clip(lower=0).fillna(0.0)
+    df["balance"] = parse_amounts(columns["balance"]) if "balance" in columns else np.nan
+
+    # Opening / closing balance rows
+    opening_balance = None
+    closing_balance = None
+    opening_rows = text.str.contains(OPENING_PATTERN)
+    closing_rows = text.str.contains(CLOSING_PATTERN)
+    if opening_rows.any():
+        opening_balance = df.loc[opening_rows, "balance"].dropna().head(1)
+        opening_balance = float(opening_balance.iloc[0]) if len(opening_balance) else None
+    if closing_rows.any():
+        closing_balance = df.loc[closing_rows, "balance"].dropna().tail(1)
+        closing_balance = float(closing_balance.iloc[-1]) if len(closing_balance) else None
+    if opening_balance is None:
+        opening_balance = label_amount(preamble, ("opening balance", "previous balance"))
+    if closing_balance is None:
+        closing_balance = label_amount(preamble, ("closing balance",))
+
+    drop = opening_rows | closing_rows | text.str.contains(TOTAL_PATTERN)
+    has_amount = (df["debit"] != 0) | (df["credit"] != 0)
+
+    # Rows without a date or amount continue the previous row's description
+    continuation = df["date"].isna() & ~has_amount & ~drop & (df["description"] != "")
+    if continuation.any():
+        owner = (~continuation).cumsum()
+        df["description"] = df.groupby(owner)["description"].transform(lambda parts: " ".join(p for p in parts if p))
+    df = df[~drop & ~continuation].reset_index(drop=True)
+
+    data_rows = len(df)
+    df = df[df["date"].notna()].reset_index(drop=True)
+    if df.empty:
+        return None, 0.0
+
+    parsed_share = len(df) / data_rows
+    if opening_balance is None and df["balance"].notna().iloc[0]:
+        opening_balance = df["balance"].iloc[0] + df["debit"].iloc[0] - df["credit"].iloc[0]
+    chain = balance_chain_score(df, float(opening_balance or 0.0))
+    confidence = parsed_share if chain is None else min(parsed_share, chain)
+
+    if closing_balance is None and df["balance"].notna().any():
+        closing_balance = float(df["balance"].dropna().iloc[-1])
+
+    parsed = {
+        "Account": label_value(preamble, ACCOUNT_LABELS),
+        "Ledger": label_value(preamble, BANK_LABELS),
+        "opening_balance": opening_balance,
+        "closing_balance": closing_balance,
+        "transactions": plain_transactions(df),
+    }
+    return parsed, confidence
@@ -0,0 +1,147 @@
+"""
+Process-wide registry for the doctr OCR predictor.
+
+The predictor is built once per process and shared. doctr models are not
+safe to call from several threads at once, so inference goes through a
+lock; worker processes (job runner / HTTP service) each hold their own
+copy and therefore run in parallel.
+"""
+import time
+import logging
+import threading
+import numpy as np
+from api.reconciler.config_utils import load_config
+
+logger = logging.getLogger(__name__)
+
+_predictor = None
+_build_lock = threading.Lock()
+_inference_lock = threading.Lock()
+_warm = threading.Event()
+
+
+PREDICTOR_DEFAULTS = {
+    "det_arch": "fast_base",
+    "reco_arch": "crnn_vgg16_bn",
+    "det_input_size": None,
+    "assume_straight_pages": True,
+    "straighten_pages": False,
+    "detect_orientation": False,
+}
+
+
+def predictor_options(overrides=None):
+    """Model options from config (ocr_det_arch, ocr_reco_arch, ...) with optional overrides"""
+    config = load_config()
+    options = {key: config.get(f"ocr_{key}", default) for key, default in PREDICTOR_DEFAULTS.items()}
+    options.update(overrides or {})
+    return options
+
+
+def _detection_model(arch, input_size):
+    """Detection model at a non-default square input size (None: let doctr build it)"""
+    if not input_size:
+        return arch
+    from doctr.models import detection
+    from doctr.models.detection.fast import reparameterize
+
+    model = detection.__dict__[arch](pretrained=True, input_shape=(3, input_size, input_size))
+    # doctr only reparameterizes FAST models it builds itself
+    if isinstance(model, detection.FAST):
+        model = reparameterize(model)
+    return model
+
+
+def _build_predictor(backend=None, options=None):
+    """
+    Build the doctr predictor. backend is "torch" or "onnx" (default:
+    ocr_backend); options override predictor_options() for this build.
+    """
+    import torch
+    from doctr.models import ocr_predictor
+
+    config = load_config()
+    threads = config.get("ocr_threads", 0)
+    if threads:
+        # Intra-op threads used by each forward pass
+        torch.set_num_threads(threads)
+    options = predictor_options(options)
+    predictor = ocr_predictor(
+        det_arch=_detection_model(options["det_arch"], options["det_input_size"]),
+        reco_arch=options["reco_arch"],
+        pretrained=True,
+        det_bs=config.get("ocr_batch_size", 4) or 2,
+        reco_bs=config.get("ocr_reco_batch_size", 128),
+        assume_straight_pages=options["assume_straight_pages"],
+        straighten_pages=options["straighten_pages"],
+        detect_orientation=options["detect_orientation"],
+    )
+
+    backend = backend or config.get("ocr_backend", "torch")
+    if backend == "onnx":
+        try:
+            from api.ocr.onnx_backend import to_onnx_predictor
+            predictor = to_onnx_predictor(predictor, config.get("ocr_onnx_quantize", False), threads)
+        except ImportError as e:
+            logger.warning(f"ONNX backend unavailable ({e}); install onnxruntime. Falling back to torch")
+        except ValueError as e:
+            logger.warning(f"ONNX backend not used: {e}. Falling back to torch")
+        except Exception as e:
+            logger.warning(f"ONNX export failed: {e}. Falling back to torch")
+    return predictor
+
+
+def get_predictor():
+    """Return the shared predictor, loading the weights on first use"""
+    global _predictor
+    if _predictor is None:
+        with _build_lock:
+            if _predictor is None:
+                start = time.perf_counter()
+                _predictor = _build_predictor()
+                logger.info(f"Loaded OCR predictor in {time.perf_counter() - start:.2f}s")
+    return _predictor
+
+
+def run_predictor(pages):
+    """Run OCR on a doctr document (list of page arrays) with the shared predictor"""
+    predictor = get_predictor()
+    with _inference_lock:
+        return predictor(pages)
+
+
+def _synthetic_page():
+    """Small white page with a few dark bars so detection and recognition both run"""
+    page = np.full((256, 256, 3), 255, dtype=np.uint8)
+    for top in (40, 100, 160):
+        page[top:top + 16, 30:220] = 0
+    return page
+
+
+def warm_up():
+    """Load the predictor and run it once so the first real page is fast"""
+    if _warm.is_set():
+        return
+    start = time.perf_counter()
+    run_predictor([_synthetic_page()])
+    _warm.set()
+    logger.info(f"OCR predictor warmed up in {time.perf_counter() - start:.2f}s")
+
+
+def warm_up_in_background():
+    """Start warm-up on a daemon thread (used at app startup)"""
+    thread = threading.Thread(target=warm_up, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_warm():
+    return _warm.is_set()
+
+
+def reset():
+    """Drop the shared predictor (e.g. after the OCR configuration changes)"""
+    global _predictor
+    with _build_lock:
+        _predictor = None
+        _warm.clear()
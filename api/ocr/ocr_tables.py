@@ -0,0 +1,186 @@
+"""
+Statement table reconstruction from word positions.
+
+doctr's render() flattens a page to text and drops the word boxes it
+computed, leaving the LLM to guess the columns again. Here the words of a
+page (doctr's export for OCR'd pages, pypdfium2 runs for digital ones) are
+grouped into lines by y-position and into cells by the gaps between them.
+The header row is recognised by its column names and its cells split the
+page into column bands. Rows are then read with the same machinery as
+learned PDF layouts.
+
+If the rebuilt table's balances chain, it is used without calling the LLM.
+Otherwise the LLM gets the table as compact "|"-separated columns instead
+of free text.
+"""
+import pandas as pd
+from api.ocr.layout_templates import parse_positioned_rows
+from api.ocr.local_excel_parser import ACCOUNT_LABELS, BANK_LABELS, normalise_label, sniff_header, label_value
+from api.ocr.utils.text_layer import group_lines
+from api.reconciler.config_utils import load_config
+
+config = load_config()
+
+# Words closer than this many line heights belong to the same cell
+CELL_GAP_RATIO = 0.8
+HEADER_SCAN_LINES = 40
+CELL_SEPARATOR = "|"
+
+
+def export_lines(export):
+    """Words of a doctr page export as lines of (left, bottom, right, top, text) runs, in pixels with y up"""
+    height, width = export["dimensions"]
+    runs = []
+    for block in export.get("blocks", []):
+        for line in block.get("lines", []):
+            for word in line.get("words", []):
+                value = (word.get("value") or "").strip()
+                if not value:
+                    continue
+                # Straight pages give two corners, rotated ones a four-point polygon
+                xs = [point[0] for point in word["geometry"]]
+                ys = [point[1] for point in word["geometry"]]
+                runs.append((min(xs) * width, (1 - max(ys)) * height,
+                             max(xs) * width, (1 - min(ys)) * height, value))
+    return group_lines(runs)
+
+
+def merge_cells(line):
+    """Join runs of a line that are closer than CELL_GAP_RATIO line heights into one cell"""
+    cells = []
+    for run in line:
+        if cells:
+            left, bottom, right, top, text = cells[-1]
+            height = max(top - bottom, run[3] - run[1], 1.0)
+            if run[0] - right < CELL_GAP_RATIO * height:
+                cells[-1] = (left, min(bottom, run[1]), max(right, run[2]), max(top, run[3]), f"{text} {run[4]}")
+                continue
+        cells.append(run)
+    return cells
+
+
+def _labels(line):
+    return [normalise_label(run[4]) for run in line]
+
+
+def _layout_from_header(line, mapping):
+    """
+    Column bands from the header cells: each cell owns the page width up to
+    halfway to its neighbours. Amount and date cells become layout columns;
+    description and unrecognised cells are left as description text.
+    """
+    slots = []
+    for position, run in enumerate(line):
+        left = 0.0 if position == 0 else (line[position - 1][2] + run[0]) / 2
+        right = float("inf") if position == len(line) - 1 else (run[2] + line[position + 1][0]) / 2
+        slots.append({"label": _labels(line)[position], "field": mapping.get(position), "left": left, "right": right})
+    return {
+        "header": [{"label": label, "left": run[0]} for label, run in zip(_labels(line), line)],
+        "slots": slots,
+        "columns": [{"field": slot["field"], "left": slot["left"], "right": slot["right"]}
+                    for slot in slots if slot["field"] not in (None, "description")],
+        "dayfirst": None,
+        "bank": None,
+        "account_label": None,
+    }
+
+
+def find_layout(pages):
+    """Layout from the first recognisable header row (date plus amount columns), or None"""
+    for lines in pages:
+        head = lines[:HEADER_SCAN_LINES]
+        raw = pd.DataFrame([[run[4] for run in line] for line in head])
+        row_index, mapping = sniff_header(raw)
+        if row_index is not None:
+            return _layout_from_header(head[row_index], mapping)
+    return None
+
+
+def _slot_for(run, slots):
+    """Header slot containing the run's centre"""
+    centre = (run[0] + run[2]) / 2
+    for index, slot in enumerate(slots):
+        if slot["left"] <= centre < slot["right"]:
+            return index
+    return 0
+
+
+def layout_text(pages, layout):
+    """
+    Pages as text, with every line from the header row down split into the
+    header's columns. Lines above the header and lines that fall into a
+    single column stay plain text.
+    """
+    header_labels = [cell["label"] for cell in layout["header"]]
+    slots = layout["slots"]
+    rendered = []
+    for lines in pages:
+        in_table = not any(_labels(line) == header_labels for line in lines)
+        for line in lines:
+            in_table = in_table or _labels(line) == header_labels
+            cells = [[] for _ in slots]
+            for run in line:
+                cells[_slot_for(run, slots)].append(run[4])
+            if not in_table or sum(1 for cell in cells if cell) < 2:
+                rendered.append(" ".join(run[4] for run in line))
+                continue
+            rendered.append(CELL_SEPARATOR.join(" ".join(cell) for cell in cells).rstrip(CELL_SEPARATOR))
+        rendered.append("")
+    return "\n".join(rendered).strip()
+
+
+def _preamble_value(pages, labels):
+    """Value of a "Label: value" line above the table (label and value often merge into one cell)"""
+    rows = []
+    for line in pages[0][:HEADER_SCAN_LINES]:
+        cells = []
+        for run in line:
+            label, colon, value = run[4].partition(":")
+            cells.extend([label, value] if colon else [run[4]])
+        rows.append(cells)
+    return label_value(pd.DataFrame(rows), labels)
+
+
+def _parse_cells(pages):
+    layout = find_layout(pages) if pages else None
+    if layout is None:
+        return None, 0.0, None
+    parsed, confidence = parse_positioned_rows(pages, layout)
+    if parsed is None:
+        return None, 0.0, layout
+    parsed["Account"] = _preamble_value(pages, ACCOUNT_LABELS)
+    parsed["Ledger"] = _preamble_value(pages, BANK_LABELS)
+    if all(transaction["balance"] is None for transaction in parsed["transactions"]):
+        # Without balances the rows cannot be checked
+        confidence = 0.0
+    return parsed, confidence, layout
+
+
+def parse_pages(pages):
+    """
+    Rebuild the statement table from pages of positioned lines.
+    Returns (parsed or None, confidence, layout or None).
+    """
+    return _parse_cells([[merge_cells(line) for line in lines] for lines in pages if lines])
+
+
+def local_parse_or_text(pages, text):
+    """
+    (parsed, None) when the rebuilt table checks out, else (None, text for
+    the LLM): the column-split table if a header was found, otherwise text.
+    """
+    if not config.get("ocr_table_enabled", True) or not pages:
+        return None, text
+    pages = [[merge_cells(line) for line in lines] for lines in pages if lines]
+    try:
+        parsed, confidence, layout = _parse_cells(pages)
+    except Exception as e:
+        print(f"Table reconstruction failed: {e}")
+        return None, text
+    if parsed is not None and confidence >= config.get("ocr_table_min_confidence", 0.95):
+        print(f"Rebuilt {len(parsed['transactions'])} transactions from word positions "
+              f"(confidence {confidence:.2f}); skipping the LLM")
+        return parsed, None
+    if layout is None:
+        return None, text
+    return None, layout_text(pages, layout)
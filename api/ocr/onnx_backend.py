@@ -0,0 +1,145 @@
+"""
+ONNX Runtime inference backend for the doctr OCR predictor.
+
+The detection and recognition networks of a built doctr predictor are
+exported to ONNX once (cached under ocr_onnx_dir, optionally int8
+dynamically quantised) and swapped for thin modules that run them through
+onnxruntime's CPU provider. doctr's own pre-processing, box
+post-processing, cropping and CTC decoding are kept, so the output is the
+same Document structure as with torch. Only CTC recognisers (crnn_*) can
+be swapped: the attention decoders (parseq, master, sar, ...) decode
+inside the network, so to_onnx_predictor refuses them.
+
+Select it with "ocr_backend": "onnx" (and "ocr_onnx_quantize": true for
+int8). Without onnxruntime (see requirements.txt) the predictor falls back
+to torch with a warning. benchmarks/onnx_accuracy.py checks the output
+against torch on sample pages.
+"""
+import os
+import logging
+from api.reconciler.config_utils import load_config
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+ONNX_DIR = config.get("ocr_onnx_dir", "./data/models/onnx")
+
+
+def _model_name(model):
+    cfg = getattr(model, "cfg", None) or {}
+    url = cfg.get("url")
+    name = os.path.splitext(os.path.basename(url))[0] if url else model.__class__.__name__.lower()
+    # The same weights exported at another input size are a different graph
+    _, height, width = cfg["input_shape"]
+    return f"{name}-{height}x{width}"
+
+
+def export_to_onnx(model, onnx_dir=ONNX_DIR, quantize=False):
+    """Export a doctr torch model to ONNX (cached on disk); returns the .onnx path"""
+    import torch
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    name = _model_name(model)
+    path = os.path.join(onnx_dir, f"{name}.onnx")
+    if not os.path.exists(path):
+        channels, height, width = model.cfg["input_shape"]
+        dummy = torch.rand((1, channels, height, width), dtype=torch.float32)
+        # Exportable doctr models return raw logits instead of decoded predictions
+        exportable = getattr(model, "exportable", False)
+        model.exportable = True
+        try:
+            tmp_path = path + f".{os.getpid()}.tmp"
+            torch.onnx.export(
+                model.eval(), dummy, tmp_path,
+                input_names=["input"], output_names=["logits"],
+                dynamic_axes={"input": {0: "batch_size"}, "logits": {0: "batch_size"}},
+                export_params=True,
+            )
+            os.replace(tmp_path, path)
+        finally:
+            model.exportable = exportable
+        logger.info(f"Exported {name} to {path}")
+
+    if not quantize:
+        return path
+    quantized_path = os.path.join(onnx_dir, f"{name}.int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        tmp_path = quantized_path + f".{os.getpid()}.tmp"
+        quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+        logger.info(f"Quantised {name} to {quantized_path}")
+    return quantized_path
+
+
+def _session(path, threads):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def _onnx_module(torch_model, session, kind):
+    """A torch Module standing in for torch_model that runs the ONNX session"""
+    import torch
+
+    class OnnxModel(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            # doctr's predictors read the device/dtype from the first parameter
+            self.anchor = torch.nn.Parameter(torch.zeros(1), requires_grad=False)
+            self.cfg = torch_model.cfg
+            self.postprocessor = torch_model.postprocessor
+            self.exportable = False
+            for attribute in ("class_names", "vocab", "max_length", "assume_straight_pages"):
+                if hasattr(torch_model, attribute):
+                    setattr(self, attribute, getattr(torch_model, attribute))
+            self.input_name = session.get_inputs()[0].name
+
+        def logits(self, x):
+            output = session.run(None, {self.input_name: x.detach().cpu().float().numpy()})[0]
+            return torch.from_numpy(output)
+
+        def forward(self, x, return_model_output=False, return_preds=True, **kwargs):
+            logits = self.logits(x)
+            out = {}
+            if kind == "detection":
+                prob_map = torch.sigmoid(logits)
+                if return_model_output:
+                    out["out_map"] = prob_map
+                batch_preds = self.postprocessor(prob_map.permute((0, 2, 3, 1)).numpy())
+                out["preds"] = [dict(zip(self.class_names, preds)) for preds in batch_preds]
+            else:
+                if return_model_output:
+                    out["out_map"] = logits
+                out["preds"] = self.postprocessor(logits)
+            return out
+
+    return OnnxModel().eval()
+
+
+def is_ctc_recognizer(model):
+    """Whether a doctr recognition model emits logits for a CTC decoder (crnn_*)"""
+    return type(getattr(model, "postprocessor", None)).__name__ == "CTCPostProcessor"
+
+
+def to_onnx_predictor(predictor, quantize=False, threads=0, onnx_dir=ONNX_DIR):
+    """
+    Swap the detection and recognition networks of a doctr predictor for
+    ONNX Runtime sessions. Raises ValueError for a recogniser that is not CTC.
+    """
+    det_model = predictor.det_predictor.model
+    reco_model = predictor.reco_predictor.model
+    if not is_ctc_recognizer(reco_model):
+        raise ValueError(f"{type(reco_model).__name__} is not a CTC recogniser; "
+                         "the ONNX backend supports the crnn_* architectures only")
+    det_session = _session(export_to_onnx(det_model, onnx_dir, quantize), threads)
+    reco_session = _session(export_to_onnx(reco_model, onnx_dir, quantize), threads)
+    predictor.det_predictor.model = _onnx_module(det_model, det_session, "detection")
+    predictor.reco_predictor.model = _onnx_module(reco_model, reco_session, "recognition")
+    return predictor
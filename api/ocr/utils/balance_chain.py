@@ -0,0 +1,120 @@
+"""
+Balance-chain validation and targeted repair of chunked extractions.
+
+A statement's running balance must satisfy
+balance[i] == balance[i-1] + credit[i] - debit[i]. Rows where it does not
+are located, mapped back to the chunk (group of pages or sheet rows) they
+were parsed from, and only those chunks are re-extracted. A re-extracted
+chunk replaces the original only if its own rows chain better, so a repair
+can never make the result worse.
+"""
+import numpy as np
+import pandas as pd
+from api.ocr.utils.chunking import merge_with_sources
+
+
+def _numbers(transactions, field):
+    if field not in transactions:
+        return np.full(len(transactions), np.nan)
+    return pd.to_numeric(transactions[field], errors="coerce").to_numpy(dtype="float64")
+
+
+def broken_rows(transactions, opening_balance=None, tolerance=0.01):
+    """
+    Boolean array: True where a row's balance does not follow from the
+    previous balance. Rows without a balance (or following one) are not
+    judged. If opening_balance is None the first row is not judged.
+    """
+    df = pd.DataFrame(transactions)
+    if df.empty:
+        return np.zeros(0, dtype=bool)
+    balance = _numbers(df, "balance")
+    debit = np.nan_to_num(_numbers(df, "debit"))
+    credit = np.nan_to_num(_numbers(df, "credit"))
+    opening = np.nan if opening_balance is None else float(opening_balance)
+    previous = np.concatenate([[opening], balance[:-1]])
+    expected = previous + credit - debit
+    judged = ~np.isnan(expected) & ~np.isnan(balance)
+    return judged & (np.abs(expected - balance) > tolerance)
+
+
+def broken_segments(transactions, opening_balance=None, tolerance=0.01):
+    """Row ranges [start, end) where the balance chain breaks, adjacent breaks merged"""
+    broken = broken_rows(transactions, opening_balance, tolerance)
+    segments = []
+    for row in np.flatnonzero(broken):
+        if segments and row <= segments[-1][1]:
+            segments[-1][1] = row + 1
+        else:
+            segments.append([int(row), int(row) + 1])
+    return [tuple(segment) for segment in segments]
+
+
+def _opening_balance(parsed):
+    if parsed.get("opening_balance") is not None:
+        try:
+            return float(parsed["opening_balance"])
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def _chunk_breaks(parsed, opening_balance, tolerance):
+    transactions = (parsed or {}).get("transactions") or []
+    return int(broken_rows(transactions, opening_balance, tolerance).sum())
+
+
+def repair_hint(transactions, segment):
+    """Note appended to a re-sent chunk naming the rows whose balances did not add up"""
+    start, end = segment
+    rows = transactions[max(start - 1, 0):end]
+    listed = "; ".join(f"{t.get('date')} {t.get('description')} balance {t.get('balance')}" for t in rows)
+    return ("\n\nNote: a previous reading of this section produced running balances that do not add up "
+            f"around these rows: {listed}. Re-read them carefully, including which column each amount "
+            "is in and entries that span several lines.")
+
+
+def repair_chunks(parsed_chunks, reparse, tolerance=0.01):
+    """
+    Re-extract only the chunks whose rows break the balance chain.
+
+    reparse(chunk_index, hint) returns a fresh parse of that chunk (or None).
+    Returns the list of parsed chunks with improved chunks spliced in.
+    """
+    parsed_chunks = list(parsed_chunks)
+    merged, sources = merge_with_sources(parsed_chunks)
+    transactions = merged["transactions"]
+    segments = broken_segments(transactions, _opening_balance(merged), tolerance)
+    if not segments:
+        return parsed_chunks
+
+    # A break on a chunk's first row may equally be the previous chunk's last row
+    targets = {}
+    for segment in segments:
+        start, end = segment
+        chunks = set(sources[start:end])
+        if start > 0 and sources[start - 1] != sources[start]:
+            chunks.add(sources[start - 1])
+        for chunk in chunks:
+            targets.setdefault(chunk, segment)
+    print(f"Balance chain broken in {len(segments)} place(s); re-extracting chunk(s) {sorted(targets)}")
+
+    for chunk, segment in sorted(targets.items()):
+        # The chunk's own chain starts from the balance just before it
+        before = [t for t, source in zip(transactions, sources) if source < chunk]
+        opening = _numbers(pd.DataFrame(before[-1:]), "balance")[0] if before else _opening_balance(merged)
+        opening = None if opening is not None and np.isnan(opening) else opening
+
+        try:
+            fresh = reparse(chunk, repair_hint(transactions, segment))
+        except Exception as e:
+            print(f"Re-extraction of chunk {chunk} failed: {e}")
+            continue
+        if not isinstance(fresh, dict):
+            continue
+        old_breaks = _chunk_breaks(parsed_chunks[chunk], opening, tolerance)
+        new_breaks = _chunk_breaks(fresh, opening, tolerance)
+        if new_breaks < old_breaks:
+            parsed_chunks[chunk] = fresh
+            print(f"Chunk {chunk}: {old_breaks} -> {new_breaks} broken rows after re-extraction")
+    return parsed_chunks
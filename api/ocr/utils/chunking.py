@@ -0,0 +1,155 @@
+import io
+import csv
+import asyncio
+
+# How many transactions at the end of one chunk are compared with the start
+# of the next when removing rows duplicated across a chunk boundary
+BOUNDARY_WINDOW = 5
+
+
+def _transaction_key(transaction):
+    if not isinstance(transaction, dict):
+        return repr(transaction)
+    return tuple(str(transaction.get(field)).strip().lower()
+                 for field in ("date", "description", "debit", "credit", "balance"))
+
+
+def dedupe_boundary(previous, following, window=BOUNDARY_WINDOW):
+    """
+    Drop leading transactions of `following` that repeat one of the last
+    `window` transactions of `previous` (a row straddling the boundary or a
+    page header picked up by both chunks). Stops at the first new row so
+    genuine repeated transactions further in are kept.
+    """
+    tail = {_transaction_key(t) for t in previous[-window:]}
+    start = 0
+    while start < len(following) and start < window and _transaction_key(following[start]) in tail:
+        start += 1
+    return following[start:]
+
+
+def split_text_chunks(text, max_chars, page_break="\n\n", header_lines=0):
+    """
+    Split OCR text into chunks of at most ~max_chars, cutting on page breaks
+    and falling back to line boundaries for oversized pages. The first
+    `header_lines` lines of the document (account and bank details) are
+    repeated at the top of every later chunk.
+    """
+    lines = text.split("\n")
+    header = "\n".join(lines[:header_lines]).strip() if header_lines else ""
+
+    pieces = []
+    for page in text.split(page_break):
+        if len(page) <= max_chars:
+            pieces.append(page)
+            continue
+        current = []
+        size = 0
+        for line in page.split("\n"):
+            if current and size + len(line) + 1 > max_chars:
+                pieces.append("\n".join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            pieces.append("\n".join(current))
+
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece) + len(page_break) > max_chars:
+            chunks.append(page_break.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + len(page_break)
+    if current:
+        chunks.append(page_break.join(current))
+
+    if header:
+        chunks = chunks[:1] + [header + "\n" + chunk for chunk in chunks[1:]]
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def split_csv_chunks(csv_text, rows_per_chunk):
+    """
+    Split CSV text into chunks of rows_per_chunk records, each starting with
+    the header line. Records are split with the csv module so quoted cells
+    containing newlines stay intact.
+    """
+    records = list(csv.reader(io.StringIO(csv_text)))
+    if len(records) <= rows_per_chunk + 1:
+        return [csv_text]
+    header, rows = records[0], records[1:]
+    chunks = []
+    for start in range(0, len(rows), rows_per_chunk):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows[start:start + rows_per_chunk])
+        chunks.append(buffer.getvalue())
+    return chunks
+
+
+async def parse_chunks(chunks, parse_async, max_concurrency, progress=None):
+    """
+    Parse chunks concurrently with at most max_concurrency requests in
+    flight; results keep chunk order. progress, if given, is called as
+    progress("llm", fraction) before the first request and as each chunk
+    finishes (it may raise to abort the parse).
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    done = 0
+
+    async def parse_one(chunk):
+        nonlocal done
+        async with semaphore:
+            result = await parse_async(chunk)
+        done += 1
+        if progress is not None:
+            progress("llm", done / len(chunks))
+        return result
+
+    if progress is not None:
+        progress("llm", 0.0)
+
+    return await asyncio.gather(*(parse_one(chunk) for chunk in chunks))
+
+
+def merge_with_sources(parsed_chunks):
+    """merge_parsed_chunks plus, for every merged transaction, the index of the chunk it came from"""
+    merged = {
+        "Account": None,
+        "Ledger": None,
+        "opening_balance": None,
+        "closing_balance": None,
+        "transactions": [],
+    }
+    sources = []
+    for index, parsed in enumerate(parsed_chunks):
+        if not isinstance(parsed, dict):
+            continue
+        for key in ("Account", "Ledger"):
+            if merged[key] is None and parsed.get(key):
+                merged[key] = parsed.get(key)
+        if index == 0:
+            merged["opening_balance"] = parsed.get("opening_balance")
+        if parsed.get("closing_balance") is not None:
+            merged["closing_balance"] = parsed.get("closing_balance")
+        transactions = parsed.get("transactions") or []
+        if merged["transactions"]:
+            transactions = dedupe_boundary(merged["transactions"], transactions)
+        merged["transactions"].extend(transactions)
+        sources.extend([index] * len(transactions))
+    return merged, sources
+
+
+def merge_parsed_chunks(parsed_chunks):
+    """
+    Merge per-chunk LLM results (in document order) into one statement.
+    Account/Ledger come from the first chunk that has them, the opening
+    balance from the first chunk and the closing balance from the last
+    chunk that reports one. Rows repeated across a chunk boundary are
+    dropped.
+    """
+    return merge_with_sources(parsed_chunks)[0]
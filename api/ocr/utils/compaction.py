@@ -0,0 +1,144 @@
+"""
+Input compaction before statements are sent to the LLM.
+
+Sheets converted to CSV and OCR text carry a lot of tokens that say
+nothing: empty rows and columns, NaN padding, "Unnamed: n" headers, page
+headers repeated on every page, page footers, runs of spaces and thousands
+separators. These are removed before the text is parsed, and the token
+counts before and after are reported.
+"""
+import io
+import re
+import csv
+import pandas as pd
+from api.ocr.local_excel_parser import sniff_header
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+EMPTY_CELLS = {"", "nan", "NaN", "NaT", "None", "none", "null"}
+UNNAMED_HEADER = re.compile(r"^Unnamed: \d+$")
+THOUSANDS_NUMBER = re.compile(r"(?<![\d.])-?\d{1,3}(?:,\d{3})+(?:\.\d+)?(?![\d,])")
+PLAIN_NUMBER = re.compile(r"^-?\d+(?:\.\d+)?$")
+AMOUNT = re.compile(r"\d+\.\d{2}\b")
+# Transaction lines start with a date (02/01/2024, 2024-01-02, 2 Jan 2024)
+DATE_START = re.compile(r"^(\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}|\d{1,2}[ -][A-Za-z]{3,9}\b)")
+BOILERPLATE = re.compile(
+    r"^(page \d+( of \d+)?|\d+ of \d+|continued( on next page)?|this is a (computer|system) generated .*)$",
+    re.I,
+)
+
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, otherwise the usual ~4 characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _strip_thousands(text):
+    return THOUSANDS_NUMBER.sub(lambda m: m.group(0).replace(",", ""), text)
+
+
+def _normalise_number(cell):
+    """1,234.50 -> 1234.5, 100.00 -> 100; other cells are returned unchanged"""
+    candidate = _strip_thousands(cell)
+    if not PLAIN_NUMBER.match(candidate):
+        return cell
+    if "." in candidate:
+        candidate = candidate.rstrip("0").rstrip(".")
+    return candidate or "0"
+
+
+def _compact_cell(cell):
+    cell = " ".join(str(cell).split())
+    if cell in EMPTY_CELLS or UNNAMED_HEADER.match(cell):
+        return ""
+    return _normalise_number(cell)
+
+
+def _header_index(rows):
+    """The sniffed column header row, else the first row (pandas writes the sheet header there)"""
+    header_index, _ = sniff_header(pd.DataFrame(rows))
+    return 0 if header_index is None else header_index
+
+
+def compact_csv_text(csv_text):
+    """
+    Compact CSV text: normalise cells and numbers, drop empty rows and
+    columns, boilerplate rows and repeats of the header row. Other repeated
+    rows are statement content and are kept.
+    """
+    rows = [[_compact_cell(cell) for cell in record] for record in csv.reader(io.StringIO(csv_text))]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return ""
+
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    keep = [column for column in range(width) if any(row[column] for row in rows)]
+    rows = [[row[column] for column in keep] for row in rows]
+
+    header_index = _header_index(rows)
+    compacted = []
+    for index, row in enumerate(rows):
+        if BOILERPLATE.match(" ".join(cell for cell in row if cell)):
+            continue
+        # The header row repeated on every printed page
+        if index > header_index and row == rows[header_index]:
+            continue
+        while row and not row[-1]:
+            row = row[:-1]
+        compacted.append(row)
+
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(compacted)
+    return buffer.getvalue()
+
+
+def compact_ocr_text(text, page_break="\n\n"):
+    """
+    Compact OCR / text-layer output: collapse whitespace (column gaps become
+    a tab), strip thousands separators, drop blank and boilerplate lines and
+    page headers. A page header is a line above a page's first amount that
+    already appeared above the first amount of an earlier page; lines
+    starting with a date are never dropped, nor is anything below the first
+    amount.
+    """
+    seen_headers = set()
+    lines = []
+    for page in text.split(page_break):
+        page_headers = set()
+        in_header = True
+        for line in page.split("\n"):
+            line = "\t".join(" ".join(part.split()) for part in re.split(r"\s{2,}|\t", line.strip()))
+            if not line or BOILERPLATE.match(line):
+                continue
+            line = _strip_thousands(line)
+            in_header = in_header and not AMOUNT.search(line)
+            if in_header and not DATE_START.match(line):
+                if line in seen_headers:
+                    continue
+                page_headers.add(line)
+            lines.append(line)
+        seen_headers |= page_headers
+    return "\n".join(lines)
+
+
+def report_compaction(kind, before, after):
+    """Print and return the token counts before and after compaction"""
+    tokens_before = count_tokens(before)
+    tokens_after = count_tokens(after)
+    saved = 100.0 * (1 - tokens_after / tokens_before) if tokens_before else 0.0
+    print(f"Compacted {kind} input: {tokens_before} -> {tokens_after} tokens ({saved:.0f}% saved)")
+    return tokens_before, tokens_after
+
+
+def compact_for_llm(text, kind):
+    """Compact CSV ("csv") or OCR ("ocr") text and report the saving"""
+    compacted = compact_csv_text(text) if kind == "csv" else compact_ocr_text(text)
+    report_compaction(kind, text, compacted)
+    return compacted
@@ -1,9 +1,15 @@
+import os
+import logging
 import pandas as pd
 import xlsxwriter
+from datetime import datetime
+from api.ledger.normalised import write_ledger, ledger_path_for
+from api.ocr.utils.stage_timer import timed
+
+logger = logging.getLogger(__name__)
 
 def export_to_excel(df, output_path, account=None, ledger=None, opening_balance=None, closing_balance=None):
-    print("===== here is export to excel")
-    with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+    with pd.ExcelWriter(output_path, engine='xlsxwriter', date_format='yyyy-mm-dd', datetime_format='yyyy-mm-dd') as writer:
         workbook = writer.book
         worksheet = workbook.add_worksheet("Statement")
         writer.sheets["Statement"] = worksheet
@@ -25,4 +31,25 @@ def export_to_excel(df, output_path, account=None, ledger=None, opening_balance=
         df_start_row = 4
         df.to_excel(writer, sheet_name="Statement", startrow=df_start_row, index=False)
 
-        print(f"Excel file saved to: {output_path}")
+        logger.info(f"Excel file saved to: {output_path}")
+
+
+def output_path_for(file_name, output_dir='./data/output/'):
+    """Timestamped export path for an uploaded statement"""
+    time_str = datetime.now().strftime("_%Y%m%d_%H%M%S")
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(file_name))[0] + time_str + '.xlsx')
+
+
+@timed("export")
+def export_ledger(ledger, output_path):
+    """Write the Excel export and the normalised Parquet ledger next to it"""
+    export_to_excel(
+        ledger.transactions,
+        output_path=output_path,
+        account=ledger.account,
+        ledger=ledger.ledger,
+        opening_balance=ledger.opening_balance,
+        closing_balance=ledger.closing_balance
+    )
+    write_ledger(ledger, ledger_path_for(output_path))
+    return output_path
@@ -0,0 +1,194 @@
+"""
+Offline stand-in for the OpenAI chat completions client.
+
+FakeClient / AsyncFakeClient expose the small part of the OpenAI client the
+parsers use (chat.completions.create, plain or streamed) and answer with a
+deterministic parse of the statement text: each line with a date and
+amounts becomes a transaction, the last amount being the balance and the
+balance movement deciding debit or credit. Responses follow the schema the
+system prompt asks for (columnar or verbose JSON).
+
+Latency is simulated as llm_fake_latency_ms before the first token plus
+llm_fake_ms_per_token for each output token, so pipeline changes can be
+measured on a machine without network access.
+"""
+import re
+import io
+import csv
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+import pandas as pd
+from api.ocr.local_excel_parser import OPENING_PATTERN, CLOSING_PATTERN, TOTAL_PATTERN
+from api.ocr.utils.compaction import count_tokens
+from api.reconciler.config_utils import load_config
+
+config = load_config()
+
+DATE_PATTERN = re.compile(
+    r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{1,2}[ -][A-Za-z]{3}[ -]\d{2,4})\b"
+)
+AMOUNT_PATTERN = re.compile(r"\(?-?\d{1,3}(?:,\d{3})*(?:\.\d{2})\)?|\(?-?\d+\.\d{2}\)?")
+NUMBER_CELL = re.compile(r"^\(?-?\d[\d,]*(?:\.\d+)?\)?$")
+TIME_PATTERN = re.compile(r"\b\d{2}:\d{2}(?::\d{2})?\b")
+LABEL_PATTERN = r"^\s*{label}\s*[:|,]\s*(.+?)\s*$"
+STREAM_CHUNK_CHARS = 16
+
+
+def _amount(text):
+    negative = text.startswith("(") or text.startswith("-")
+    value = float(text.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+
+def _cells(line, is_csv):
+    if is_csv:
+        return [cell.strip() for cell in next(csv.reader(io.StringIO(line)), [])]
+    return [cell.strip() for cell in re.split(r"\s{2,}|\t|\|", line)]
+
+
+def _labelled(text, labels):
+    for label in labels:
+        match = re.search(LABEL_PATTERN.format(label=label), text, re.I | re.M)
+        if match:
+            return match.group(1).strip(" ,|")
+    return None
+
+
+def fake_parse(text, is_csv=False):
+    """Deterministic statement parse of OCR or CSV text: {"Account", "Ledger", ..., "transactions"}"""
+    transactions = []
+    opening = closing = None
+    previous_balance = None
+    for line in text.splitlines():
+        cells = [cell for cell in _cells(line, is_csv) if cell]
+        line_text = " ".join(cells)
+        date = DATE_PATTERN.search(line_text)
+        # Dotted dates (01.02.2024) would also read as amounts
+        rest = line_text.replace(date.group(1), " ", 1) if date else line_text
+        if is_csv:
+            # Sheet cells hold plain numbers (100, 2755.1) rather than printed amounts
+            numbers = [cell for cell in cells if NUMBER_CELL.match(cell) and not DATE_PATTERN.search(cell)]
+            amounts = [_amount(cell) for cell in numbers]
+            rest = " ".join(cell for cell in rest.split(" ") if cell not in numbers)
+        else:
+            amounts = [_amount(m) for m in AMOUNT_PATTERN.findall(rest)]
+        if OPENING_PATTERN.search(line_text) and amounts:
+            opening = previous_balance = amounts[-1]
+            continue
+        if CLOSING_PATTERN.search(line_text) and amounts:
+            closing = amounts[-1]
+            continue
+        if TOTAL_PATTERN.search(line_text) or not amounts or not date:
+            continue
+        iso = re.match(r"\d{4}-", date.group(1)) is not None
+        parsed_date = pd.to_datetime(date.group(1), dayfirst=not iso, errors="coerce")
+        if pd.isna(parsed_date):
+            continue
+
+        balance = amounts[-1] if len(amounts) >= 2 else None
+        movement = abs(amounts[0])
+        debit, credit = movement, 0.0
+        if balance is not None and previous_balance is not None and balance > previous_balance:
+            debit, credit = 0.0, movement
+        description = TIME_PATTERN.sub("", AMOUNT_PATTERN.sub("", rest))
+        transactions.append({
+            "date": parsed_date.strftime("%Y-%m-%d"),
+            "description": " ".join(description.split()),
+            "debit": debit,
+            "credit": credit,
+            "balance": balance,
+        })
+        previous_balance = balance if balance is not None else previous_balance
+
+    if closing is None and transactions:
+        closing = transactions[-1]["balance"]
+    return {
+        "Account": _labelled(text, ("account name", "account holder", "customer name")),
+        "Ledger": _labelled(text, ("bank name", "bank")),
+        "opening_balance": opening,
+        "closing_balance": closing,
+        "transactions": transactions,
+    }
+
+
+def fake_response(messages):
+    """Response text for a chat request, in the schema its system prompt asks for"""
+    prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    text = "\n".join(m["content"] for m in messages if m["role"] == "user")
+    parsed = fake_parse(text, is_csv="CSV" in prompt)
+    if '"columns"' in prompt:
+        transactions = parsed.pop("transactions")
+        parsed["columns"] = ["date", "description", "debit", "credit", "balance"]
+        parsed["rows"] = [[t["date"], t["description"], t["debit"], t["credit"], t["balance"]] for t in transactions]
+    return json.dumps(parsed)
+
+
+def _latency(content):
+    first_token = config.get("llm_fake_latency_ms", 300) / 1000
+    per_token = config.get("llm_fake_ms_per_token", 5) / 1000
+    return first_token, per_token * count_tokens(content)
+
+
+def _message(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content), delta=None)])
+
+
+def _delta(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=None, delta=SimpleNamespace(content=content))])
+
+
+def _pieces(content):
+    return [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+
+
+class _Completions:
+    def create(self, model=None, messages=(), stream=False, **kwargs):
+        content = fake_response(messages)
+        first_token, generation = _latency(content)
+        time.sleep(first_token)
+        if not stream:
+            time.sleep(generation)
+            return _message(content)
+
+        def chunks():
+            pieces = _pieces(content)
+            for piece in pieces:
+                time.sleep(generation / len(pieces))
+                yield _delta(piece)
+        return chunks()
+
+
+class _AsyncCompletions:
+    async def create(self, model=None, messages=(), stream=False, **kwargs):
+        content = fake_response(messages)
+        first_token, generation = _latency(content)
+        await asyncio.sleep(first_token)
+        if not stream:
+            await asyncio.sleep(generation)
+            return _message(content)
+
+        async def chunks():
+            pieces = _pieces(content)
+            for piece in pieces:
+                await asyncio.sleep(generation / len(pieces))
+                yield _delta(piece)
+        return chunks()
+
+
+class FakeClient:
+    """Drop-in for openai.OpenAI in the parsers"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=_Completions())
+
+
+class AsyncFakeClient:
+    """Drop-in for openai.AsyncOpenAI in the parsers"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=_AsyncCompletions())
+
+    async def close(self):
+        pass
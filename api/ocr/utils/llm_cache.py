@@ -0,0 +1,189 @@
+"""
+On-disk cache for LLM statement parsing.
+
+Responses are keyed by a hash of (system prompt, model, LLM endpoint,
+normalised input text) and stored one JSON file per key under
+data/cache/llm. The endpoint (llm_client.endpoint(): the provider and
+llm_base_url) keeps replies from the fake provider or another server from
+being served in place of the OpenAI API's. Files are written with an
+atomic replace, so the cache is safe to share between Streamlit sessions,
+job workers and service processes. Entries expire after
+llm_cache_ttl_hours and the least recently used ones are evicted once the
+directory grows past llm_cache_max_mb. Writes keep a running size total,
+so the directory is only scanned when that passes the limit or every
+EVICT_EVERY writes.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from api.ocr.llm_client import endpoint
+from api.reconciler.config_utils import load_config
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+CACHE_DIR = config.get("llm_cache_dir", "./data/cache/llm")
+CACHE_SUFFIX = ".json"
+# Writes between full directory scans, while the size estimate stays under the limit
+EVICT_EVERY = 100
+
+# Directory size as of the last scan plus this process's writes since (None until the first scan)
+_cache_bytes = None
+_writes_since_scan = 0
+_size_lock = threading.Lock()
+
+
+def normalise_text(text):
+    """Drop whitespace differences that do not change what the model sees"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(prompt, model, text, llm_endpoint=None):
+    """Key for a parse of text; llm_endpoint defaults to the configured llm_client.endpoint()"""
+    digest = hashlib.sha256()
+    for part in (prompt.strip(), model, llm_endpoint or endpoint(), normalise_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _enabled():
+    return config.get("llm_cache_enabled", True)
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key + CACHE_SUFFIX)
+
+
+def get(key):
+    """Cached response for key, or None if missing or expired"""
+    path = _entry_path(key)
+    try:
+        age = time.time() - os.path.getmtime(path)
+        if age > config.get("llm_cache_ttl_hours", 24 * 7) * 3600:
+            os.remove(path)
+            return None
+        with open(path, "r") as f:
+            value = json.load(f)
+        # Record the hit for LRU eviction without touching the expiry clock
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+        return value
+    except (OSError, ValueError):
+        return None
+
+
+def put(key, value):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _entry_path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, _entry_path(key))
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write LLM cache entry: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    _record_write(_entry_path(key))
+
+
+def _max_bytes():
+    return config.get("llm_cache_max_mb", 200) * 1024 * 1024
+
+
+def _record_write(path):
+    """
+    Add a written entry to the size estimate; scan the directory (evict())
+    only when the estimate passes the limit or every EVICT_EVERY writes, as
+    other processes write to the same directory
+    """
+    global _cache_bytes, _writes_since_scan
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    with _size_lock:
+        _writes_since_scan += 1
+        if _cache_bytes is not None:
+            _cache_bytes += size
+        due = _cache_bytes is None or _cache_bytes > _max_bytes() or _writes_since_scan >= EVICT_EVERY
+    if due:
+        evict()
+
+
+def evict(max_bytes=None):
+    """Remove expired entries, then least recently used ones until under the size limit"""
+    global _cache_bytes, _writes_since_scan
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+    ttl = config.get("llm_cache_ttl_hours", 24 * 7) * 3600
+    now = time.time()
+    entries = []
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(CACHE_SUFFIX):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+            if now - stat.st_mtime > ttl:
+                os.remove(path)
+                continue
+        except OSError:
+            continue
+        entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    with _size_lock:
+        _cache_bytes = total
+        _writes_since_scan = 0
+
+
+def clear():
+    evict(max_bytes=0)
+
+
+def cached_completion(prompt, model, text, compute):
+    """Return the cached parse for this input, or call compute() and cache its result"""
+    if not _enabled():
+        return compute()
+    key = cache_key(prompt, model, text)
+    cached = get(key)
+    if cached is not None:
+        logger.info(f"LLM cache hit {key[:12]}")
+        return cached
+    value = compute()
+    if value is not None:
+        put(key, value)
+    return value
+
+
+async def cached_completion_async(prompt, model, text, compute):
+    """Async variant of cached_completion; compute is a coroutine function"""
+    if not _enabled():
+        return await compute()
+    key = cache_key(prompt, model, text)
+    cached = get(key)
+    if cached is not None:
+        logger.info(f"LLM cache hit {key[:12]}")
+        return cached
+    value = await compute()
+    if value is not None:
+        put(key, value)
+    return value
@@ -0,0 +1,163 @@
+"""
+Statement parsing requests shared by the PDF/image and Excel parsers.
+
+The input is compacted and sent with the parser's columnar prompt; a
+rejected columnar reply is retried with its verbose JSON prompt. Parses
+are cached (llm_cache). With on_rows, the response is streamed and
+complete transaction rows are passed to on_rows as they arrive; a cache
+hit passes its rows in one go, and on_rows(None) discards the rows of a
+reply that was rejected before it is retried.
+
+Chunked parsers bind on_rows to a chunk with for_chunk(), so a discarded
+chunk leaves the rows other chunks streamed in place.
+"""
+import json
+import functools
+from api.ocr.utils.compaction import compact_for_llm
+from api.ocr.utils.llm_schema import decode_columnar
+from api.ocr.utils.stream_rows import TransactionStream
+from api.ocr.utils.llm_cache import cached_completion, cached_completion_async
+from api.ocr.llm_client import create_client, async_client
+from api.ocr.utils.stage_timer import timed
+from api.reconciler.config_utils import load_config
+
+config = load_config()
+
+MODEL = "gpt-4o"
+
+# OpenAI (or a stand-in, see llm_client) chat completions client, created on first use
+_client = None
+
+
+def sync_client():
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+def for_chunk(on_rows, chunk):
+    """on_rows for one chunk of a document: on_rows(rows, chunk=chunk)"""
+    if on_rows is None:
+        return None
+    return functools.partial(on_rows, chunk=chunk)
+
+
+class _Preview:
+    """Pass streamed rows on, and the rows of a cached parse that never reached the model"""
+
+    def __init__(self, on_rows):
+        self.on_rows = on_rows
+        self.sent = False
+
+    def __call__(self, rows):
+        self.sent = True
+        self.on_rows(rows)
+
+    def finish(self, parsed):
+        if not self.sent and isinstance(parsed, dict):
+            self.on_rows(parsed.get("transactions") or [])
+        return parsed
+
+
+def _messages(prompt, text):
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": text}
+    ]
+
+
+@timed("llm")
+def request(prompt, text, on_rows=None, columnar=False):
+    """One chat completion in JSON mode; streamed into on_rows when given"""
+    if on_rows is None:
+        response = sync_client().chat.completions.create(
+            model=MODEL,
+            messages=_messages(prompt, text),
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    # Stream the response and hand complete rows to on_rows as they arrive
+    rows = TransactionStream(columnar=columnar)
+    parts = []
+    for chunk in sync_client().chat.completions.create(model=MODEL, messages=_messages(prompt, text),
+                                                       response_format={"type": "json_object"}, stream=True):
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            new_rows = rows.feed(delta)
+            if new_rows:
+                on_rows(new_rows)
+    return json.loads("".join(parts))
+
+
+@timed("llm")
+async def request_async(prompt, text, on_rows=None, columnar=False):
+    """Async variant of request, using the async_client() of the running event loop"""
+    if on_rows is None:
+        response = await async_client().chat.completions.create(
+            model=MODEL,
+            messages=_messages(prompt, text),
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    rows = TransactionStream(columnar=columnar)
+    parts = []
+    stream = await async_client().chat.completions.create(model=MODEL, messages=_messages(prompt, text),
+                                                          response_format={"type": "json_object"}, stream=True)
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            new_rows = rows.feed(delta)
+            if new_rows:
+                on_rows(new_rows)
+    return json.loads("".join(parts))
+
+
+def parse_statement(text, system_prompt, columnar_prompt, kind, on_rows=None):
+    """
+    Parse statement text ("ocr" or "csv" kind, for compaction) with the
+    columnar prompt, falling back to the verbose system prompt
+    """
+    if config.get("llm_compact_input", True):
+        text = compact_for_llm(text, kind)
+    if config.get("llm_output_format", "columnar") == "columnar":
+        preview = _Preview(on_rows) if on_rows is not None else None
+        try:
+            parsed = cached_completion(columnar_prompt, MODEL, text,
+                                       lambda: decode_columnar(request(columnar_prompt, text, preview, True)))
+            return preview.finish(parsed) if preview else parsed
+        except ValueError as e:
+            print(f"Columnar response rejected ({e}), retrying in JSON mode")
+            if on_rows is not None:
+                # Discard rows already streamed from the rejected response
+                on_rows(None)
+    preview = _Preview(on_rows) if on_rows is not None else None
+    parsed = cached_completion(system_prompt, MODEL, text, lambda: request(system_prompt, text, preview))
+    return preview.finish(parsed) if preview else parsed
+
+
+async def parse_statement_async(text, system_prompt, columnar_prompt, kind, on_rows=None):
+    """Async variant of parse_statement for concurrent chunks"""
+    if config.get("llm_compact_input", True):
+        text = compact_for_llm(text, kind)
+    if config.get("llm_output_format", "columnar") == "columnar":
+        preview = _Preview(on_rows) if on_rows is not None else None
+
+        async def compute_columnar():
+            return decode_columnar(await request_async(columnar_prompt, text, preview, True))
+        try:
+            parsed = await cached_completion_async(columnar_prompt, MODEL, text, compute_columnar)
+            return preview.finish(parsed) if preview else parsed
+        except ValueError as e:
+            print(f"Columnar response rejected ({e}), retrying in JSON mode")
+            if on_rows is not None:
+                # Discard rows already streamed from the rejected response
+                on_rows(None)
+    preview = _Preview(on_rows) if on_rows is not None else None
+    parsed = await cached_completion_async(system_prompt, MODEL, text,
+                                           lambda: request_async(system_prompt, text, preview))
+    return preview.finish(parsed) if preview else parsed
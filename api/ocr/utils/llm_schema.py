@@ -0,0 +1,89 @@
+"""
+Compact columnar response schema for statement parsing.
+
+Instead of one object per transaction repeating "date", "description",
+"debit", "credit" and "balance", the model returns the column names once
+and every transaction as an array. On long statements that roughly halves
+the output tokens, which dominate generation time. decode_columnar checks
+the response strictly and rebuilds the usual parsed-statement dict; any
+inconsistency raises ValueError so the caller can retry in the verbose JSON
+mode.
+"""
+import math
+
+COLUMNS = ["date", "description", "debit", "credit", "balance"]
+REQUIRED_COLUMNS = ["date", "description", "debit", "credit"]
+
+COLUMNAR_FORMAT = """
+Return a JSON object with:
+    - "Account": full account name
+    - "Ledger": bank name
+    - "opening_balance": float, or null if there is no opening balance or previous balance field
+    - "closing_balance": float
+    - "columns": ["date", "description", "debit", "credit", "balance"]
+    - "rows": one array per transaction, values in the order of "columns", e.g.
+      ["2024-01-31", "Card payment", 12.5, 0, 1040.25]
+Dates as YYYY-MM-DD. Amounts as plain numbers, 0 when empty. Balance as printed (don't calculate).
+Handle multi-line entries and currency symbols."""
+
+
+def columnar_prompt(task):
+    """System prompt asking for the columnar schema; task is the parser's opening instruction"""
+    return task.strip() + "\n" + COLUMNAR_FORMAT
+
+
+def _to_amount(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Not an amount: {value!r}")
+    if math.isnan(value):
+        return default
+    return value
+
+
+def row_to_transaction(columns, row):
+    """One columnar row as a transaction dict; ValueError if it does not fit the columns"""
+    if not isinstance(row, list) or len(row) != len(columns):
+        raise ValueError(f"Row does not have {len(columns)} values: {row!r}")
+    values = dict(zip(columns, row))
+    return {
+        "date": values["date"],
+        "description": "" if values["description"] is None else str(values["description"]),
+        "debit": _to_amount(values["debit"], 0.0),
+        "credit": _to_amount(values["credit"], 0.0),
+        "balance": _to_amount(values["balance"], None) if "balance" in values else None,
+    }
+
+
+def decode_columnar(payload):
+    """Validate a columnar response and rebuild {"Account", ..., "transactions": [...]}"""
+    if not isinstance(payload, dict):
+        raise ValueError("Response is not a JSON object")
+    columns = payload.get("columns")
+    rows = payload.get("rows")
+    if not isinstance(columns, list) or not isinstance(rows, list):
+        raise ValueError("Response has no columns/rows")
+    columns = [str(column).strip().lower() for column in columns]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Response is missing columns {missing}")
+
+    transactions = []
+    for number, row in enumerate(rows):
+        try:
+            transactions.append(row_to_transaction(columns, row))
+        except ValueError as e:
+            raise ValueError(f"Row {number}: {e}")
+
+    return {
+        "Account": payload.get("Account"),
+        "Ledger": payload.get("Ledger"),
+        "opening_balance": payload.get("opening_balance"),
+        "closing_balance": payload.get("closing_balance"),
+        "transactions": transactions,
+    }
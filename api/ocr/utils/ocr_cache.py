@@ -0,0 +1,192 @@
+"""
+Page-level OCR result cache.
+
+Statements are often re-uploaded after a failed LLM parse. Each OCR'd page
+is stored as doctr's page export (words with their geometry) plus its
+rendered text, keyed by a hash of the rendered page pixels and the OCR
+profile (models, backend, pre-processing), so a re-upload skips OCR
+entirely and a configuration change never returns stale results. Entries
+live one JSON file per page under data/cache/ocr; the least recently used
+are evicted past ocr_cache_max_mb. As in llm_cache, writes keep a running
+size total and the directory is only scanned when that passes the limit or
+every EVICT_EVERY writes.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from api.reconciler.config_utils import load_config
+from api.ocr.model_registry import predictor_options
+from api.ocr.utils.preprocess import preprocess_signature
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+CACHE_DIR = config.get("ocr_cache_dir", "./data/cache/ocr")
+CACHE_SUFFIX = ".json"
+# Writes between full directory scans, while the size estimate stays under the limit
+EVICT_EVERY = 100
+
+# Directory size as of the last scan plus this process's writes since (None until the first scan)
+_cache_bytes = None
+_writes_since_scan = 0
+_size_lock = threading.Lock()
+
+
+def enabled():
+    return config.get("ocr_cache_enabled", True)
+
+
+def ocr_profile():
+    """Everything besides the pixels that changes the OCR output"""
+    options = predictor_options()
+    parts = [f"{key}={options[key]}" for key in sorted(options)]
+    parts.append(f"backend={config.get('ocr_backend', 'torch')}")
+    parts.append(f"int8={config.get('ocr_onnx_quantize', False)}")
+    parts.append(preprocess_signature())
+    return ";".join(parts)
+
+
+def page_key(image, profile=None):
+    """Hash of the rendered page (shape, dtype and pixels) and the OCR profile"""
+    digest = hashlib.sha256()
+    digest.update(f"{image.shape}|{image.dtype}|{profile or ocr_profile()}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key + CACHE_SUFFIX)
+
+
+def _json_default(value):
+    # doctr exports may hold numpy scalars/arrays
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Not JSON serialisable: {type(value).__name__}")
+
+
+def plain_export(page):
+    """doctr page export as plain JSON types, the same whether fresh or cached"""
+    return json.loads(json.dumps(page.export(), default=_json_default))
+
+
+def get(key):
+    """Cached {"text", "export"} for a page, or None"""
+    path = _entry_path(key)
+    try:
+        with open(path, "r") as f:
+            value = json.load(f)
+        os.utime(path, None)
+        return value
+    except (OSError, ValueError):
+        return None
+
+
+def put(key, text, export):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _entry_path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"text": text, "export": export}, f, default=_json_default)
+        os.replace(tmp_path, _entry_path(key))
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write OCR cache entry: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    _record_write(_entry_path(key))
+
+
+def _max_bytes():
+    return config.get("ocr_cache_max_mb", 500) * 1024 * 1024
+
+
+def _record_write(path):
+    """Add a written entry to the size estimate; evict() when it passes the limit or every EVICT_EVERY writes"""
+    global _cache_bytes, _writes_since_scan
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    with _size_lock:
+        _writes_since_scan += 1
+        if _cache_bytes is not None:
+            _cache_bytes += size
+        due = _cache_bytes is None or _cache_bytes > _max_bytes() or _writes_since_scan >= EVICT_EVERY
+    if due:
+        evict()
+
+
+def evict(max_bytes=None):
+    """Remove least recently used entries until the cache is under the size limit"""
+    global _cache_bytes, _writes_since_scan
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    entries = []
+    for name in names:
+        if not name.endswith(CACHE_SUFFIX):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    with _size_lock:
+        _cache_bytes = total
+        _writes_since_scan = 0
+
+
+def clear():
+    evict(max_bytes=0)
+
+
+def cached_ocr(pages, recognise):
+    """
+    OCR (index, image) pages through the cache. recognise(images) runs OCR
+    on the misses and returns doctr pages. Returns a list of
+    (index, text, export) in input order.
+    """
+    if not enabled():
+        return [(index, page.render(), plain_export(page))
+                for (index, _), page in zip(pages, recognise([image for _, image in pages]))]
+
+    start = time.perf_counter()
+    profile = ocr_profile()
+    keys = [page_key(image, profile) for _, image in pages]
+    results = {}
+    misses = []
+    for (index, image), key in zip(pages, keys):
+        cached = get(key)
+        if cached is not None:
+            results[index] = (cached["text"], cached["export"])
+        else:
+            misses.append((index, image, key))
+
+    if misses:
+        for (index, _, key), page in zip(misses, recognise([image for _, image, _ in misses])):
+            text, export = page.render(), plain_export(page)
+            put(key, text, export)
+            results[index] = (text, export)
+    if len(misses) < len(pages):
+        logger.info(f"OCR cache: {len(pages) - len(misses)} of {len(pages)} pages cached "
+                    f"({time.perf_counter() - start:.2f}s)")
+    return [(index, *results[index]) for index, _ in pages]
@@ -0,0 +1,57 @@
+import numpy as np
+import pypdfium2 as pdfium
+from PIL import Image
+from api.ocr.utils.stage_timer import timed
+
+PDF_POINTS_PER_INCH = 72
+
+
+def open_pdf(file_bytes):
+    return pdfium.PdfDocument(file_bytes)
+
+
+@timed("render")
+def render_page(pdf, index, dpi):
+    """Render one PDF page to an RGB uint8 array"""
+    page = pdf[index]
+    try:
+        bitmap = page.render(scale=dpi / PDF_POINTS_PER_INCH)
+        image = np.asarray(bitmap.to_pil().convert("RGB"))
+        bitmap.close()
+        return image
+    finally:
+        page.close()
+
+
+def iter_pdf_pages(file_bytes, dpi=144):
+    """Lazily yield (page_index, image) for each page of a PDF"""
+    pdf = open_pdf(file_bytes)
+    try:
+        for index in range(len(pdf)):
+            yield index, render_page(pdf, index, dpi)
+    finally:
+        pdf.close()
+
+
+def iter_batches(items, batch_size):
+    """Group an iterable into lists of at most batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_pages(paths, dpi=144):
+    """Render PDFs and load images from disk into a list of RGB page arrays"""
+    pages = []
+    for path in paths:
+        if str(path).lower().endswith(".pdf"):
+            with open(path, "rb") as f:
+                pages.extend(image for _, image in iter_pdf_pages(f.read(), dpi))
+        else:
+            pages.append(np.asarray(Image.open(path).convert("RGB")))
+    return pages
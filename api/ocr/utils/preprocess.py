@@ -0,0 +1,97 @@
+"""
+Page image pre-processing before OCR detection.
+
+Phone photos arrive at 12+ megapixels, far more than the recogniser needs,
+and are often slightly rotated. Pages are downscaled so their long side is
+at most ocr_max_side pixels, converted to grayscale (kept 3-channel for
+doctr) and deskewed by the angle that makes text rows line up best.
+"""
+import cv2
+import numpy as np
+from api.reconciler.config_utils import load_config
+
+config = load_config()
+
+# Deskew angle search runs on a copy this wide
+DESKEW_WIDTH = 800
+DESKEW_STEP = 0.25
+MIN_DESKEW_ANGLE = 0.3
+
+
+def downscale(image, max_side):
+    """Shrink so the long side is at most max_side pixels (no limit if max_side is 0 or None)"""
+    if not max_side:
+        return image
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def to_grayscale(image):
+    """Grayscale, but still 3 channels as the detection model expects"""
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+
+
+def _rotate(image, angle, border):
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=border)
+
+
+def skew_angle(image, max_angle=5.0):
+    """
+    Angle (degrees) that straightens the text: the rotation whose row
+    projection of ink pixels is sharpest. 0.0 when nothing better is found.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    if gray.shape[1] > DESKEW_WIDTH:
+        small = downscale(gray, int(DESKEW_WIDTH * max(gray.shape) / gray.shape[1]))
+    else:
+        small = gray
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if not ink.any():
+        return 0.0
+
+    def sharpness(angle):
+        rows = _rotate(ink, angle, 0).sum(axis=1, dtype=np.float64)
+        return np.square(np.diff(rows)).sum()
+
+    angles = np.arange(-max_angle, max_angle + DESKEW_STEP / 2, DESKEW_STEP)
+    scores = [sharpness(angle) for angle in angles]
+    best = float(angles[int(np.argmax(scores))])
+    if scores[int(np.argmax(scores))] <= sharpness(0.0):
+        return 0.0
+    return best
+
+
+def deskew(image, max_angle=5.0):
+    angle = skew_angle(image, max_angle)
+    if abs(angle) < MIN_DESKEW_ANGLE:
+        return image
+    return _rotate(image, angle, (255,) * (1 if image.ndim == 2 else image.shape[2]))
+
+
+def preprocess_page(image):
+    """Apply the configured pre-processing steps to an RGB page array"""
+    if not config.get("ocr_preprocess", True):
+        return image
+    image = downscale(image, config.get("ocr_max_side", 2400))
+    if config.get("ocr_grayscale", True):
+        image = to_grayscale(image)
+    if config.get("ocr_deskew", True):
+        image = deskew(image, config.get("ocr_deskew_max_angle", 5.0))
+    return image
+
+
+def preprocess_signature():
+    """The settings that change pre-processing output, for cache keys"""
+    if not config.get("ocr_preprocess", True):
+        return "none"
+    return (f"max{config.get('ocr_max_side', 2400)}-gray{int(config.get('ocr_grayscale', True))}"
+            f"-deskew{int(config.get('ocr_deskew', True))}:{config.get('ocr_deskew_max_angle', 5.0)}")
@@ -0,0 +1,60 @@
+"""
+Per-stage wall-clock accounting (render, OCR, LLM, validate, export).
+
+Functions decorated with @timed("stage") add their duration to a
+process-wide tally that benchmarks read with snapshot() and clear with
+reset(). Stages running concurrently (OCR on one thread, several LLM
+requests on the event loop) each count their own time, so stage totals
+can add up to more than the elapsed time.
+"""
+import time
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_seconds = defaultdict(float)
+_calls = defaultdict(int)
+
+
+def record(stage, seconds):
+    with _lock:
+        _seconds[stage] += seconds
+        _calls[stage] += 1
+
+
+def snapshot():
+    """{stage: (total_seconds, calls)}"""
+    with _lock:
+        return {stage: (_seconds[stage], _calls[stage]) for stage in _seconds}
+
+
+def reset():
+    with _lock:
+        _seconds.clear()
+        _calls.clear()
+
+
+def timed(stage):
+    """Decorator recording each call's duration under stage; works on plain and async functions"""
+    def decorate(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    record(stage, time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(function)
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return timed_call
+    return decorate
@@ -0,0 +1,101 @@
+import re
+import json
+from api.ocr.utils.llm_schema import COLUMNS, row_to_transaction
+
+
+class JsonArrayStream:
+    """
+    Incrementally pull complete elements out of the array stored under `key`
+    in a JSON object that arrives in pieces (a streamed LLM response).
+    Elements are returned from feed() as soon as their closing bracket,
+    brace or quote has arrived; nested arrays/objects and strings are
+    tracked so brackets inside descriptions do not confuse it.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.buffer = ""
+        self.done = False
+        self._pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._pos = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, delta):
+        self.buffer += delta or ""
+        elements = []
+        if self.done:
+            return elements
+        if self._pos is None:
+            match = self._pattern.search(self.buffer)
+            if not match:
+                return elements
+            self._pos = match.end()
+
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        elements.append(json.loads(buffer[self._start:i + 1]))
+                        self._start = None
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 0:
+                    self._start = i
+            elif char in "[{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char in "]}":
+                if self._depth == 0:
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    elements.append(json.loads(buffer[self._start:i + 1]))
+                    self._start = None
+            i += 1
+        self._pos = i
+        return elements
+
+
+class TransactionStream:
+    """
+    Turn streamed response text into transaction dicts as rows complete.
+    Handles both the columnar schema ("columns" + "rows") and the verbose
+    JSON schema ("transactions" objects).
+    """
+
+    def __init__(self, columnar=True):
+        self.columnar = columnar
+        self._columns = JsonArrayStream("columns")
+        self._rows = JsonArrayStream("rows" if columnar else "transactions")
+        self.columns = []
+
+    def feed(self, delta):
+        if not self.columnar:
+            return [row for row in self._rows.feed(delta) if isinstance(row, dict)]
+        self.columns.extend(str(c).strip().lower() for c in self._columns.feed(delta))
+        columns = self.columns if self._columns.done else COLUMNS
+        transactions = []
+        for row in self._rows.feed(delta):
+            try:
+                transactions.append(row_to_transaction(columns, row))
+            except (ValueError, KeyError):
+                # The strict decoder will reject the full response; skip the preview row
+                continue
+        return transactions
+
+    @property
+    def text(self):
+        return self._rows.buffer
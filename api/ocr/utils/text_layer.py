@@ -0,0 +1,103 @@
+"""
+Text-layer extraction for digitally generated PDFs.
+
+Pages that already carry a usable text layer are read directly with
+pypdfium2, rebuilding lines from the positioned text runs so the output
+reads like doctr's render(). Scanned pages (no or unusable text layer)
+return None and go through OCR instead.
+"""
+import unicodedata
+
+# Text runs whose vertical centres are closer than this fraction of the
+# line height are treated as one line
+LINE_MERGE_RATIO = 0.5
+# A gap wider than this many average character widths becomes a column gap
+COLUMN_GAP_CHARS = 2.0
+
+
+def _is_usable(text, min_chars):
+    visible = [c for c in text if not c.isspace()]
+    if len(visible) < min_chars:
+        return False
+    # Broken font encodings come out as replacement or private-use characters
+    garbage = sum(1 for c in visible if c == "�" or unicodedata.category(c) in ("Co", "Cn"))
+    if garbage / len(visible) > 0.1:
+        return False
+    readable = sum(1 for c in visible if c.isalnum())
+    return readable / len(visible) >= 0.5
+
+
+def _text_runs(textpage):
+    """(left, bottom, right, top, text) for each text rectangle on the page"""
+    runs = []
+    for i in range(textpage.count_rects()):
+        left, bottom, right, top = textpage.get_rect(i)
+        text = textpage.get_text_bounded(left, bottom, right, top).replace("\r", " ").replace("\n", " ")
+        if text.strip():
+            runs.append((left, bottom, right, top, text.strip()))
+    return runs
+
+
+def group_lines(runs):
+    """Group text runs into lines, top to bottom, each a list of runs ordered left to right"""
+    lines = []
+    # PDF coordinates grow upwards, so sort by descending top edge
+    for run in sorted(runs, key=lambda r: (-r[3], r[0])):
+        left, bottom, right, top, text = run
+        centre = (top + bottom) / 2
+        height = max(top - bottom, 1.0)
+        for line in lines:
+            if abs(line["centre"] - centre) < LINE_MERGE_RATIO * max(line["height"], height):
+                line["runs"].append(run)
+                break
+        else:
+            lines.append({"centre": centre, "height": height, "runs": [run]})
+    return [sorted(line["runs"], key=lambda r: r[0]) for line in lines]
+
+
+def _runs_to_lines(runs):
+    """Join grouped runs into text lines, widening gaps between columns"""
+    rendered = []
+    for line in group_lines(runs):
+        parts = []
+        previous_right = None
+        for left, bottom, right, top, text in line:
+            if previous_right is not None:
+                char_width = (right - left) / max(len(text), 1)
+                gap = left - previous_right
+                parts.append("    " if gap > COLUMN_GAP_CHARS * char_width else " ")
+            parts.append(text)
+            previous_right = right
+        rendered.append("".join(parts))
+    return "\n".join(rendered)
+
+
+def page_text_layer(pdf, index, min_chars=40):
+    """Positioned text of one page, or None if the page needs OCR"""
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            raw = textpage.get_text_bounded()
+            if not _is_usable(raw, min_chars):
+                return None
+            return _runs_to_lines(_text_runs(textpage)) or raw
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+
+def page_text_runs(pdf, index, min_chars=40):
+    """Positioned text runs of one page grouped into lines, or None if the page needs OCR"""
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            if not _is_usable(textpage.get_text_bounded(), min_chars):
+                return None
+            return group_lines(_text_runs(textpage))
+        finally:
+            textpage.close()
+    finally:
+        page.close()
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
+from api.ocr.utils.stage_timer import timed
 
+@timed("validate")
 def validate_and_fix(ledger_name: str, opening_balance: float, df: pd.DataFrame) -> pd.DataFrame:
 
     df = df.copy()
@@ -25,21 +28,30 @@ def validate_and_fix(ledger_name: str, opening_balance: float, df: pd.DataFrame)
 def _fix_missing_balances(df: pd.DataFrame, opening_balance: float) -> pd.DataFrame:
     """Calculate missing balances based on opening balance and transactions"""
     df = df.copy()
-    df.loc[df.index[0], 'balance'] = opening_balance + df['credit'].iloc[0] - df['debit'].iloc[0]
-    
-    for i in range(1, len(df)):
-        df.loc[df.index[i], 'balance'] = (
-            df['balance'].iloc[i-1] + df['credit'].iloc[i] - df['debit'].iloc[i]
-        )
-    
+    df.loc[:, 'balance'] = _running_balance(opening_balance, df['credit'].to_numpy(), df['debit'].to_numpy())
     return df
 
 
+def _running_balance(opening_balance, credit, debit) -> np.ndarray:
+    """
+    balance[i] = balance[i-1] + credit[i] - debit[i], starting from the
+    opening balance. Accumulates the interleaved sequence
+    opening, +credit[0], -debit[0], +credit[1], ... so every addition happens
+    in the same order as the row-by-row loop and gives bit-identical results.
+    """
+    n = len(credit)
+    steps = np.empty(2 * n + 1, dtype=np.result_type(float, credit.dtype, debit.dtype))
+    steps[0] = opening_balance
+    steps[1::2] = credit
+    steps[2::2] = -debit
+    return np.add.accumulate(steps)[2::2]
+
+
 def _fix_shifted_balances(df: pd.DataFrame, ledger_name: str) -> pd.DataFrame:
     """Fix cases where balances are offset by one row"""
     df = df.copy()
     
-    if "Emirates NBD" in ledger_name:
+    if ledger_name and "Emirates NBD" in ledger_name:
         df[['credit', 'debit']] = df[['debit', 'credit']].values
     
     df['balance'] = df['balance'].shift(-1)
@@ -53,24 +65,14 @@ def _fix_shifted_balances(df: pd.DataFrame, ledger_name: str) -> pd.DataFrame:
 def _recalculate_transactions(df: pd.DataFrame, opening_balance: float) -> pd.DataFrame:
     """Recalculate credit/debit amounts to match existing balances"""
     df = df.copy()
-    
-    # Fix first row
-    balance_diff = opening_balance - df['balance'].iloc[0]
-    if balance_diff > 0:
-        df.loc[df.index[0], 'debit'] = balance_diff
-        df.loc[df.index[0], 'credit'] = 0
-    else:
-        df.loc[df.index[0], 'credit'] = abs(balance_diff)
-        df.loc[df.index[0], 'debit'] = 0
-    
-    # Fix subsequent rows
-    for i in range(1, len(df)):
-        balance_diff = df['balance'].iloc[i-1] - df['balance'].iloc[i]
-        if balance_diff > 0:
-            df.loc[df.index[i], 'debit'] = balance_diff
-            df.loc[df.index[i], 'credit'] = 0
-        else:
-            df.loc[df.index[i], 'credit'] = abs(balance_diff)
-            df.loc[df.index[i], 'debit'] = 0
-    
-    return df
\ No newline at end of file
+    balance = df['balance'].to_numpy()
+
+    # Each row's movement is the previous balance (the opening balance for
+    # the first row) minus its own; a fall is a debit, anything else a credit
+    previous = np.concatenate([[opening_balance], balance[:-1]])
+    balance_diff = previous - balance
+    is_debit = balance_diff > 0
+    df['debit'] = np.where(is_debit, balance_diff, 0)
+    df['credit'] = np.where(is_debit, 0, np.abs(balance_diff))
+
+    return df
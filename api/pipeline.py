@@ -0,0 +1,112 @@
+import io
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from api.ocr.excel_parser import extract_excel_ledger
+from api.ocr.image_parser import extract_image_ledger
+from api.ocr.utils.export_excel import export_ledger, output_path_for
+from api.reconciler.main_processor import reconcile_ledgers, OUTPUT_DIR
+
+logger = logging.getLogger(__name__)
+
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+IMAGE_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".webp")
+STATEMENT_EXTENSIONS = IMAGE_EXTENSIONS + EXCEL_EXTENSIONS
+EXPORT_DIR = './data/output/'
+
+
+def extract_ledger(file_bytes, file_name, on_rows=None, progress=None):
+    """
+    Extract a raw statement (PDF, image or Excel) into an in-memory Ledger.
+    on_rows, if given, is called as on_rows(rows, chunk=i) with lists of
+    transaction dicts as the LLM streams chunk i of the statement (rows
+    None to discard what chunk i sent so far). progress, if given, is
+    called as progress(stage, fraction) while pages are OCR'd ("ocr") and
+    chunks parsed ("llm"), fraction being that stage's share done; it may
+    raise (e.g. JobCancelled) to abort the extraction.
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return extract_excel_ledger(io.BytesIO(file_bytes), on_rows, progress)
+    if extension in IMAGE_EXTENSIONS:
+        return extract_image_ledger(file_bytes, file_name, on_rows, progress)
+    raise ValueError(f"Unsupported file type: {file_name}")
+
+
+def extraction_progress(progress, start, end):
+    """
+    progress(stage, fraction) for extract_ledger that reports onto the
+    [start, end] part of a job's progress: OCR fills the first half, the
+    LLM the second. OCR and LLM reports interleave, so the reported
+    fraction only ever moves forward.
+    """
+    if progress is None:
+        return None
+    spans = {"ocr": (0.0, 0.5), "llm": (0.5, 1.0)}
+    furthest = start
+
+    def report(stage, fraction):
+        nonlocal furthest
+        low, high = spans.get(stage, (0.0, 1.0))
+        furthest = max(furthest, start + (end - start) * (low + (high - low) * fraction))
+        progress(stage, furthest)
+    return report
+
+
+def _timed_extract(file_bytes, file_name, progress=None):
+    start = time.perf_counter()
+    ledger = extract_ledger(file_bytes, file_name, progress=progress)
+    logger.info(f"Extracted {file_name} in {time.perf_counter() - start:.2f}s")
+    return ledger
+
+
+def _report(progress, stage, fraction):
+    if progress is not None:
+        progress(stage, fraction)
+
+
+def reconcile_statements(file_bytes1, file_name1, file_bytes2, file_name2,
+                         output_formats=None, export_ledgers=True,
+                         output_dir=OUTPUT_DIR, export_dir=EXPORT_DIR, progress=None):
+    """
+    Extract both statements concurrently and reconcile the resulting
+    ledgers in memory, without an Excel round-trip in between.
+
+    When export_ledgers is set, each extracted ledger is also exported
+    (xlsx + normalised Parquet) under export_dir for review. progress, if
+    given, is called as progress(stage, fraction) at each stage boundary
+    and while the statements are OCR'd and parsed.
+
+    Returns (outputs, result, ledgers) where outputs/result are as for
+    reconcile_ledgers and ledgers maps "ledger1"/"ledger2" to the extracted
+    Ledger objects and, when exported, their export paths.
+    """
+    _report(progress, "extract", 0.0)
+    # One mapping for both statements, so the bar follows whichever is further along
+    extract_progress = extraction_progress(progress, 0.0, 0.5)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        future1 = pool.submit(_timed_extract, file_bytes1, file_name1, extract_progress)
+        future2 = pool.submit(_timed_extract, file_bytes2, file_name2, extract_progress)
+        ledger1 = future1.result()
+        ledger2 = future2.result()
+
+    for name, ledger in [(file_name1, ledger1), (file_name2, ledger2)]:
+        if ledger is None:
+            raise ValueError(f"No transactions found in {name}")
+        if ledger.opening_balance is None:
+            raise ValueError(f"No opening balance found in {name}")
+
+    _report(progress, "export", 0.5)
+    ledgers = {
+        "ledger1": {"ledger": ledger1, "export_path": None},
+        "ledger2": {"ledger": ledger2, "export_path": None},
+    }
+    if export_ledgers:
+        ledgers["ledger1"]["export_path"] = export_ledger(ledger1, output_path_for(file_name1, export_dir))
+        ledgers["ledger2"]["export_path"] = export_ledger(ledger2, output_path_for(file_name2, export_dir))
+
+    _report(progress, "reconcile", 0.6)
+    outputs, result = reconcile_ledgers(ledger1, ledger2, output_formats, output_dir)
+    _report(progress, "reconcile", 1.0)
+    return outputs, result, ledgers
@@ -1,5 +1,8 @@
+import os
 import json
 
-def load_config(path="config.json"):
+def load_config(path=None):
+    """Read config.json, or the file named by LEDGER_PARSER_CONFIG (e.g. for benchmarks / CI)"""
+    path = path or os.getenv("LEDGER_PARSER_CONFIG", "config.json")
     with open(path, "r") as file:
         return json.load(file)
@@ -39,12 +39,7 @@ COLORS = {
 }
 
 
-def create_reconciliation_report(wb,
-                                 matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2,
-                                 split_rows1, split_rows2, returned_rows1, returned_rows2,
-                                 rounding_rows1, rounding_rows2, unmatched_rows1, unmatched_rows2,
-                                 closing_debit1, closing_credit1, closing_debit2, closing_credit2,
-                                 closing_match, total_match):
+def create_reconciliation_report(wb, result, closing_match, total_match):
     """
     Create a professionally formatted reconciliation report worksheet.
     """
@@ -90,13 +85,15 @@ def create_reconciliation_report(wb,
         cell.alignment = CENTER_ALIGN
     
     # Match statistics
+    counts1 = result.counts(1)
+    counts2 = result.counts(2)
     data = [
-        ["Matched (Exact)", len(matched_rows1), len(matched_rows2)],
-        ["Matched but check date", len(fuzzy_rows1), len(fuzzy_rows2)],
-        ["Split Transaction", len(split_rows1), len(split_rows2)],
-        ["Returned Transaction", len(returned_rows1)//2, len(returned_rows2)//2],
-        ["Rounding Error", len(rounding_rows1), len(rounding_rows2)],
-        ["Unmatched", len(unmatched_rows1), len(unmatched_rows2)]
+        ["Matched (Exact)", counts1["matched"], counts2["matched"]],
+        ["Matched but check date", counts1["fuzzy"], counts2["fuzzy"]],
+        ["Split Transaction", counts1["split"], counts2["split"]],
+        ["Returned Transaction", counts1["returned"]//2, counts2["returned"]//2],
+        ["Rounding Error", counts1["rounding"], counts2["rounding"]],
+        ["Unmatched", counts1["unmatched"], counts2["unmatched"]]
     ]
     
     for idx, row_data in enumerate(data, 4):
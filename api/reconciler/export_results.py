@@ -0,0 +1,104 @@
+import os
+import logging
+import pandas as pd
+from api.reconciler.match_result import CATEGORY_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Formats understood by write_match_outputs ("xlsx" is the styled workbook,
+# which is rendered separately by main_processor)
+MACHINE_FORMATS = ("parquet", "csv", "ndjson")
+OUTPUT_FORMATS = ("xlsx",) + MACHINE_FORMATS
+
+FILE_EXTENSIONS = {
+    "parquet": ".parquet",
+    "csv": ".csv",
+    "ndjson": ".ndjson",
+}
+
+
+def build_row_table(df1, df2, result):
+    """One record per ledger row with its category, remark and group id"""
+    tables = []
+    for side, df in [(1, df1), (2, df2)]:
+        categories = result.category1 if side == 1 else result.category2
+        groups = result.group1 if side == 1 else result.group2
+        table = pd.DataFrame({
+            "ledger": side,
+            "row": range(len(df)),
+            "date": df["date"].to_numpy(),
+            "description": df["description"].astype("string").to_numpy(),
+            "debit": df["debit"].astype(float).to_numpy(),
+            "credit": df["credit"].astype(float).to_numpy(),
+            "category": categories,
+            "category_name": [CATEGORY_KEYS[c] for c in categories],
+            "remark": result.remarks(side),
+            "group": groups,
+        })
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def build_pair_table(result):
+    """One record per cross-ledger pairing"""
+    return pd.DataFrame({
+        "row1": result.pair_row1,
+        "row2": result.pair_row2,
+        "category": result.pair_category,
+        "category_name": [CATEGORY_KEYS[c] for c in result.pair_category],
+        "group": result.pair_group,
+        "amount1": result.pair_amount1,
+        "amount2": result.pair_amount2,
+    })
+
+
+def build_summary_table(result):
+    """Summary counts and balances in long (ledger, metric, value) form"""
+    records = []
+    for side in (1, 2):
+        for key, count in result.counts(side).items():
+            records.append({"ledger": side, "metric": key, "value": float(count)})
+    for key, value in result.balances.items():
+        side = 1 if key.endswith("1") else 2 if key.endswith("2") else 0
+        metric = key[:-1] if side else key
+        records.append({"ledger": side, "metric": metric, "value": float(value)})
+    records.append({"ledger": 0, "metric": "pairs", "value": float(len(result.pair_row1))})
+    return pd.DataFrame(records, columns=["ledger", "metric", "value"])
+
+
+def _write_table(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(path, engine="pyarrow", index=False)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "ndjson":
+        df.to_json(path, orient="records", lines=True, date_format="iso")
+    else:
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+
+def write_match_outputs(df1, df2, result, output_dir, stem, formats):
+    """
+    Write the per-row categories, match pairs and summary counts for each
+    requested machine format. Returns {format: {"rows", "pairs", "summary"}}.
+    """
+    tables = None
+    outputs = {}
+    for fmt in formats:
+        if fmt not in MACHINE_FORMATS:
+            continue
+        if tables is None:
+            tables = {
+                "rows": build_row_table(df1, df2, result),
+                "pairs": build_pair_table(result),
+                "summary": build_summary_table(result),
+            }
+        paths = {}
+        for name, table in tables.items():
+            path = os.path.join(output_dir, f"{stem}_{name}{FILE_EXTENSIONS[fmt]}")
+            _write_table(table, path, fmt)
+            paths[name] = path
+        outputs[fmt] = paths
+        logger.info(f"Wrote {fmt} match outputs to {output_dir}")
+    return outputs
+
@@ -1,5 +1,6 @@
 import pandas as pd
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from api.reconciler.match_result import MATCHED, FUZZY, SPLIT, RETURNED, ROUNDING, UNMATCHED
 
 REMARKS_COLUMN = 5  # Assuming the remarks column is the 5th column (E)
 
@@ -18,6 +19,16 @@ COLORS = {
     'HEADER': PatternFill(start_color="FFD966", end_color="FFD966", fill_type="solid")
 }
 
+# Row fill used for each match category
+CATEGORY_COLORS = {
+    MATCHED: 'MATCHED',
+    FUZZY: 'FUZZY',
+    SPLIT: 'SPLIT',
+    RETURNED: 'RETURNED',
+    ROUNDING: 'ROUNDING',
+    UNMATCHED: 'UNMATCHED',
+}
+
 
 def apply_cell_formatting(ws, row, col_range, fill, font=None, align=None, number_format=None, border=None):
     for col in col_range:
@@ -33,50 +44,17 @@ def apply_cell_formatting(ws, row, col_range, fill, font=None, align=None, numbe
         if border:
             cell.border = border
 
-def write_remarks_to_sheets(df1, df2, data_start_row, ws1, ws2):
-    unmatched_rows1 = []
-    unmatched_rows2 = []
-    for i in df1.index:
-        ws1.cell(row=i + data_start_row, column=REMARKS_COLUMN, value=df1.at[i, "Remarks"])
-        if df1.at[i, "Remarks"] == "Unmatched":
-            unmatched_rows1.append(i + data_start_row)
-    for j in df2.index:
-        ws2.cell(row=j + data_start_row, column=REMARKS_COLUMN, value=df2.at[j, "Remarks"])
-        if df2.at[j, "Remarks"] == "Unmatched":
-            unmatched_rows2.append(j + data_start_row)
-    return unmatched_rows1, unmatched_rows2
+def write_remarks_to_sheets(result, data_start_row, ws1, ws2):
+    for ws, side in [(ws1, 1), (ws2, 2)]:
+        for i, remark in enumerate(result.remarks(side)):
+            ws.cell(row=i + data_start_row, column=REMARKS_COLUMN, value=remark)
 
-def apply_color_formatting(ws1, ws2, matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2,
-                           split_rows1, split_rows2, returned_rows1, returned_rows2,
-                           rounding_rows1, rounding_rows2, unmatched_rows1, unmatched_rows2):
+def apply_color_formatting(ws1, ws2, result, data_start_row):
     def color_row(ws, row, fill):
         for col in range(1, REMARKS_COLUMN + 1):
             ws.cell(row=row, column=col).fill = fill
 
-    # Sheet1
-    for row in matched_rows1:
-        color_row(ws1, row, COLORS['MATCHED'])
-    for row in fuzzy_rows1:
-        color_row(ws1, row, COLORS['FUZZY'])
-    for row in split_rows1:
-        color_row(ws1, row, COLORS['SPLIT'])
-    for row in returned_rows1:
-        color_row(ws1, row, COLORS['RETURNED'])
-    for row in rounding_rows1:
-        color_row(ws1, row, COLORS['ROUNDING'])
-    for row in unmatched_rows1:
-        color_row(ws1, row, COLORS['UNMATCHED'])
-
-    # Sheet2
-    for row in matched_rows2:
-        color_row(ws2, row, COLORS['MATCHED'])
-    for row in fuzzy_rows2:
-        color_row(ws2, row, COLORS['FUZZY'])
-    for row in split_rows2:
-        color_row(ws2, row, COLORS['SPLIT'])
-    for row in returned_rows2:
-        color_row(ws2, row, COLORS['RETURNED'])
-    for row in rounding_rows2:
-        color_row(ws2, row, COLORS['ROUNDING'])
-    for row in unmatched_rows2:
-        color_row(ws2, row, COLORS['UNMATCHED'])
\ No newline at end of file
+    for ws, side in [(ws1, 1), (ws2, 2)]:
+        for category, color_key in CATEGORY_COLORS.items():
+            for row in result.sheet_rows(side, category, data_start_row):
+                color_row(ws, row, COLORS[color_key])
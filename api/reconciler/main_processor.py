@@ -4,16 +4,18 @@ import math
 import logging
 import pandas as pd
 from datetime import datetime
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side, Font, Border, Protection, NamedStyle
 from api.reconciler.matchers import (find_exact_matches, find_fuzzy_matches,
                       find_split_transactions, find_rounding_errors)
 from api.reconciler.utils import compare_values, calculate_closing_balance
 from api.reconciler.formatting import (
     apply_cell_formatting, write_remarks_to_sheets, apply_color_formatting)
+from api.reconciler.match_result import MatchResult, RETURNED
+from api.reconciler.export_results import OUTPUT_FORMATS, write_match_outputs
 from api.reconciler.create_report import create_reconciliation_report, add_closing_and_total_rows, apply_professional_formatting
 from api.reconciler.config_utils import load_config
-from copy import copy  # Add this import at the top
+from api.ledger.normalised import read_ledger
 config = load_config()
 
 # Set up logging
@@ -30,6 +32,7 @@ HEADER_ROW = 6  # 1-based index
 DATA_START_ROW = 7
 EXPECTED_COLUMNS = ["date", "description", "debit", "credit"]
 REMARKS_COLUMN = 5  # Column E
+DATE_FORMAT = "yyyy-mm-dd"
 
 THIN_BORDER = Border(
     left=Side(style="thin"), right=Side(style="thin"),
@@ -41,26 +44,36 @@ RIGHT_ALIGN = Alignment(horizontal="right", vertical="center")
 BOLD_FONT = Font(bold=True)
 
 
-def copy_worksheet(source_ws, target_wb, title):
+def write_ledger_sheet(ledger, target_wb, title):
+    """Write a ledger's metadata block and transactions in the reconciled sheet layout"""
     target_ws = target_wb.create_sheet(title=title)
-    
-    for row in source_ws.iter_rows():
-        for cell in row:
-            # Corrected 'cell.col_idx' to 'cell.column'
-            new_cell = target_ws.cell(row=cell.row, column=cell.column, value=cell.value)
-            
-            # Copy cell styles
-            if cell.has_style:
-                new_cell.font = copy(cell.font)
-                new_cell.border = copy(cell.border)
-                new_cell.fill = copy(cell.fill)
-                new_cell.number_format = cell.number_format
-                new_cell.alignment = copy(cell.alignment)
-    
+
+    metadata = [
+        ("Account:", ledger.account or "N/A"),
+        ("Ledger:", ledger.ledger or "N/A"),
+        ("Opening Balance:", ledger.opening_balance if ledger.opening_balance is not None else "N/A"),
+        ("Closing Balance:", ledger.closing_balance if ledger.closing_balance is not None else "N/A"),
+    ]
+    for row, (label, value) in enumerate(metadata, 1):
+        target_ws.cell(row=row, column=1, value=label)
+        target_ws.cell(row=row, column=2, value=value)
+
+    for col, name in enumerate(EXPECTED_COLUMNS, 1):
+        target_ws.cell(row=HEADER_ROW, column=col, value=name)
+
+    df = ledger.transactions
+    dates = df["date"].dt.date.astype(object).where(df["date"].notna(), None).tolist()
+    descriptions = df["description"].astype(object).where(df["description"].notna(), None).tolist()
+    for offset, row_values in enumerate(zip(dates, descriptions, df["debit"].tolist(), df["credit"].tolist())):
+        row = DATA_START_ROW + offset
+        for col, value in enumerate(row_values, 1):
+            target_ws.cell(row=row, column=col, value=value)
+        target_ws.cell(row=row, column=1).number_format = DATE_FORMAT
+
     return target_ws
 
 
-def find_returned_transactions(df, unmatched_set, data_start_row, returned_rows):
+def find_returned_transactions(df, unmatched_set, result, side):
     returned_count = 0
     indices = sorted(list(unmatched_set))
     marked = set()
@@ -79,24 +92,13 @@ def find_returned_transactions(df, unmatched_set, data_start_row, returned_rows)
                 date_match = (date_i == date_j)
             if date_match:
                 # reversed transactions
-                if (df.at[idx_i, "debit"] > 0 and df.at[idx_i, "credit"] == 0 and
-                    df.at[idx_j, "credit"] > 0 and df.at[idx_j, "debit"] == 0 and
-                    compare_values(df.at[idx_i, "debit"], df.at[idx_j, "credit"])):
-                    df.at[idx_i, "Remarks"] = "Returned Transaction"
-                    df.at[idx_j, "Remarks"] = "Returned Transaction"
-                    returned_rows.append(idx_i + data_start_row)
-                    returned_rows.append(idx_j + data_start_row)
-                    marked.add(idx_i)
-                    marked.add(idx_j)
-                    returned_count += 1
-                    break
-                elif (df.at[idx_i, "credit"] > 0 and df.at[idx_i, "debit"] == 0 and
-                      df.at[idx_j, "debit"] > 0 and df.at[idx_j, "credit"] == 0 and
-                      compare_values(df.at[idx_i, "credit"], df.at[idx_j, "debit"])):
-                    df.at[idx_i, "Remarks"] = "Returned Transaction"
-                    df.at[idx_j, "Remarks"] = "Returned Transaction"
-                    returned_rows.append(idx_i + data_start_row)
-                    returned_rows.append(idx_j + data_start_row)
+                if ((df.at[idx_i, "debit"] > 0 and df.at[idx_i, "credit"] == 0 and
+                     df.at[idx_j, "credit"] > 0 and df.at[idx_j, "debit"] == 0 and
+                     compare_values(df.at[idx_i, "debit"], df.at[idx_j, "credit"])) or
+                    (df.at[idx_i, "credit"] > 0 and df.at[idx_i, "debit"] == 0 and
+                     df.at[idx_j, "debit"] > 0 and df.at[idx_j, "credit"] == 0 and
+                     compare_values(df.at[idx_i, "credit"], df.at[idx_j, "debit"]))):
+                    result.mark_rows(side, [idx_i, idx_j], RETURNED, result.new_group())
                     marked.add(idx_i)
                     marked.add(idx_j)
                     returned_count += 1
@@ -106,102 +108,48 @@ def find_returned_transactions(df, unmatched_set, data_start_row, returned_rows)
     return returned_count
 
 
-def reconcile_statement(file_path1, file_path2):
-    try:
-        wb1 = load_workbook(file_path1)
-        wb2 = load_workbook(file_path2)
-        source_ws1 = wb1["Sheet1"]
-        source_ws2 = wb2["Sheet1"]
-        opening_balance1 = float(source_ws1['B3'].value)
-        opening_balance2 = float(source_ws2['B3'].value)
-        print(f"Opening balance for Ledger1: {opening_balance1}")
-        print(f"Opening balance for Ledger2: {opening_balance2}")
-    except Exception as e:
-        logger.error(f"Error loading input files: {e}")
-        return False
-
-    try:
-        df1 = pd.read_excel(file_path1, sheet_name="Sheet1", header=HEADER_ROW - 1)
-        df2 = pd.read_excel(file_path2, sheet_name="Sheet1", header=HEADER_ROW - 1)
-    except Exception as e:
-        logger.error(f"Error reading sheets into DataFrames: {e}")
-        return False
-
-    missing_cols_df1 = [col for col in EXPECTED_COLUMNS if col not in df1.columns]
-    missing_cols_df2 = [col for col in EXPECTED_COLUMNS if col not in df2.columns]
-    if missing_cols_df1:
-        logger.error(f"Ledger1 is missing columns: {missing_cols_df1}.")
-        return False
-    if missing_cols_df2:
-        logger.error(f"Ledger2 is missing columns: {missing_cols_df2}.")
-        return False
-
-    df1 = df1[EXPECTED_COLUMNS].copy()
-    df2 = df2[EXPECTED_COLUMNS].copy()
-
-    df1["date"] = pd.to_datetime(df1["date"], errors="coerce")
-    df2["date"] = pd.to_datetime(df2["date"], errors="coerce")
-    df1["debit"] = df1["debit"].fillna(0)
-    df1["credit"] = df1["credit"].fillna(0)
-    df2["debit"] = df2["debit"].fillna(0)
-    df2["credit"] = df2["credit"].fillna(0)
-
-    df1["Remarks"] = ""
-    df2["Remarks"] = ""
-
-    wb = Workbook()
-    wb.remove(wb.active)
-    ws1 = copy_worksheet(source_ws1, wb, "Sheet1")
-    ws2 = copy_worksheet(source_ws2, wb, "Sheet2")
-
-    ws1.cell(row=HEADER_ROW, column=REMARKS_COLUMN, value="Remarks").font = BOLD_FONT
-    ws2.cell(row=HEADER_ROW, column=REMARKS_COLUMN, value="Remarks").font = BOLD_FONT
-
+def load_ledgers(file_path1, file_path2):
+    """
+    Load both ledgers (normalised Parquet or Excel export).
+    Returns (ledger1, ledger2), or None if either file is unusable.
+    """
+    ledgers = []
+    for name, path in [("Ledger1", file_path1), ("Ledger2", file_path2)]:
+        try:
+            ledger = read_ledger(path)
+        except Exception as e:
+            logger.error(f"Error loading {name}: {e}")
+            return None
+        if ledger.opening_balance is None:
+            logger.error(f"{name} has no opening balance.")
+            return None
+        print(f"Opening balance for {name}: {ledger.opening_balance}")
+        ledgers.append(ledger)
+    return ledgers[0], ledgers[1]
+
+
+def ledger_frames(ledger1, ledger2):
+    """Matcher input: the expected columns of each ledger, positionally indexed"""
+    df1 = ledger1.transactions[EXPECTED_COLUMNS].reset_index(drop=True)
+    df2 = ledger2.transactions[EXPECTED_COLUMNS].reset_index(drop=True)
+    return df1, df2
+
+
+def match_ledgers(df1, df2, opening_balance1, opening_balance2, config=config):
+    """Run every matcher over the two ledgers and return a MatchResult"""
+    result = MatchResult(len(df1), len(df2))
     unmatched_df1 = set(df1.index)
     unmatched_df2 = set(df2.index)
-    matched_rows1 = []
-    matched_rows2 = []
-    fuzzy_rows1 = []
-    fuzzy_rows2 = []
-    split_rows1 = []
-    split_rows2 = []
-    returned_rows1 = []
-    returned_rows2 = []
-    rounding_rows1 = []
-    rounding_rows2 = []
-
-    find_exact_matches(df1, df2, unmatched_df1, unmatched_df2, DATA_START_ROW,
-                       matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2, config)
-
-    find_fuzzy_matches(df1, df2, unmatched_df1, unmatched_df2, DATA_START_ROW,
-                       matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2, config)
-
-    find_split_transactions(df1, df2, unmatched_df1, unmatched_df2, DATA_START_ROW,
-                            split_rows1, split_rows2, config)
-    find_split_transactions(df2, df1, unmatched_df2, unmatched_df1, DATA_START_ROW,
-                            split_rows2, split_rows1, config)
-
-    find_rounding_errors(df1, df2, unmatched_df1, unmatched_df2, DATA_START_ROW,
-                         rounding_rows1, rounding_rows2, config)
-
-    find_returned_transactions(df1, unmatched_df1, DATA_START_ROW, returned_rows1)
-    find_returned_transactions(df2, unmatched_df2, DATA_START_ROW, returned_rows2)
-
-    for i in unmatched_df1:
-        df1.at[i, "Remarks"] = "Unmatched"
-    for j in unmatched_df2:
-        df2.at[j, "Remarks"] = "Unmatched"
-
-    unmatched_rows1, unmatched_rows2 = write_remarks_to_sheets(df1, df2, DATA_START_ROW, ws1, ws2)
-
-    apply_color_formatting(ws1, ws2,
-                           matched_rows1, matched_rows2,
-                           fuzzy_rows1, fuzzy_rows2,
-                           split_rows1, split_rows2,
-                           returned_rows1, returned_rows2,
-                           rounding_rows1, rounding_rows2,
-                           unmatched_rows1, unmatched_rows2)
 
+    find_exact_matches(df1, df2, unmatched_df1, unmatched_df2, result, config)
+    find_fuzzy_matches(df1, df2, unmatched_df1, unmatched_df2, result, config)
+    find_split_transactions(df1, df2, unmatched_df1, unmatched_df2, result, 1, config)
+    find_split_transactions(df2, df1, unmatched_df2, unmatched_df1, result, 2, config)
+    find_rounding_errors(df1, df2, unmatched_df1, unmatched_df2, result, config)
+    find_returned_transactions(df1, unmatched_df1, result, 1)
+    find_returned_transactions(df2, unmatched_df2, result, 2)
+
+    # Anything left over stays UNMATCHED, which is the default category
     closing_balance1 = calculate_closing_balance(df1, opening_balance1)
     closing_debit1 = closing_balance1['closing_debit']
     closing_credit1 = closing_balance1['closing_credit']
@@ -222,8 +170,37 @@ def reconcile_statement(file_path1, file_path2):
     total_match = (compare_values(total_debit1, total_debit2) and
                    compare_values(total_credit1, total_credit2))
 
-    last_data_row1 = DATA_START_ROW + len(df1) - 1
-    last_data_row2 = DATA_START_ROW + len(df2) - 1
+    result.balances = {
+        "opening_balance1": float(opening_balance1),
+        "opening_balance2": float(opening_balance2),
+        "closing_debit1": float(closing_debit1),
+        "closing_credit1": float(closing_credit1),
+        "closing_debit2": float(closing_debit2),
+        "closing_credit2": float(closing_credit2),
+        "closing_match": bool(closing_match),
+        "total_match": bool(total_match),
+    }
+    return result
+
+
+def render_workbook(ledger1, ledger2, result):
+    """Build the styled reconciliation workbook from a MatchResult"""
+    closing_match = result.balances["closing_match"]
+    total_match = result.balances["total_match"]
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    ws1 = write_ledger_sheet(ledger1, wb, "Sheet1")
+    ws2 = write_ledger_sheet(ledger2, wb, "Sheet2")
+
+    ws1.cell(row=HEADER_ROW, column=REMARKS_COLUMN, value="Remarks").font = BOLD_FONT
+    ws2.cell(row=HEADER_ROW, column=REMARKS_COLUMN, value="Remarks").font = BOLD_FONT
+
+    write_remarks_to_sheets(result, DATA_START_ROW, ws1, ws2)
+    apply_color_formatting(ws1, ws2, result, DATA_START_ROW)
+
+    last_data_row1 = DATA_START_ROW + len(result.category1) - 1
+    last_data_row2 = DATA_START_ROW + len(result.category2) - 1
 
     closing_row1, total_row1 = add_closing_and_total_rows(ws1, last_data_row1, DATA_START_ROW,
                                                           closing_match, total_match)
@@ -235,25 +212,81 @@ def reconcile_statement(file_path1, file_path2):
     ws1.auto_filter.ref = f"A{HEADER_ROW}:E{total_row1}"
     ws2.auto_filter.ref = f"A{HEADER_ROW}:E{total_row2}"
 
-    create_reconciliation_report(
-        wb,
-        matched_rows1, matched_rows2,
-        fuzzy_rows1, fuzzy_rows2,
-        split_rows1, split_rows2,
-        returned_rows1, returned_rows2,
-        rounding_rows1, rounding_rows2,
-        unmatched_rows1, unmatched_rows2,
-        closing_debit1, closing_credit1,
-        closing_debit2, closing_credit2,
-        closing_match, total_match
-    )
+    create_reconciliation_report(wb, result, closing_match, total_match)
+    return wb
+
+
+OUTPUT_DIR = './data/output/reconciled/'
+
+
+def output_stem():
+    current_time = datetime.now()
+    time_str = current_time.strftime("_%Y%m%d_%H%M%S")
+    return "reconciled" + time_str
+
 
+def save_workbook(wb, output_path):
     try:
-        current_time = datetime.now()
-        time_str = current_time.strftime("_%Y%m%d_%H%M%S")
-        output_path = './data/output/reconciled/' + "reconciled" + time_str + '.xlsx'
-        wb.save(output_path)     
+        wb.save(output_path)
         return output_path
     except Exception as e:
         logger.error(f"Error saving workbook: {e}")
         return False
+
+
+def render_reconciliation(file_path1, file_path2, result, output_dir=OUTPUT_DIR):
+    """Re-render the reconciled workbook from a stored MatchResult without re-matching"""
+    loaded = load_ledgers(file_path1, file_path2)
+    if loaded is None:
+        return False
+    ledger1, ledger2 = loaded
+    output_path = os.path.join(output_dir, output_stem() + '.xlsx')
+    return save_workbook(render_workbook(ledger1, ledger2, result), output_path)
+
+
+def reconcile_ledgers(ledger1, ledger2, output_formats=None, output_dir=OUTPUT_DIR):
+    """
+    Reconcile two in-memory Ledger objects.
+
+    output_formats selects what gets written: "xlsx" for the styled
+    workbook and any of "parquet", "csv" or "ndjson" for machine-readable
+    row categories, match pairs and summary counts. Defaults to the
+    "output_formats" config entry. Files are written under output_dir.
+
+    Returns (outputs, result). outputs maps "xlsx" to the workbook path
+    (False if saving failed) and each machine format to its file paths.
+    """
+    if output_formats is None:
+        output_formats = config.get("output_formats", ["xlsx"])
+    unknown = [fmt for fmt in output_formats if fmt not in OUTPUT_FORMATS]
+    if unknown:
+        logger.error(f"Unsupported output formats: {unknown}")
+        return {}, None
+
+    df1, df2 = ledger_frames(ledger1, ledger2)
+    result = match_ledgers(df1, df2, ledger1.opening_balance, ledger2.opening_balance)
+
+    stem = output_stem()
+    outputs = write_match_outputs(df1, df2, result, output_dir, stem, output_formats)
+    if "xlsx" in output_formats:
+        wb = render_workbook(ledger1, ledger2, result)
+        outputs["xlsx"] = save_workbook(wb, os.path.join(output_dir, stem + '.xlsx'))
+    return outputs, result
+
+
+def reconcile(file_path1, file_path2, output_formats=None, output_dir=OUTPUT_DIR):
+    """
+    Reconcile two ledger files (normalised Parquet or Excel export).
+    See reconcile_ledgers for output_formats and the return value; result
+    is None when the ledgers could not be loaded.
+    """
+    loaded = load_ledgers(file_path1, file_path2)
+    if loaded is None:
+        return {}, None
+    ledger1, ledger2 = loaded
+    return reconcile_ledgers(ledger1, ledger2, output_formats, output_dir)
+
+
+def reconcile_statement(file_path1, file_path2):
+    outputs, _ = reconcile(file_path1, file_path2, output_formats=["xlsx"])
+    return outputs.get("xlsx", False)
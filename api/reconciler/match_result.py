@@ -0,0 +1,199 @@
+import json
+import numpy as np
+
+# Category codes stored per row for each side
+UNMATCHED = 0
+MATCHED = 1
+FUZZY = 2
+SPLIT = 3
+RETURNED = 4
+ROUNDING = 5
+
+CATEGORY_LABELS = {
+    UNMATCHED: "Unmatched",
+    MATCHED: "Matched",
+    FUZZY: "Matched but check date",
+    SPLIT: "Split Transaction",
+    RETURNED: "Returned Transaction",
+    ROUNDING: "Rounding Error",
+}
+
+# Keys used for the per-category counts in the summary
+CATEGORY_KEYS = {
+    UNMATCHED: "unmatched",
+    MATCHED: "matched",
+    FUZZY: "fuzzy",
+    SPLIT: "split",
+    RETURNED: "returned",
+    ROUNDING: "rounding",
+}
+
+NO_GROUP = -1
+
+
+class MatchResult:
+    """
+    Array-backed outcome of a reconciliation run.
+
+    Each side keeps a category code and a group id per ledger row (positional
+    index). Cross-ledger pairings are kept as parallel pair arrays so that
+    downstream consumers can see exactly which row matched which. Split
+    transactions share a group id across all rows involved; returned
+    transactions share a group id between the two rows on the same side.
+    """
+
+    def __init__(self, n_rows1, n_rows2):
+        self.category1 = np.full(n_rows1, UNMATCHED, dtype=np.int8)
+        self.category2 = np.full(n_rows2, UNMATCHED, dtype=np.int8)
+        self.group1 = np.full(n_rows1, NO_GROUP, dtype=np.int32)
+        self.group2 = np.full(n_rows2, NO_GROUP, dtype=np.int32)
+        self.balances = {}
+        self._pairs = []
+        self._pair_arrays = None
+        self._next_group = 0
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def new_group(self):
+        group = self._next_group
+        self._next_group += 1
+        return group
+
+    def add_pair(self, i, j, category, group=NO_GROUP, amount1=np.nan, amount2=np.nan):
+        """Record that row i of ledger 1 was paired with row j of ledger 2"""
+        self.category1[i] = category
+        self.category2[j] = category
+        if group != NO_GROUP:
+            self.group1[i] = group
+            self.group2[j] = group
+        self._pairs.append((i, j, category, group, amount1, amount2))
+        self._pair_arrays = None
+
+    def mark_rows(self, side, rows, category, group=NO_GROUP):
+        """Categorise rows on one side without a cross-ledger pair (e.g. returned transactions)"""
+        categories, groups = self._side(side)
+        for row in rows:
+            categories[row] = category
+            if group != NO_GROUP:
+                groups[row] = group
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+    def _side(self, side):
+        if side == 1:
+            return self.category1, self.group1
+        if side == 2:
+            return self.category2, self.group2
+        raise ValueError(f"Invalid ledger side: {side}")
+
+    def _build_pair_arrays(self):
+        if self._pair_arrays is None:
+            pairs = self._pairs
+            self._pair_arrays = {
+                "pair_row1": np.array([p[0] for p in pairs], dtype=np.int32),
+                "pair_row2": np.array([p[1] for p in pairs], dtype=np.int32),
+                "pair_category": np.array([p[2] for p in pairs], dtype=np.int8),
+                "pair_group": np.array([p[3] for p in pairs], dtype=np.int32),
+                "pair_amount1": np.array([p[4] for p in pairs], dtype=np.float64),
+                "pair_amount2": np.array([p[5] for p in pairs], dtype=np.float64),
+            }
+        return self._pair_arrays
+
+    @property
+    def pair_row1(self):
+        return self._build_pair_arrays()["pair_row1"]
+
+    @property
+    def pair_row2(self):
+        return self._build_pair_arrays()["pair_row2"]
+
+    @property
+    def pair_category(self):
+        return self._build_pair_arrays()["pair_category"]
+
+    @property
+    def pair_group(self):
+        return self._build_pair_arrays()["pair_group"]
+
+    @property
+    def pair_amount1(self):
+        return self._build_pair_arrays()["pair_amount1"]
+
+    @property
+    def pair_amount2(self):
+        return self._build_pair_arrays()["pair_amount2"]
+
+    def rows(self, side, category):
+        """Positional row indices on one side that fall into a category"""
+        categories, _ = self._side(side)
+        return np.flatnonzero(categories == category)
+
+    def sheet_rows(self, side, category, data_start_row):
+        """Worksheet row numbers on one side that fall into a category"""
+        return [int(r) + data_start_row for r in self.rows(side, category)]
+
+    def remarks(self, side):
+        """Remark text per row, as written to the Remarks column"""
+        categories, _ = self._side(side)
+        remarks = [CATEGORY_LABELS[c] for c in categories]
+
+        # Rounding remarks carry both amounts of the pair
+        pair_rows = self.pair_row1 if side == 1 else self.pair_row2
+        rounding = np.flatnonzero(self.pair_category == ROUNDING)
+        for p in rounding:
+            amount1 = self.pair_amount1[p]
+            amount2 = self.pair_amount2[p]
+            remarks[pair_rows[p]] = f"Rounding Error: {amount1:.2f} vs {amount2:.2f}"
+        return remarks
+
+    def counts(self, side):
+        categories, _ = self._side(side)
+        tally = np.bincount(categories, minlength=len(CATEGORY_LABELS))
+        return {CATEGORY_KEYS[c]: int(tally[c]) for c in CATEGORY_KEYS}
+
+    def summary(self):
+        """Per-category row counts for both ledgers plus balance information"""
+        return {
+            "ledger1": self.counts(1),
+            "ledger2": self.counts(2),
+            "pairs": int(len(self._pairs)),
+            "balances": dict(self.balances),
+        }
+
+    # ------------------------------------------------------------------
+    # Serialisation
+    # ------------------------------------------------------------------
+    def to_arrays(self):
+        arrays = {
+            "category1": self.category1,
+            "category2": self.category2,
+            "group1": self.group1,
+            "group2": self.group2,
+        }
+        arrays.update(self._build_pair_arrays())
+        return arrays
+
+    def save(self, path):
+        """Write the result to a compressed .npz file (no pickling involved)"""
+        meta = {"balances": self.balances, "next_group": self._next_group}
+        np.savez_compressed(path, meta=np.array(json.dumps(meta, default=float)), **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            result = cls(len(data["category1"]), len(data["category2"]))
+            result.category1 = data["category1"].copy()
+            result.category2 = data["category2"].copy()
+            result.group1 = data["group1"].copy()
+            result.group2 = data["group2"].copy()
+            result._pairs = list(zip(
+                data["pair_row1"].tolist(), data["pair_row2"].tolist(),
+                data["pair_category"].tolist(), data["pair_group"].tolist(),
+                data["pair_amount1"].tolist(), data["pair_amount2"].tolist()
+            ))
+            meta = json.loads(str(data["meta"]))
+        result.balances = meta.get("balances", {})
+        result._next_group = meta.get("next_group", 0)
+        return result
@@ -2,6 +2,7 @@ import logging
 import pandas as pd
 from api.reconciler.utils import compare_values, mark_match, round_half_up
 from api.reconciler.config_utils import load_config
+from api.reconciler.match_result import MATCHED, FUZZY, SPLIT, ROUNDING
 
 config = load_config()
 # Set up logging
@@ -15,8 +16,7 @@ logger = logging.getLogger(__name__)
 AMOUNT_TOLERANCE = 0.01
 ROUNDING_TOLERANCE = 0.5
 
-def find_exact_matches(df1, df2, unmatched_df1, unmatched_df2, data_start_row,
-                      matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2, config=config):
+def find_exact_matches(df1, df2, unmatched_df1, unmatched_df2, result, config=config):
     exact_count = 0
     exact_candidates = []
     if not config.get("enable_exact_match", True):
@@ -55,16 +55,12 @@ def find_exact_matches(df1, df2, unmatched_df1, unmatched_df2, data_start_row,
 
     for i, j in exact_candidates:
         if i in unmatched_df1 and j in unmatched_df2:
-            mark_match(df1, df2, i, j, "Matched",
-                       unmatched_df1, unmatched_df2,
-                       data_start_row, matched_rows1, matched_rows2,
-                       fuzzy_rows1, fuzzy_rows2)
+            mark_match(i, j, MATCHED, unmatched_df1, unmatched_df2, result)
             exact_count += 1
     logger.info(f"Found {exact_count} exact matches.")
     return exact_count
 
-def find_fuzzy_matches(df1, df2, unmatched_df1, unmatched_df2, data_start_row,
-                      matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2, config):
+def find_fuzzy_matches(df1, df2, unmatched_df1, unmatched_df2, result, config):
     if not config.get("enable_fuzzy_match", True):
         return 0
 
@@ -103,10 +99,7 @@ def find_fuzzy_matches(df1, df2, unmatched_df1, unmatched_df2, data_start_row,
 
     for i, j, _ in fuzzy_candidates:
         if i in unmatched_df1 and j in unmatched_df2:
-            mark_match(df1, df2, i, j, "Matched but check date",
-                       unmatched_df1, unmatched_df2,
-                       data_start_row, matched_rows1, matched_rows2,
-                       fuzzy_rows1, fuzzy_rows2)
+            mark_match(i, j, FUZZY, unmatched_df1, unmatched_df2, result)
             fuzzy_count += 1
 
     logger.info(f"Found {fuzzy_count} fuzzy matches.")
@@ -138,7 +131,11 @@ def subset_sum(candidates, target, tolerance):
     return None
 
 def find_split_transactions(df_source, df_target, unmatched_source, unmatched_target,
-                           data_start_row, split_rows_source, split_rows_target, config):
+                           result, source_side, config):
+    """
+    Match one source row against several target rows summing to its amount.
+    source_side is 1 when df_source is the first ledger, 2 otherwise.
+    """
     if not config.get("enable_split_match", True):
         return 0
 
@@ -179,11 +176,12 @@ def find_split_transactions(df_source, df_target, unmatched_source, unmatched_ta
 
         chosen = subset_sum(candidates, req, tolerance=amount_tolerance)
         if chosen:
-            df_source.at[i, "Remarks"] = "Split Transaction"
-            split_rows_source.append(i + data_start_row)
+            group = result.new_group()
             for j in chosen:
-                df_target.at[j, "Remarks"] = "Split Transaction"
-                split_rows_target.append(j + data_start_row)
+                if source_side == 1:
+                    result.add_pair(i, j, SPLIT, group, req, df_target.at[j, sign])
+                else:
+                    result.add_pair(j, i, SPLIT, group, df_target.at[j, sign], req)
                 unmatched_target.discard(j)
             unmatched_source.discard(i)
             split_count += 1
@@ -192,8 +190,7 @@ def find_split_transactions(df_source, df_target, unmatched_source, unmatched_ta
     return split_count
 
 
-def find_rounding_errors(df1, df2, unmatched_df1, unmatched_df2,
-                        data_start_row, rounding_rows1, rounding_rows2, config):
+def find_rounding_errors(df1, df2, unmatched_df1, unmatched_df2, result, config):
     if not config.get("enable_rounding_match", True):
         return 0
 
@@ -223,11 +220,7 @@ def find_rounding_errors(df1, df2, unmatched_df1, unmatched_df2,
             # Match debit vs credit (and vice versa)
             for x, y in [(debit1, credit2), (credit1, debit2)]:
                 if x > 0 and y > 0 and abs(x - y) < tolerance and round_half_up(x) == round_half_up(y):
-                    msg = f"Rounding Error: {x:.2f} vs {y:.2f}"
-                    df1.at[i, "Remarks"] = msg
-                    df2.at[j, "Remarks"] = msg
-                    rounding_rows1.append(i + data_start_row)
-                    rounding_rows2.append(j + data_start_row)
+                    result.add_pair(i, j, ROUNDING, amount1=x, amount2=y)
                     unmatched_df1.discard(i)
                     unmatched_df2.discard(j)
                     rounding_count += 1
@@ -38,18 +38,8 @@ def compare_values(a, b, tolerance = amount_tolerance):
         return False
     return abs(float(a) - float(b)) < tolerance
 
-def mark_match(df1, df2, i, j, remark, unmatched_df1, unmatched_df2, data_start_row,
-               matched_rows1, matched_rows2, fuzzy_rows1, fuzzy_rows2):
-    df1.at[i, "Remarks"] = remark
-    df2.at[j, "Remarks"] = remark
-    r1 = i + data_start_row
-    r2 = j + data_start_row
-    if remark == "Matched":
-        matched_rows1.append(r1)
-        matched_rows2.append(r2)
-    elif remark == "Matched but check date":
-        fuzzy_rows1.append(r1)
-        fuzzy_rows2.append(r2)
+def mark_match(i, j, category, unmatched_df1, unmatched_df2, result):
+    result.add_pair(i, j, category)
     unmatched_df1.discard(i)
     unmatched_df2.discard(j)
 
@@ -0,0 +1,171 @@
+"""
+Headless HTTP service for extraction and reconciliation.
+
+    python -m api.service --port 8600 --workers 2
+
+Endpoints (all JSON unless a file is fetched):
+
+    POST   /jobs/extract      multipart: file
+    POST   /jobs/reconcile    multipart: ledger1, ledger2 [, output_formats=csv,parquet]
+    POST   /jobs/pipeline     multipart: statement1, statement2 [, output_formats]
+    GET    /jobs/<id>         job status, progress and result
+    GET    /jobs/<id>/files/<name>   download an output file
+    DELETE /jobs/<id>         cancel a job
+    GET    /health
+
+Jobs run on a bounded process pool whose workers stay alive between
+requests, so loaded models and module-level caches are reused. A job and
+its files are deleted job_retention_hours after its last activity (see
+api.jobs); fetch the outputs before then.
+"""
+import os
+import json
+import logging
+import argparse
+import tornado.ioloop
+import tornado.web
+from api.jobs import JobRunner, FINISHED_STATES
+from api.reconciler.config_utils import load_config
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+MAX_BODY_SIZE = 200 * 1024 * 1024
+
+
+def init_worker():
+    """Process pool initializer: import the heavy modules and warm the OCR model once per worker"""
+    import api.pipeline  # noqa: F401
+    import api.reconciler.main_processor  # noqa: F401
+    if config.get("ocr_warm_up", True):
+        from api.ocr.model_registry import warm_up
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"OCR warm-up failed: {e}")
+    logger.info(f"Worker {os.getpid()} ready")
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    @property
+    def runner(self):
+        return self.application.settings["runner"]
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+    def uploaded_file(self, field):
+        files = self.request.files.get(field)
+        if not files:
+            raise tornado.web.HTTPError(400, reason=f"Missing file field '{field}'")
+        return files[0]["body"], os.path.basename(files[0]["filename"])
+
+    def output_formats(self):
+        raw = self.get_body_argument("output_formats", default=None)
+        if not raw:
+            return None
+        return [fmt.strip() for fmt in raw.split(",") if fmt.strip()]
+
+    def submit(self, task_name, **params):
+        max_queued = self.settings["max_queued"]
+        if len(self.runner.active_jobs()) >= max_queued:
+            raise tornado.web.HTTPError(503, reason="Job queue is full, retry later")
+        job_id = self.runner.submit(task_name, **params)
+        self.set_status(202)
+        self.set_header("Location", f"/jobs/{job_id}")
+        self.finish({"id": job_id, "status_url": f"/jobs/{job_id}"})
+
+
+class ExtractHandler(BaseHandler):
+    def post(self):
+        file_bytes, file_name = self.uploaded_file("file")
+        self.submit("extract", file_bytes=file_bytes, file_name=file_name)
+
+
+class ReconcileHandler(BaseHandler):
+    def post(self):
+        bytes1, name1 = self.uploaded_file("ledger1")
+        bytes2, name2 = self.uploaded_file("ledger2")
+        self.submit("reconcile", file_bytes1=bytes1, file_name1=name1,
+                    file_bytes2=bytes2, file_name2=name2, output_formats=self.output_formats())
+
+
+class PipelineHandler(BaseHandler):
+    def post(self):
+        bytes1, name1 = self.uploaded_file("statement1")
+        bytes2, name2 = self.uploaded_file("statement2")
+        self.submit("pipeline", file_bytes1=bytes1, file_name1=name1,
+                    file_bytes2=bytes2, file_name2=name2, output_formats=self.output_formats())
+
+
+class JobHandler(BaseHandler):
+    def get(self, job_id):
+        status = self.runner.status(job_id)
+        if status is None:
+            raise tornado.web.HTTPError(404, reason="Unknown job")
+        status.pop("traceback", None)
+        if status.get("state") in FINISHED_STATES:
+            status["files"] = [f"/jobs/{job_id}/files/{name}" for name in self.runner.files(job_id)]
+        # Results may hold values json can't encode (e.g. numpy numbers), so encode here
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.finish(json.dumps(status, default=str))
+
+    def delete(self, job_id):
+        if self.runner.status(job_id) is None:
+            raise tornado.web.HTTPError(404, reason="Unknown job")
+        self.finish({"id": job_id, "cancel_requested": self.runner.cancel(job_id)})
+
+
+class JobFileHandler(BaseHandler):
+    def get(self, job_id, name):
+        if name not in self.runner.files(job_id):
+            raise tornado.web.HTTPError(404, reason="Unknown file")
+        self.set_header("Content-Disposition", f'attachment; filename="{name}"')
+        self.set_header("Content-Type", "application/octet-stream")
+        with open(os.path.join(self.runner.work_dir(job_id), name), "rb") as f:
+            self.finish(f.read())
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.finish({"status": "ok", "active_jobs": len(self.runner.active_jobs())})
+
+
+def make_app(runner, max_queued):
+    return tornado.web.Application([
+        (r"/health", HealthHandler),
+        (r"/jobs/extract", ExtractHandler),
+        (r"/jobs/reconcile", ReconcileHandler),
+        (r"/jobs/pipeline", PipelineHandler),
+        (r"/jobs/([0-9a-f]{32})", JobHandler),
+        (r"/jobs/([0-9a-f]{32})/files/([^/]+)", JobFileHandler),
+    ], runner=runner, max_queued=max_queued)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger extraction and reconciliation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=config.get("service_port", 8600))
+    parser.add_argument("--workers", type=int, default=config.get("service_workers", 2))
+    parser.add_argument("--max-queued", type=int, default=config.get("service_max_queued", 50))
+    args = parser.parse_args()
+
+    runner = JobRunner(max_workers=args.workers, executor="process", initializer=init_worker)
+    runner.prestart()
+    app = make_app(runner, args.max_queued)
+    app.listen(args.port, address=args.host, max_body_size=MAX_BODY_SIZE)
+    logger.info(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    finally:
+        runner.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
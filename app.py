@@ -1,5 +1,13 @@
 # app.py
 import streamlit as st
+from api.reconciler.config_utils import load_config
+
+
+@st.cache_resource
+def warm_up_ocr():
+    """Load and warm the OCR model once per server process, off the script thread"""
+    from api.ocr.model_registry import warm_up_in_background
+    return warm_up_in_background()
 
 st.set_page_config(
     page_title="Finance Dashboard",
@@ -16,4 +24,7 @@ with st.sidebar:
     if st.button("Clear Cache", help="Reset all temporary data"):
         st.cache_data.clear()
         st.success("Cache cleared!")
-    st.divider()
\ No newline at end of file
+    st.divider()
+
+if load_config().get("ocr_warm_up", True):
+    warm_up_ocr()
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+End-to-end extraction benchmark over a generated fixture corpus, offline.
+
+Every statement in the corpus goes through api.pipeline.extract_ledger and
+export_ledger with the fake LLM client (api.ocr.utils.fake_llm) at each
+requested concurrency (statements processed at once). The report shows
+throughput, per-stage time (render, OCR, sheet read, LLM, validate,
+export) and accuracy against the corpus's truth.json.
+
+    python -m benchmarks.extraction_bench [--corpus ./data/bench/corpus] [--concurrency 1 2 4]
+        [--latency-ms 300] [--ms-per-token 5] [--warm-caches] [--no-local] [--real-llm]
+
+The corpus is generated (benchmarks.fixtures) if it does not exist. LLM
+and OCR caches and layout templates are off unless --warm-caches is
+given, so every run measures the full pipeline.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import pypdfium2 as pdfium
+from api.reconciler.config_utils import load_config
+from benchmarks.fixtures import generate_corpus
+
+STAGES = ("render", "ocr", "read", "llm", "validate", "export")
+STATEMENT_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".webp", ".xlsx", ".xls")
+
+
+def write_bench_config(args, work_dir):
+    """config.json for the run: fake LLM, caches and templates in work_dir (or off)"""
+    config = load_config()
+    config.update({
+        "llm_provider": "openai" if args.real_llm else "fake",
+        "llm_fake_latency_ms": args.latency_ms,
+        "llm_fake_ms_per_token": args.ms_per_token,
+        "llm_cache_dir": os.path.join(work_dir, "cache", "llm"),
+        "ocr_cache_dir": os.path.join(work_dir, "cache", "ocr"),
+        "layout_templates_dir": os.path.join(work_dir, "templates"),
+    })
+    if not args.warm_caches:
+        config.update({"llm_cache_enabled": False, "ocr_cache_enabled": False, "layout_templates_enabled": False})
+    if args.no_local:
+        # Send everything to the LLM: no local Excel parser or word-position table rebuild
+        config.update({"local_excel_min_confidence": 2.0, "ocr_table_enabled": False})
+    path = os.path.join(work_dir, "config.json")
+    with open(path, "w") as f:
+        json.dump(config, f, indent=4)
+    return path
+
+
+def page_count(path):
+    if path.lower().endswith(".pdf"):
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    return 1
+
+
+def run_level(files, concurrency, truth, output_dir):
+    """Extract and export every file with `concurrency` statements in flight"""
+    from api.pipeline import extract_ledger
+    from api.ocr.utils import stage_timer
+    from api.ocr.utils.export_excel import export_ledger
+
+    def process(path):
+        name = os.path.basename(path)
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        start = time.perf_counter()
+        try:
+            ledger = extract_ledger(file_bytes, name)
+            if ledger is not None:
+                export_ledger(ledger, os.path.join(output_dir, os.path.splitext(name)[0] + ".xlsx"))
+        except Exception as e:
+            print(f"  {name} failed: {e}")
+            ledger = None
+        expected = truth.get(name, {})
+        rows = 0 if ledger is None else len(ledger.transactions)
+        closing = None if ledger is None else ledger.closing_balance
+        return {
+            "file": name,
+            "seconds": time.perf_counter() - start,
+            "rows_ok": rows == expected.get("transactions"),
+            "closing_ok": closing is not None and expected.get("closing_balance") is not None
+                          and abs(float(closing) - expected["closing_balance"]) <= 0.01,
+        }
+
+    stage_timer.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(process, files))
+    return results, time.perf_counter() - start, stage_timer.snapshot()
+
+
+def report(concurrency, files, pages, results, wall, stages):
+    rows_ok = sum(result["rows_ok"] for result in results)
+    closing_ok = sum(result["closing_ok"] for result in results)
+    print(f"\nconcurrency {concurrency}: {len(files)} files ({pages} pages) in {wall:.2f}s"
+          f" = {len(files) / wall:.2f} files/s, {pages / wall:.2f} pages/s")
+    print(f"  accuracy: {rows_ok}/{len(files)} row counts, {closing_ok}/{len(files)} closing balances")
+    total = sum(seconds for seconds, _ in stages.values()) or 1.0
+    print(f"  {'stage':<10} {'seconds':>9} {'calls':>6} {'share':>6}")
+    for stage in STAGES + tuple(sorted(set(stages) - set(STAGES))):
+        if stage in stages:
+            seconds, calls = stages[stage]
+            print(f"  {stage:<10} {seconds:>9.2f} {calls:>6} {100 * seconds / total:>5.0f}%")
+    slowest = max(results, key=lambda result: result["seconds"])
+    print(f"  slowest file: {slowest['file']} ({slowest['seconds']:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end extraction benchmark")
+    parser.add_argument("--corpus", default="./data/bench/corpus")
+    parser.add_argument("--statements", type=int, default=4, help="statements to generate if the corpus is missing")
+    parser.add_argument("--rows", type=int, default=60, help="transactions per generated statement")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--latency-ms", type=float, default=300, help="fake LLM time to first token")
+    parser.add_argument("--ms-per-token", type=float, default=5, help="fake LLM time per output token")
+    parser.add_argument("--warm-caches", action="store_true", help="keep LLM/OCR caches and layout templates on")
+    parser.add_argument("--no-local", action="store_true", help="disable the local parsers so every file hits the LLM")
+    parser.add_argument("--real-llm", action="store_true", help="call the configured OpenAI endpoint instead")
+    parser.add_argument("--work-dir", help="keep config, caches and exports here instead of a temp dir")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.corpus):
+        generate_corpus(args.corpus, args.statements, args.rows)
+        print(f"Generated fixture corpus in {args.corpus}")
+    truth_path = os.path.join(args.corpus, "truth.json")
+    truth = {}
+    if os.path.exists(truth_path):
+        with open(truth_path) as f:
+            truth = json.load(f)
+    files = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+                   if name.lower().endswith(STATEMENT_EXTENSIONS))
+    if not files:
+        print(f"No statements in {args.corpus}")
+        return 1
+    pages = sum(page_count(path) for path in files)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="extraction-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    # Modules read their configuration at import, so point them at the bench config first
+    os.environ["LEDGER_PARSER_CONFIG"] = write_bench_config(args, work_dir)
+    os.environ["LLM_PROVIDER"] = "openai" if args.real_llm else "fake"
+    output_dir = os.path.join(work_dir, "output")
+    os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        if any(not path.lower().endswith((".xlsx", ".xls")) for path in files):
+            # Load the OCR models outside the timed runs
+            from api.ocr.model_registry import warm_up
+            warm_up()
+        for concurrency in args.concurrency:
+            results, wall, stages = run_level(files, concurrency, truth, output_dir)
+            report(concurrency, files, pages, results, wall, stages)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Generated statement fixtures for benchmarks: the same seeded synthetic
+statements rendered as digital PDFs (text layer), scanned PDFs (images
+only), PNG photos and Excel sheets, plus truth.json with each file's
+transaction count and closing balance.
+
+    python -m benchmarks.fixtures ./data/bench/corpus [--statements 4] [--rows 60]
+"""
+import os
+import json
+import ctypes
+import random
+import argparse
+import datetime
+import pandas as pd
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from PIL import Image, ImageDraw, ImageFont
+
+KINDS = ("pdf", "scan", "png", "xlsx")
+HEADER = ("Date", "Description", "Withdrawal", "Deposit", "Balance")
+MERCHANTS = ("CARD PAYMENT CARREFOUR", "SALARY CREDIT", "ATM WITHDRAWAL", "DEWA BILL PAYMENT",
+             "TRANSFER TO SAVINGS", "NOON.COM PURCHASE", "ETISALAT RECHARGE", "CHEQUE DEPOSIT")
+ROWS_PER_PAGE = 30
+
+# Column x positions (left edge, or right edge for amounts) on a 595 x 842 point page
+COLUMNS_PT = (40, 110, 390, 460, 550)
+PAGE_PT = (595, 842)
+IMAGE_DPI = 150
+
+
+def make_statement(seed, rows):
+    """Synthetic statement with a consistent balance chain"""
+    rng = random.Random(seed)
+    balance = round(rng.uniform(1000, 20000), 2)
+    opening = balance
+    day = datetime.date(2024, 1, 1)
+    transactions = []
+    for _ in range(rows):
+        day += datetime.timedelta(days=rng.randint(0, 2))
+        description = rng.choice(MERCHANTS)
+        amount = round(rng.uniform(5, 3000), 2)
+        if description in ("SALARY CREDIT", "CHEQUE DEPOSIT"):
+            debit, credit = 0.0, amount
+        else:
+            debit, credit = amount, 0.0
+        balance = round(balance - debit + credit, 2)
+        transactions.append((day, f"{description} {rng.randint(1000, 9999)}", debit, credit, balance))
+    return {
+        "account": f"ACME TRADING {seed} LLC",
+        "bank": "Emirates NBD",
+        "opening_balance": opening,
+        "closing_balance": balance,
+        "transactions": transactions,
+    }
+
+
+def _money(value):
+    return f"{value:,.2f}" if value else ""
+
+
+def page_lines(statement):
+    """Per page, a list of lines (lists of cells): preamble, header, rows"""
+    rows = statement["transactions"]
+    pages = []
+    for start in range(0, len(rows), ROWS_PER_PAGE):
+        lines = []
+        if start == 0:
+            lines.append([f"Account Name: {statement['account']}"])
+            lines.append([f"Bank Name: {statement['bank']}"])
+            lines.append([])
+        lines.append(list(HEADER))
+        if start == 0:
+            lines.append(["", "Opening Balance", "", "", _money(statement["opening_balance"])])
+        for day, description, debit, credit, balance in rows[start:start + ROWS_PER_PAGE]:
+            lines.append([day.strftime("%d/%m/%Y"), description, _money(debit), _money(credit), _money(balance)])
+        pages.append(lines)
+    return pages
+
+
+def _cell_x(column, text_width):
+    """Left edge for a cell: the first two columns are left-aligned, amounts right-aligned"""
+    if column < 2:
+        return COLUMNS_PT[column]
+    return COLUMNS_PT[column] - text_width
+
+
+def write_digital_pdf(statement, path):
+    pdf = pdfium.PdfDocument.new()
+    font = pdfium_c.FPDFText_LoadStandardFont(pdf.raw, b"Helvetica")
+    size = 8.0
+    for lines in page_lines(statement):
+        page = pdf.new_page(*PAGE_PT)
+        y = PAGE_PT[1] - 50
+        for cells in lines:
+            for column, text in enumerate(cells):
+                if not text:
+                    continue
+                obj = pdfium_c.FPDFPageObj_CreateTextObj(pdf.raw, font, size)
+                buffer = ctypes.create_string_buffer((text + "\0").encode("utf-16-le"))
+                pdfium_c.FPDFText_SetText(obj, ctypes.cast(buffer, ctypes.POINTER(pdfium_c.FPDF_WCHAR)))
+                # Helvetica digits are ~0.556 em wide
+                x = _cell_x(column, 0.556 * size * len(text)) if len(cells) > 1 else 40
+                pdfium_c.FPDFPageObj_Transform(obj, 1, 0, 0, 1, x, y)
+                pdfium_c.FPDFPage_InsertObject(page.raw, obj)
+            y -= 14
+        pdfium_c.FPDFPage_GenerateContent(page.raw)
+        page.close()
+    pdf.save(path)
+    pdf.close()
+
+
+def page_images(statement, skew=0.0):
+    """Statement pages drawn as RGB images at IMAGE_DPI"""
+    scale = IMAGE_DPI / 72
+    font = ImageFont.load_default(size=int(8 * scale * 1.2))
+    images = []
+    for lines in page_lines(statement):
+        image = Image.new("RGB", (int(PAGE_PT[0] * scale), int(PAGE_PT[1] * scale)), "white")
+        draw = ImageDraw.Draw(image)
+        y = 50 * scale
+        for cells in lines:
+            for column, text in enumerate(cells):
+                if not text:
+                    continue
+                width = draw.textlength(text, font=font) / scale
+                x = _cell_x(column, width) if len(cells) > 1 else 40
+                draw.text((x * scale, y), text, fill="black", font=font)
+            y += 14 * scale
+        if skew:
+            image = image.rotate(skew, expand=False, fillcolor="white", resample=Image.BICUBIC)
+        images.append(image)
+    return images
+
+
+def write_scanned_pdf(statement, path):
+    images = page_images(statement)
+    images[0].save(path, "PDF", resolution=IMAGE_DPI, save_all=True, append_images=images[1:])
+
+
+def write_png(statement, path, skew=1.5):
+    # A photo: one page, slightly rotated
+    page_images(statement, skew)[0].save(path)
+
+
+def write_xlsx(statement, path):
+    rows = [["Account Name", statement["account"]], ["Bank Name", statement["bank"]], [], list(HEADER),
+            [None, "Opening Balance", None, None, statement["opening_balance"]]]
+    for day, description, debit, credit, balance in statement["transactions"]:
+        rows.append([day, description, debit or None, credit or None, balance])
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+
+
+WRITERS = {"pdf": write_digital_pdf, "scan": write_scanned_pdf, "png": write_png, "xlsx": write_xlsx}
+EXTENSIONS = {"pdf": ".pdf", "scan": ".pdf", "png": ".png", "xlsx": ".xlsx"}
+
+
+def generate_corpus(directory, statements=4, rows=60, kinds=KINDS, seed=0):
+    """Write the fixture files and truth.json; returns {file name: truth}"""
+    os.makedirs(directory, exist_ok=True)
+    truth = {}
+    for number in range(statements):
+        statement = make_statement(seed + number, rows)
+        for kind in kinds:
+            transactions = len(statement["transactions"])
+            if kind == "png":
+                # Only the first page is photographed
+                transactions = min(transactions, ROWS_PER_PAGE)
+            name = f"statement_{number:03d}_{kind}{EXTENSIONS[kind]}"
+            WRITERS[kind](statement, os.path.join(directory, name))
+            closing = statement["transactions"][transactions - 1][4]
+            truth[name] = {"transactions": transactions, "closing_balance": closing}
+    with open(os.path.join(directory, "truth.json"), "w") as f:
+        json.dump(truth, f, indent=4)
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark statement fixtures")
+    parser.add_argument("directory")
+    parser.add_argument("--statements", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=KINDS)
+    args = parser.parse_args()
+    truth = generate_corpus(args.directory, args.statements, args.rows, args.kinds)
+    print(f"Wrote {len(truth)} fixture files to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
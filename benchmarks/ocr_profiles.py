@@ -0,0 +1,121 @@
+"""
+Latency / accuracy benchmark of OCR model profiles over a local corpus of
+statement PDFs and images.
+
+Every combination of detection architecture, recognition architecture and
+detection input size runs in its own process (so peak RSS is per profile)
+and is reported as pages/sec, peak RSS and character error rate against
+the baseline profile's text (the first combination, or --baseline).
+
+    python -m benchmarks.ocr_profiles ./corpus \\
+        --det fast_base db_mobilenet_v3_large --reco crnn_vgg16_bn crnn_mobilenet_v3_small \\
+        --sizes 0 768 [--baseline fast_base:crnn_vgg16_bn:0] [--backend onnx]
+
+A size of 0 keeps the architecture's default input size. The chosen
+profile goes into config.json as ocr_det_arch / ocr_reco_arch /
+ocr_det_input_size.
+"""
+import os
+import sys
+import time
+import resource
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from api.reconciler.config_utils import load_config
+from api.ocr.utils.pdf_pages import load_pages
+from api.ocr.utils.text_metrics import character_error_rate
+
+CORPUS_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+def corpus_files(directory):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(CORPUS_EXTENSIONS)
+    )
+
+
+def profile_name(options):
+    return f"{options['det_arch']}:{options['reco_arch']}:{options['det_input_size'] or 0}"
+
+
+def run_profile(options, backend, files, dpi):
+    """Worker: build the predictor for one profile, OCR the corpus, report texts, time and peak RSS"""
+    from api.ocr.model_registry import _build_predictor
+
+    pages = load_pages(files, dpi)
+    start = time.perf_counter()
+    predictor = _build_predictor(backend=backend, options=options)
+    load_seconds = time.perf_counter() - start
+
+    predictor(pages[:1])  # warm-up
+    start = time.perf_counter()
+    texts = []
+    for page in pages:
+        texts.extend(p.render() for p in predictor([page]).pages)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"texts": texts, "seconds": seconds, "load_seconds": load_seconds, "peak_rss_mb": peak_rss_mb}
+
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Benchmark OCR model profiles on a statement corpus")
+    parser.add_argument("corpus", help="directory of statement PDFs / images")
+    parser.add_argument("--det", nargs="+", default=[config.get("ocr_det_arch", "fast_base")])
+    parser.add_argument("--reco", nargs="+", default=[config.get("ocr_reco_arch", "crnn_vgg16_bn")])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[config.get("ocr_det_input_size") or 0])
+    parser.add_argument("--baseline", help="det:reco:size profile used as the CER reference (default: first)")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--dpi", type=int, default=config.get("ocr_pdf_dpi", 144))
+    args = parser.parse_args()
+
+    files = corpus_files(args.corpus)
+    if not files:
+        print(f"No PDFs or images found in {args.corpus}")
+        return 1
+
+    profiles = [
+        {"det_arch": det, "reco_arch": reco, "det_input_size": size or None}
+        for det, reco, size in itertools.product(args.det, args.reco, args.sizes)
+    ]
+    baseline = args.baseline or profile_name(profiles[0])
+    if baseline not in [profile_name(p) for p in profiles]:
+        det, reco, size = baseline.split(":")
+        profiles.insert(0, {"det_arch": det, "reco_arch": reco, "det_input_size": int(size) or None})
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for options in profiles:
+        name = profile_name(options)
+        print(f"Running {name} ...", flush=True)
+        # A fresh process per profile so peak RSS is not inherited from earlier models
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(run_profile, options, args.backend, files, args.dpi).result()
+            except Exception as e:
+                print(f"  {name} failed: {e}")
+
+    if baseline not in results:
+        print(f"Baseline {baseline} did not run; cannot compute CER")
+        return 1
+    reference = results[baseline]["texts"]
+
+    print(f"\n{len(files)} file(s), {len(reference)} page(s), backend {args.backend}, baseline {baseline}")
+    print(f"{'profile':<55} {'pages/sec':>9} {'load s':>7} {'peak MB':>8} {'CER':>7}")
+    for name, result in results.items():
+        pages = len(result["texts"])
+        cer = [character_error_rate(ref, hyp) for ref, hyp in zip(reference, result["texts"])]
+        mean_cer = sum(cer) / len(cer) if cer else 0.0
+        print(f"{name:<55} {pages / result['seconds']:>9.2f} {result['load_seconds']:>7.1f} "
+              f"{result['peak_rss_mb']:>8.0f} {mean_cer:>7.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Accuracy and speed check: ONNX Runtime OCR backend against torch on sample
+pages. Reports per-page character error rate (ONNX text vs torch text) and
+pages/sec for each backend; exits non-zero if any page exceeds --max-cer.
+
+    python -m benchmarks.onnx_accuracy sample1.pdf scan.png [--quantize] [--max-cer 0.01]
+"""
+import sys
+import time
+import argparse
+from api.reconciler.config_utils import load_config
+from api.ocr.model_registry import _build_predictor
+from api.ocr.onnx_backend import to_onnx_predictor
+from api.ocr.utils.pdf_pages import load_pages
+from api.ocr.utils.text_metrics import character_error_rate
+
+
+def run(predictor, pages):
+    """Warm up, then OCR the pages; returns (rendered page texts, seconds)"""
+    predictor(pages[:1])
+    start = time.perf_counter()
+    result = predictor(pages)
+    return [page.render() for page in result.pages], time.perf_counter() - start
+
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="+", help="PDFs or images")
+    parser.add_argument("--quantize", action="store_true", help="use the int8 dynamically quantised models")
+    parser.add_argument("--max-cer", type=float, default=0.01)
+    parser.add_argument("--dpi", type=int, default=config.get("ocr_pdf_dpi", 144))
+    args = parser.parse_args()
+
+    pages = load_pages(args.files, args.dpi)
+    if not pages:
+        print("No pages to check")
+        return 1
+
+    torch_texts, torch_seconds = run(_build_predictor(backend="torch"), pages)
+    onnx_predictor = to_onnx_predictor(_build_predictor(backend="torch"), args.quantize, config.get("ocr_threads", 0))
+    onnx_texts, onnx_seconds = run(onnx_predictor, pages)
+
+    cer = [character_error_rate(reference, hypothesis) for reference, hypothesis in zip(torch_texts, onnx_texts)]
+    for index, value in enumerate(cer):
+        print(f"page {index + 1}: CER {value:.4f}")
+    mode = "onnx int8" if args.quantize else "onnx fp32"
+    print(f"torch: {len(pages) / torch_seconds:.2f} pages/sec")
+    print(f"{mode}: {len(pages) / onnx_seconds:.2f} pages/sec ({torch_seconds / onnx_seconds:.2f}x)")
+    print(f"worst CER {max(cer):.4f} (limit {args.max_cer})")
+    return 0 if max(cer) <= args.max_cer else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
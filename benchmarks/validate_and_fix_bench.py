@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: vectorised validate_and_fix against the previous row-by-row
+implementation, on synthetic statements of increasing size. Also checks
+that both give identical results for every repair case.
+
+    python -m benchmarks.validate_and_fix_bench [--sizes 1000 10000 100000] [--legacy-max-rows 20000]
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from api.ocr.utils import validate_and_fix as current
+
+
+# ----------------------------------------------------------------------
+# Previous row-by-row implementation, kept here for comparison
+# ----------------------------------------------------------------------
+def legacy_fix_missing_balances(df, opening_balance):
+    df = df.copy()
+    df.loc[df.index[0], 'balance'] = opening_balance + df['credit'].iloc[0] - df['debit'].iloc[0]
+    for i in range(1, len(df)):
+        df.loc[df.index[i], 'balance'] = (
+            df['balance'].iloc[i-1] + df['credit'].iloc[i] - df['debit'].iloc[i]
+        )
+    return df
+
+
+def legacy_recalculate_transactions(df, opening_balance):
+    df = df.copy()
+    balance_diff = opening_balance - df['balance'].iloc[0]
+    if balance_diff > 0:
+        df.loc[df.index[0], 'debit'] = balance_diff
+        df.loc[df.index[0], 'credit'] = 0
+    else:
+        df.loc[df.index[0], 'credit'] = abs(balance_diff)
+        df.loc[df.index[0], 'debit'] = 0
+    for i in range(1, len(df)):
+        balance_diff = df['balance'].iloc[i-1] - df['balance'].iloc[i]
+        if balance_diff > 0:
+            df.loc[df.index[i], 'debit'] = balance_diff
+            df.loc[df.index[i], 'credit'] = 0
+        else:
+            df.loc[df.index[i], 'credit'] = abs(balance_diff)
+            df.loc[df.index[i], 'debit'] = 0
+    return df
+
+
+def legacy_validate_and_fix(ledger_name, opening_balance, df):
+    df = df.copy()
+    if df['balance'].isna().any():
+        return legacy_fix_missing_balances(df, opening_balance)
+    calculated_final_balance = opening_balance + df['credit'].sum() - df['debit'].sum()
+    if abs(calculated_final_balance - df['balance'].iloc[-1]) < 1e-9:
+        return df
+    if (abs(opening_balance - df['balance'].iloc[0]) < 1e-9 and
+            ((df['credit'] != 0) & (df['debit'] != 0)).any()):
+        return current._fix_shifted_balances(df, ledger_name)
+    return legacy_recalculate_transactions(df, opening_balance)
+
+
+# ----------------------------------------------------------------------
+# Synthetic statements, one per repair case
+# ----------------------------------------------------------------------
+def make_statement(rows, case, seed=0):
+    rng = np.random.default_rng(seed)
+    opening = 10000.0
+    debit = np.where(rng.random(rows) < 0.6, np.round(rng.uniform(1, 500, rows), 2), 0.0)
+    credit = np.where(debit == 0, np.round(rng.uniform(1, 800, rows), 2), 0.0)
+    balance = opening + np.cumsum(credit - debit)
+    df = pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=rows, freq="h"),
+        "description": [f"Transaction {i}" for i in range(rows)],
+        "debit": debit,
+        "credit": credit,
+        "balance": balance,
+    })
+    if case == "missing":
+        df.loc[rng.random(rows) < 0.1, "balance"] = np.nan
+    elif case == "shifted":
+        df["balance"] = np.concatenate([[opening], balance[:-1]])
+        df.loc[0, "credit"] = df.loc[0, "debit"] = 5.0
+    elif case == "recalculate":
+        swap = rng.random(rows) < 0.2
+        df.loc[swap, ["debit", "credit"]] = df.loc[swap, ["credit", "debit"]].values
+    return opening, df
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-max-rows", type=int, default=20000,
+                        help="skip the row-by-row version above this size (it takes minutes)")
+    args = parser.parse_args()
+
+    print(f"{'case':<12}{'rows':>8}{'legacy ms':>12}{'vector ms':>12}{'speedup':>10}  identical")
+    for case in ("missing", "correct", "shifted", "recalculate"):
+        for rows in args.sizes:
+            opening, df = make_statement(rows, case)
+            vector_time, vector = timed(current.validate_and_fix, "Bank", opening, df)
+            if rows > args.legacy_max_rows:
+                print(f"{case:<12}{rows:>8}{'-':>12}{vector_time * 1000:>12.2f}{'-':>10}  -")
+                continue
+            legacy_time, legacy = timed(legacy_validate_and_fix, "Bank", opening, df, repeat=1)
+            identical = legacy.equals(vector)
+            print(f"{case:<12}{rows:>8}{legacy_time * 1000:>12.1f}{vector_time * 1000:>12.2f}"
+                  f"{legacy_time / vector_time:>9.0f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import os
 import streamlit as st
 import pandas as pd
-from api.ocr.excel_parser import excel_parser
-from api.ocr.image_parser import image_parser
+from api.jobs import default_runner, QUEUED, RUNNING, DONE, FAILED
+from api.pipeline import STATEMENT_EXTENSIONS
+from api.ledger.normalised import Ledger, read_ledger, write_ledger, ledger_path_for
 
 st.set_page_config(page_title="Bank Statement Editor", layout="centered")
 st.title("\U0001F3E6 Bank Statement Editor")
@@ -24,6 +25,10 @@ def initialize_session():
         st.session_state.metadata = None
     if 'last_opening_balance' not in st.session_state:
         st.session_state.last_opening_balance = None
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = None
+    if 'job_message' not in st.session_state:
+        st.session_state.job_message = None
 
 def recalculate_balance(df, opening_balance=0):
     df = df.copy()
@@ -48,50 +53,83 @@ def update_closing_balance_in_metadata(new_closing_balance):
         except Exception as e:
             st.error(f"Error updating closing balance: {e}")
 
-def process_file():
+def metadata_value(metadata, label):
+    """Value of a metadata field (matched case-insensitively), or None"""
+    mask = metadata['Field'].str.lower().str.contains(label, na=False)
+    if not mask.any():
+        return None
+    value = metadata.loc[mask.idxmax(), 'Value']
+    return None if value in ("", "N/A", "None", "nan") else value
+
+def metadata_frame(ledger):
+    rows = [
+        ["Account:", ledger.account or "N/A"],
+        ["Ledger:", ledger.ledger or "N/A"],
+        ["Opening Balance:", ledger.opening_balance if ledger.opening_balance is not None else "N/A"],
+        ["Closing Balance:", ledger.closing_balance if ledger.closing_balance is not None else "N/A"],
+    ]
+    return pd.DataFrame(rows, columns=['Field', 'Value']).astype(str)
+
+def start_extraction():
+    """Queue the uploaded file on the shared job runner"""
     if st.session_state.uploaded_file is None:
         st.warning("No file uploaded!")
         return False
 
-    try:
-        with st.spinner("🔍 Extracting and analyzing..."):
-            file_name = st.session_state.uploaded_file.name
-            if file_name.lower().endswith((".xlsx", ".xls")):
-                st.session_state.output_path = excel_parser(st.session_state.uploaded_file)
-            elif file_name.lower().endswith((".pdf", ".png", ".jpg", ".jpeg", ".webp")):
-                st.session_state.output_path = image_parser(st.session_state.uploaded_file)
-            else:
-                st.error("Unsupported file type.")
-                return False
+    file_name = st.session_state.uploaded_file.name
+    if not file_name.lower().endswith(STATEMENT_EXTENSIONS):
+        st.error("Unsupported file type.")
+        return False
 
-            if not os.path.exists(st.session_state.output_path):
-                st.error("Output file was not created successfully")
-                return False
+    st.session_state.job_id = default_runner().submit(
+        "extract", file_bytes=st.session_state.uploaded_file.getvalue(), file_name=file_name
+    )
+    st.session_state.job_message = None
+    return True
 
-            full_df = pd.read_excel(st.session_state.output_path, header=None)
-            date_mask = full_df[0].astype(str).str.lower().eq("date")
-            if not date_mask.any():
-                st.error("Could not detect 'date' header row in the file.")
+@st.fragment(run_every=1)
+def extraction_progress():
+    """Poll the extraction job; loads the result once it has finished"""
+    runner = default_runner()
+    status = runner.status(st.session_state.job_id)
+    if status is None:
+        st.session_state.job_id = None
+        st.rerun()
+
+    if status["state"] in (QUEUED, RUNNING):
+        stage = status.get("stage") or status["state"]
+        st.progress(status.get("progress") or 0.0, text=f"🔍 Extracting and analyzing... ({stage})")
+        if st.button("✖️ Cancel Extraction"):
+            runner.cancel(st.session_state.job_id)
+        rows = runner.partial_rows(st.session_state.job_id)
+        if rows:
+            st.caption(f"{len(rows)} transactions received so far (balances are checked once extraction finishes)")
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, height=300)
+        return
+
+    st.session_state.job_id = None
+    if status["state"] == DONE:
+        st.session_state.output_path = status["result"]["xlsx"]
+        process_file()
+    elif status["state"] == FAILED:
+        st.session_state.job_message = ("error", f"Error processing file: {status.get('error')}")
+    else:
+        st.session_state.job_message = ("warning", "Extraction cancelled.")
+    st.rerun()
+
+def process_file():
+    """Load the extracted ledger into the editor"""
+    try:
+        with st.spinner("📄 Loading extracted data..."):
+            ledger_path = ledger_path_for(st.session_state.output_path)
+            if not os.path.exists(ledger_path):
+                st.session_state.job_message = ("error", "Output file was not created successfully")
                 return False
-            table_start_idx = date_mask.idxmax()
-
-            metadata = full_df.iloc[:table_start_idx, :2].copy()
-            metadata.columns = [0, 1]
-            table = pd.read_excel(st.session_state.output_path, skiprows=table_start_idx)
-            if 'date' in table.columns:
-                table['date'] = pd.to_datetime(table['date'], errors='coerce')
-
-            opening_balance = 0
-            try:
-                ob = metadata[metadata[0].astype(str).str.lower().str.contains('opening balance', na=False)][1]
-                if not ob.empty:
-                    opening_balance = float(ob.values[0])
-            except:
-                pass
-
-            table = recalculate_balance(table, opening_balance)
-            meta_df = metadata.copy().astype(str)
-            meta_df.columns = ['Field', 'Value']
+
+            ledger = read_ledger(ledger_path)
+            opening_balance = ledger.opening_balance or 0
+            table = recalculate_balance(ledger.transactions, opening_balance)
+            meta_df = metadata_frame(ledger)
             closing = table['balance'].iloc[-1]
             meta_df.loc[meta_df['Field'].str.lower().str.contains('closing balance', na=False), 'Value'] = f"{closing:.2f}"
 
@@ -101,10 +139,10 @@ def process_file():
             st.session_state.last_opening_balance = opening_balance
             st.session_state.processed = True
             st.session_state.editor_key += 1
-            st.success("File processed successfully!")
+            st.session_state.job_message = ("success", "File processed successfully!")
             return True
     except Exception as e:
-        st.error(f"Error processing file: {e}")
+        st.session_state.job_message = ("error", f"Error processing file: {e}")
         return False
 
 def save_changes():
@@ -118,6 +156,16 @@ def save_changes():
             pd.DataFrame([[]]).to_excel(writer, index=False, header=False, startrow=len(st.session_state.metadata))
             df_to_save.to_excel(writer, index=False, startrow=len(st.session_state.metadata) + 1)
 
+        meta = st.session_state.metadata
+        write_ledger(
+            Ledger(st.session_state.df,
+                   account=metadata_value(meta, 'account'),
+                   ledger=metadata_value(meta, 'ledger'),
+                   opening_balance=metadata_value(meta, 'opening balance'),
+                   closing_balance=metadata_value(meta, 'closing balance')),
+            ledger_path_for(st.session_state.output_path)
+        )
+
         st.session_state.last_saved_df = st.session_state.df.copy()
         st.success("✅ Changes saved successfully!")
         st.session_state.editor_key += 1
@@ -129,8 +177,15 @@ def main():
     uploaded = st.file_uploader("Upload PDF, Image, or Excel", type=["pdf", "png", "jpg", "jpeg", "webp", "xls", "xlsx"], key="file_uploader")
     if uploaded:
         st.session_state.uploaded_file = uploaded
-    if st.session_state.uploaded_file and st.button("🔍 Extract Data"):
-        if process_file(): st.rerun()
+    if st.session_state.job_id:
+        extraction_progress()
+    elif st.session_state.uploaded_file and st.button("🔍 Extract Data"):
+        if start_extraction(): st.rerun()
+
+    if st.session_state.job_message:
+        level, message = st.session_state.job_message
+        getattr(st, level)(message)
+        st.session_state.job_message = None
 
     if st.session_state.processed:
         st.subheader("🧾 Metadata")
@@ -207,15 +262,23 @@ def main():
                 st.rerun()
         with c3:
             if st.button("✖️ New File"):
-                for k in ['processed', 'output_path', 'df', 'uploaded_file', 'last_saved_df', 'metadata', 'last_opening_balance']:
+                for k in ['processed', 'output_path', 'df', 'uploaded_file', 'last_saved_df', 'metadata', 'last_opening_balance', 'job_id', 'job_message']:
                     st.session_state.pop(k, None)
                 st.session_state.editor_key = 0
                 st.rerun()
 
         st.divider()
         st.caption(f"Editing: {os.path.basename(st.session_state.output_path)}")
+        retention_hours = default_runner().retention_hours
+        if retention_hours:
+            st.caption(f"Extracted files are deleted {retention_hours:g} hours after the last change; "
+                       "download the version you want to keep.")
         with open(st.session_state.output_path, 'rb') as f:
             st.download_button("⬇️ Download Current Version", data=f, file_name=f"edited_{os.path.basename(st.session_state.output_path)}", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        ledger_path = ledger_path_for(st.session_state.output_path)
+        if os.path.exists(ledger_path):
+            with open(ledger_path, 'rb') as f:
+                st.download_button("⬇️ Download Normalised Ledger", data=f, file_name=os.path.basename(ledger_path), mime="application/vnd.apache.parquet", help="Parquet ledger for the reconciler")
 
 if __name__ == "__main__":
     main()
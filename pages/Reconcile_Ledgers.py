@@ -1,22 +1,44 @@
 import os
-import tempfile
 import streamlit as st
 import pandas as pd
-from api.reconciler.main_processor import reconcile_statement
+from api.jobs import default_runner, QUEUED, RUNNING, DONE, FAILED
+from api.reconciler.config_utils import load_config
+from api.reconciler.export_results import OUTPUT_FORMATS
 
 # Configure output directory
 OUTPUT_DIR = os.path.abspath("./data/output/reconciled")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def save_uploaded_file(uploaded_file):
-    """Save uploaded file to temporary location and return path"""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-            tmp.write(uploaded_file.getbuffer())
-            return tmp.name
-    except Exception as e:
-        st.error(f"Error saving file: {str(e)}")
-        return None
+@st.fragment(run_every=1)
+def reconciliation_progress():
+    """Poll the reconciliation job and store its outputs once finished"""
+    runner = default_runner()
+    job = st.session_state.reconcile_job
+    status = runner.status(job['id'])
+    if status is None:
+        st.session_state.reconcile_job = None
+        st.rerun()
+
+    if status["state"] in (QUEUED, RUNNING):
+        stage = status.get("stage") or status["state"]
+        st.progress(status.get("progress") or 0.0, text=f"🧠 Processing ledgers... ({stage})")
+        if st.button("✖️ Cancel Reconciliation"):
+            runner.cancel(job['id'])
+        return
+
+    st.session_state.reconcile_job = None
+    if status["state"] == DONE:
+        outputs = status["result"]["outputs"]
+        st.session_state.reconciled = {
+            'processed': True,
+            'output_path': outputs.get("xlsx"),
+            'outputs': outputs,
+            'file1': job['file1'],
+            'file2': job['file2']
+        }
+    elif status["state"] == FAILED:
+        st.session_state.reconcile_error = f"❌ Reconciliation failed: {status.get('error')}"
+    st.rerun()
 
 def display_results(output_path):
     """Display results section with preview and download"""
@@ -28,6 +50,8 @@ def display_results(output_path):
     
     with col2:
         st.subheader("Download")
+        if default_runner().retention_hours:
+            st.caption(f"Reports are deleted after {default_runner().retention_hours:g} hours.")
         with open(output_path, "rb") as f:
             st.download_button(
                 label="⬇️ Full Report",
@@ -36,6 +60,21 @@ def display_results(output_path):
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 type="primary"
             )
+def display_machine_outputs(outputs):
+    """Download buttons for the Parquet/CSV/NDJSON match outputs"""
+    for fmt, paths in outputs.items():
+        if fmt == "xlsx":
+            continue
+        st.markdown(f"**{fmt.upper()}**")
+        for name, path in paths.items():
+            with open(path, "rb") as f:
+                st.download_button(
+                    label=f"⬇️ {name.title()}",
+                    data=f,
+                    file_name=os.path.basename(path),
+                    key=f"download_{fmt}_{name}"
+                )
+
 def display_excel(file_path):
     """Display Excel file content in Streamlit with all columns"""
     try:
@@ -92,6 +131,7 @@ def dual_ledger_page():
         st.session_state.reconciled = {
             'processed': False,
             'output_path': None,
+            'outputs': {},
             'file1': None,
             'file2': None
         }
@@ -99,58 +139,53 @@ def dual_ledger_page():
     # File upload section
     col1, col2 = st.columns(2)
     with col1:
-        file1 = st.file_uploader("Upload First Ledger", type=["xlsx", "xls"])
+        file1 = st.file_uploader("Upload First Ledger", type=["parquet", "xlsx", "xls"])
     with col2:
-        file2 = st.file_uploader("Upload Second Ledger", type=["xlsx", "xls"])
+        file2 = st.file_uploader("Upload Second Ledger", type=["parquet", "xlsx", "xls"])
     
+    output_formats = st.multiselect(
+        "Outputs",
+        options=list(OUTPUT_FORMATS),
+        default=load_config().get("output_formats", ["xlsx"]),
+        help="Styled workbook (xlsx) and/or machine-readable match results"
+    )
+
     # Process files button
     process_btn = st.button("🔍 Start Reconciliation", 
-                          disabled=not (file1 and file2),
+                          disabled=not (file1 and file2 and output_formats),
                           type="primary")
     
     if process_btn:
-        with st.spinner("🧠 Processing ledgers..."):
-            try:
-                # Save files
-                file1_path = save_uploaded_file(file1)
-                file2_path = save_uploaded_file(file2)
-                
-                if not all([file1_path, file2_path]):
-                    st.error("Failed to process uploaded files")
-                    return
-                
-                # Run reconciliation
-                output_path = reconcile_statement(file1_path, file2_path)
-                
-                if output_path and os.path.exists(output_path):
-                    st.session_state.reconciled = {
-                        'processed': True,
-                        'output_path': output_path,
-                        'file1': file1.name,
-                        'file2': file2.name
-                    }
-                    st.success("✅ Reconciliation completed!")
-                else:
-                    st.error("❌ Reconciliation failed")
-                
-                # Cleanup temp files
-                os.remove(file1_path)
-                os.remove(file2_path)
-                
-            except Exception as e:
-                st.error(f"Processing error: {str(e)}")
-                st.session_state.reconciled['processed'] = False
+        st.session_state.reconcile_job = {
+            'id': default_runner().submit(
+                "reconcile",
+                file_bytes1=file1.getvalue(), file_name1=file1.name,
+                file_bytes2=file2.getvalue(), file_name2=file2.name,
+                output_formats=output_formats
+            ),
+            'file1': file1.name,
+            'file2': file2.name
+        }
+        st.session_state.reconciled['processed'] = False
+
+    if st.session_state.get('reconcile_job'):
+        reconciliation_progress()
+    if st.session_state.get('reconcile_error'):
+        st.error(st.session_state.pop('reconcile_error'))
 
     # Display results if available
     if st.session_state.reconciled['processed']:
         st.subheader("Results")
+        output_path = st.session_state.reconciled['output_path']
         st.markdown(f"""
         - **First Ledger:** `{st.session_state.reconciled['file1']}`
         - **Second Ledger:** `{st.session_state.reconciled['file2']}`
-        - **Output File:** `{os.path.basename(st.session_state.reconciled['output_path'])}`
+        - **Output File:** `{os.path.basename(output_path) if output_path else 'not requested'}`
         """)
         
-        display_results(st.session_state.reconciled['output_path'])
+        if output_path:
+            display_results(output_path)
+        display_machine_outputs(st.session_state.reconciled['outputs'])
         
     # Reset button
     if st.session_state.reconciled['processed']:
@@ -158,6 +193,7 @@ def dual_ledger_page():
             st.session_state.reconciled = {
                 'processed': False,
                 'output_path': None,
+                'outputs': {},
                 'file1': None,
                 'file2': None
             }
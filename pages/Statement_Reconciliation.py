@@ -0,0 +1,118 @@
+import os
+import streamlit as st
+from api.jobs import default_runner, QUEUED, RUNNING, DONE, FAILED
+from api.reconciler.config_utils import load_config
+from api.reconciler.export_results import OUTPUT_FORMATS
+
+STATEMENT_TYPES = ["pdf", "png", "jpg", "jpeg", "webp", "xls", "xlsx"]
+
+def download_file(label, path, key):
+    with open(path, "rb") as f:
+        st.download_button(label=label, data=f, file_name=os.path.basename(path), key=key)
+
+def display_results(pipeline_state):
+    """Summary counts plus downloads for the reconciliation and extracted ledgers"""
+    summary = pipeline_state['summary']
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"**{pipeline_state['file1']}**")
+        st.json(summary['ledger1'])
+    with col2:
+        st.markdown(f"**{pipeline_state['file2']}**")
+        st.json(summary['ledger2'])
+
+    st.subheader("Download")
+    if default_runner().retention_hours:
+        st.caption(f"Reports and extracted statements are deleted after {default_runner().retention_hours:g} hours.")
+    outputs = pipeline_state['outputs']
+    if outputs.get("xlsx"):
+        download_file("⬇️ Reconciliation Report", outputs["xlsx"], "download_xlsx")
+    for fmt, paths in outputs.items():
+        if fmt == "xlsx":
+            continue
+        for name, path in paths.items():
+            download_file(f"⬇️ {fmt.upper()} {name.title()}", path, f"download_{fmt}_{name}")
+    for key, export_path in pipeline_state['exports'].items():
+        if export_path:
+            download_file(f"⬇️ Extracted {pipeline_state['file' + key[-1]]}", export_path, f"download_{key}")
+
+@st.fragment(run_every=1)
+def pipeline_progress():
+    """Poll the pipeline job and store its results once finished"""
+    runner = default_runner()
+    state = st.session_state.pipeline
+    status = runner.status(state['job_id'])
+    if status is None:
+        st.session_state.pipeline = {'processed': False}
+        st.rerun()
+
+    if status["state"] in (QUEUED, RUNNING):
+        stage = status.get("stage") or status["state"]
+        st.progress(status.get("progress") or 0.0, text=f"🔍 Extracting both statements and reconciling... ({stage})")
+        if st.button("✖️ Cancel"):
+            runner.cancel(state['job_id'])
+        return
+
+    if status["state"] == DONE:
+        result = status["result"]
+        st.session_state.pipeline = {
+            'processed': True,
+            'file1': state['file1'],
+            'file2': state['file2'],
+            'outputs': result['outputs'],
+            'summary': result['summary'],
+            'exports': result['exports'],
+        }
+    elif status["state"] == FAILED:
+        st.session_state.pipeline = {'processed': False, 'error': f"Processing error: {status.get('error')}"}
+    else:
+        st.session_state.pipeline = {'processed': False}
+    st.rerun()
+
+def statement_reconciliation_page():
+    st.title("Statement Reconciliation ⚡")
+    st.caption("Extract two raw statements side by side and reconcile them in one step.")
+
+    if 'pipeline' not in st.session_state:
+        st.session_state.pipeline = {'processed': False}
+
+    col1, col2 = st.columns(2)
+    with col1:
+        file1 = st.file_uploader("First Statement", type=STATEMENT_TYPES)
+    with col2:
+        file2 = st.file_uploader("Second Statement", type=STATEMENT_TYPES)
+
+    output_formats = st.multiselect(
+        "Outputs",
+        options=list(OUTPUT_FORMATS),
+        default=load_config().get("output_formats", ["xlsx"])
+    )
+
+    if st.button("⚡ Extract & Reconcile", disabled=not (file1 and file2 and output_formats), type="primary"):
+        st.session_state.pipeline = {
+            'processed': False,
+            'job_id': default_runner().submit(
+                "pipeline",
+                file_bytes1=file1.getvalue(), file_name1=file1.name,
+                file_bytes2=file2.getvalue(), file_name2=file2.name,
+                output_formats=output_formats
+            ),
+            'file1': file1.name,
+            'file2': file2.name,
+        }
+
+    if st.session_state.pipeline.get('job_id'):
+        pipeline_progress()
+    if st.session_state.pipeline.get('error'):
+        st.error(st.session_state.pipeline.pop('error'))
+
+    if st.session_state.pipeline['processed']:
+        st.subheader("Results")
+        display_results(st.session_state.pipeline)
+
+        if st.button("🔄 Start New Reconciliation"):
+            st.session_state.pipeline = {'processed': False}
+            st.rerun()
+
+if __name__ == "__main__":
+    statement_reconciliation_page()
@@ -85,6 +85,14 @@ def config_editor_page():
             value=config['enable_split_match']
         )
 
+    with st.expander("Outputs"):
+        config['output_formats'] = st.multiselect(
+            "Default Output Formats",
+            options=["xlsx", "parquet", "csv", "ndjson"],
+            default=config.get('output_formats', ["xlsx"]),
+            help="xlsx is the styled workbook; the others hold per-row categories, match pairs and summary counts"
+        )
+
     if st.button("Save Configuration"):
         save_config(config)
         st.success("Configuration saved successfully!")
@@ -0,0 +1,60 @@
+from api.ocr.utils.balance_chain import broken_rows, broken_segments, repair_chunks
+
+
+def _t(debit, credit, balance):
+    return {"date": "2024-01-01", "description": "x", "debit": debit, "credit": credit, "balance": balance}
+
+
+def _chunk(transactions, opening=None):
+    return {"opening_balance": opening, "closing_balance": None, "transactions": transactions}
+
+
+def test_broken_rows():
+    transactions = [_t(10, 0, 90), _t(0, 5, 95), _t(5, 0, 80), _t(0, 0, None), _t(1, 0, 79)]
+    assert broken_rows(transactions, 100).tolist() == [False, False, True, False, False]
+    # Without an opening balance the first row is not judged
+    assert not broken_rows([_t(10, 0, 50)], None).any()
+
+
+def test_broken_segments_merge_adjacent_rows():
+    transactions = [_t(10, 0, 90), _t(10, 0, 70), _t(10, 0, 50), _t(10, 0, 40)]
+    assert broken_segments(transactions, 100) == [(1, 3)]
+
+
+def test_repair_chunks_replaces_only_improved_chunks():
+    good = _chunk([_t(10, 0, 90), _t(10, 0, 80)], opening=100)
+    bad = _chunk([_t(10, 0, 75), _t(10, 0, 65)])
+    calls = []
+
+    def reparse(index, hint):
+        calls.append(index)
+        assert "balances" in hint
+        return _chunk([_t(10, 0, 70), _t(10, 0, 60)])
+
+    repaired = repair_chunks([good, bad], reparse)
+    # The break is on the second chunk's first row, so both sides of the boundary are retried
+    assert sorted(calls) == [0, 1]
+    assert repaired[0] is good
+    assert repaired[1]["transactions"][0]["balance"] == 70
+
+
+def test_repair_chunks_keeps_original_when_reparse_is_worse_or_fails():
+    bad = _chunk([_t(10, 0, 75), _t(10, 0, 65)], opening=100)
+
+    def worse(index, hint):
+        return _chunk([_t(10, 0, 1), _t(10, 0, 2)])
+
+    def failing(index, hint):
+        raise RuntimeError("network")
+
+    assert repair_chunks([bad], worse)[0] is bad
+    assert repair_chunks([bad], failing)[0] is bad
+
+
+def test_repair_chunks_untouched_when_chain_holds():
+    chunk = _chunk([_t(10, 0, 90)], opening=100)
+
+    def reparse(index, hint):
+        raise AssertionError("should not be called")
+
+    assert repair_chunks([chunk], reparse) == [chunk]
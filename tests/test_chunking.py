@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from api.ocr.utils.chunking import (
+    dedupe_boundary, split_text_chunks, split_csv_chunks, parse_chunks, merge_parsed_chunks, merge_with_sources
+)
+
+
+def _t(day, description, balance):
+    return {"date": f"2024-01-{day:02d}", "description": description, "debit": 1.0, "credit": 0.0, "balance": balance}
+
+
+def test_dedupe_boundary_drops_only_leading_repeats():
+    previous = [_t(1, "a", 10), _t(2, "b", 9)]
+    following = [_t(2, "b", 9), _t(3, "c", 8), _t(2, "b", 9)]
+    assert dedupe_boundary(previous, following) == following[1:]
+
+
+def test_dedupe_boundary_is_case_and_space_insensitive():
+    previous = [_t(1, "Card payment", 10)]
+    following = [_t(1, " card PAYMENT ", 10)]
+    assert dedupe_boundary(previous, following) == []
+
+
+def test_split_text_chunks_cuts_on_pages_and_repeats_header():
+    pages = ["ACME LLC\nEmirates NBD\n" + "x" * 40, "y" * 40, "z" * 40]
+    chunks = split_text_chunks("\n\n".join(pages), 70, header_lines=2)
+    assert len(chunks) == 3
+    assert chunks[0] == pages[0]
+    assert chunks[1] == "ACME LLC\nEmirates NBD\n" + pages[1]
+    assert chunks[2].endswith(pages[2])
+
+
+def test_split_text_chunks_splits_oversized_pages_on_lines():
+    page = "\n".join(f"line {i:02d}" for i in range(20))
+    chunks = split_text_chunks(page, 40)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert "\n".join(chunks) == page
+
+
+def test_split_text_chunks_keeps_short_text_whole():
+    assert split_text_chunks("one\n\ntwo", 1000) == ["one\n\ntwo"]
+
+
+def test_split_csv_chunks_repeats_header_and_keeps_quoted_newlines():
+    rows = [f'2024-01-{i:02d},"multi\nline {i}",{i}' for i in range(1, 6)]
+    csv_text = "date,description,amount\n" + "\n".join(rows) + "\n"
+    chunks = split_csv_chunks(csv_text, 2)
+    assert len(chunks) == 3
+    assert all(chunk.startswith("date,description,amount\n") for chunk in chunks)
+    assert '"multi\nline 5"' in chunks[2]
+
+
+def test_split_csv_chunks_short_sheet_unchanged():
+    csv_text = "a,b\n1,2\n"
+    assert split_csv_chunks(csv_text, 10) == [csv_text]
+
+
+def test_parse_chunks_keeps_order_and_limits_concurrency():
+    in_flight = []
+    peak = []
+
+    async def parse(chunk):
+        in_flight.append(chunk)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01 * (3 - chunk))
+        in_flight.remove(chunk)
+        return chunk * 10
+
+    assert asyncio.run(parse_chunks([0, 1, 2], parse, 2)) == [0, 10, 20]
+    assert max(peak) == 2
+
+
+def test_parse_chunks_reports_progress_and_can_be_aborted():
+    reports = []
+
+    async def parse(chunk):
+        return chunk
+
+    asyncio.run(parse_chunks([0, 1], parse, 1, lambda stage, fraction: reports.append((stage, fraction))))
+    assert reports == [("llm", 0.0), ("llm", 0.5), ("llm", 1.0)]
+
+    def cancel(stage, fraction):
+        if fraction > 0:
+            raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(parse_chunks([0, 1, 2], parse, 1, cancel))
+
+
+def test_merge_parsed_chunks():
+    first = {"Account": "ACME", "Ledger": None, "opening_balance": 11.0, "closing_balance": 9.0,
+             "transactions": [_t(1, "a", 10), _t(2, "b", 9)]}
+    second = {"Account": "Other", "Ledger": "ENBD", "opening_balance": 9.0, "closing_balance": 8.0,
+              "transactions": [_t(2, "b", 9), _t(3, "c", 8)]}
+    merged, sources = merge_with_sources([first, None, second])
+    assert merged["Account"] == "ACME"
+    assert merged["Ledger"] == "ENBD"
+    assert merged["opening_balance"] == 11.0
+    assert merged["closing_balance"] == 8.0
+    assert [t["description"] for t in merged["transactions"]] == ["a", "b", "c"]
+    assert sources == [0, 0, 2]
+    assert merge_parsed_chunks([first, second]) == merged
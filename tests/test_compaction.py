@@ -0,0 +1,68 @@
+from api.ocr.utils.compaction import compact_csv_text, compact_ocr_text, count_tokens
+
+
+def test_compact_csv_drops_empty_cells_columns_and_normalises_numbers():
+    csv_text = (
+        "Date,Unnamed: 1,Description,Debit,Credit,Balance\n"
+        "2024-01-02,,CARD PAYMENT,\"1,250.00\",nan,\"10,000.50\"\n"
+        ",,,,,\n"
+        "2024-01-03,nan,SALARY,,500.00,10500.50\n"
+    )
+    assert compact_csv_text(csv_text) == (
+        "Date,Description,Debit,Credit,Balance\n"
+        "2024-01-02,CARD PAYMENT,1250,,10000.5\n"
+        "2024-01-03,SALARY,,500,10500.5\n"
+    )
+
+
+def test_compact_csv_drops_boilerplate_rows():
+    csv_text = "Date,Amount\n2024-01-02,1.00\nPage 1 of 2,\n"
+    assert "Page" not in compact_csv_text(csv_text)
+
+
+def test_compact_csv_empty():
+    assert compact_csv_text(",,\n,,\n") == ""
+
+
+def test_compact_ocr_collapses_whitespace_and_strips_thousands():
+    text = "02/01/2024   CARD   PAYMENT     1,250.00    10,000.50\n\n   \nPage 1 of 3\n"
+    assert compact_ocr_text(text) == "02/01/2024\tCARD\tPAYMENT\t1250.00\t10000.50"
+
+
+def test_count_tokens_is_positive():
+    assert count_tokens("hello world") > 0
+    assert count_tokens("") == 0
+
+
+def test_compact_csv_drops_repeated_header_rows_only():
+    csv_text = (
+        "Account Name,ACME,,,\n"
+        "Date,Description,Debit,Credit,Balance\n"
+        "2024-01-02,CARD,10.00,,90.00\n"
+        ",POS REF 1,,,\n"
+        "Date,Description,Debit,Credit,Balance\n"
+        "2024-01-03,CARD,10.00,,80.00\n"
+        ",POS REF 1,,,\n"
+    )
+    assert compact_csv_text(csv_text) == (
+        "Account Name,ACME\n"
+        "Date,Description,Debit,Credit,Balance\n"
+        "2024-01-02,CARD,10,,90\n"
+        ",POS REF 1\n"
+        "2024-01-03,CARD,10,,80\n"
+        ",POS REF 1\n"
+    )
+
+
+def test_compact_ocr_drops_page_headers_but_keeps_repeated_content():
+    page1 = ("ACME TRADING LLC\nStatement of account\nDate  Description  Debit  Credit  Balance\n"
+             "02/01/2024\nCARD PAYMENT  10.00  90.00\nPOS REF 1\n"
+             "02/01/2024\nCARD PAYMENT  10.00  80.00\nPOS REF 1")
+    page2 = ("ACME TRADING LLC\nStatement of account\nDate  Description  Debit  Credit  Balance\n"
+             "03/01/2024\nFEE  1.00  79.00\nPOS REF 1")
+    lines = compact_ocr_text(page1 + "\n\n" + page2).split("\n")
+    assert lines.count("ACME TRADING LLC") == 1
+    assert lines.count("Date\tDescription\tDebit\tCredit\tBalance") == 1
+    assert lines.count("02/01/2024") == 2
+    assert lines.count("POS REF 1") == 3
+    assert lines[-3:] == ["03/01/2024", "FEE\t1.00\t79.00", "POS REF 1"]
@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import pytest
+from api.jobs import JobContext, JobCancelled, cleanup_jobs, read_partial_rows, DONE, RUNNING, CANCEL_FILE
+
+
+def _job(jobs_dir, job_id, age_hours, **fields):
+    work_dir = jobs_dir / job_id
+    work_dir.mkdir()
+    (work_dir / "input1.xlsx").write_bytes(b"statement")
+    updated = time.time() - age_hours * 3600
+    (work_dir / "status.json").write_text(json.dumps(dict(fields, updated=updated)))
+    for path in (work_dir / "input1.xlsx", work_dir / "status.json", work_dir):
+        os.utime(path, (updated, updated))
+    return work_dir
+
+
+def test_cleanup_jobs_removes_only_expired(tmp_path):
+    old = _job(tmp_path, "old", 30, state=DONE)
+    fresh = _job(tmp_path, "fresh", 1, state=DONE)
+    stale = _job(tmp_path, "stale", 48, state=RUNNING)
+    active = _job(tmp_path, "active", 48, state=RUNNING)
+
+    removed = cleanup_jobs(str(tmp_path), 24, keep={"active"})
+    assert sorted(removed) == ["old", "stale"]
+    assert not old.exists() and not stale.exists()
+    assert fresh.exists() and active.exists()
+
+
+def test_saved_output_keeps_the_job(tmp_path):
+    edited = _job(tmp_path, "edited", 30, state=DONE)
+    # The editor saved the workbook back an hour ago
+    (edited / "statement.xlsx").write_bytes(b"edited")
+    os.utime(edited / "statement.xlsx", (time.time() - 3600, time.time() - 3600))
+    assert cleanup_jobs(str(tmp_path), 24) == []
+    assert edited.exists()
+
+
+def test_cleanup_jobs_disabled(tmp_path):
+    _job(tmp_path, "old", 30, state=DONE)
+    assert cleanup_jobs(str(tmp_path), 0) == []
+    assert cleanup_jobs(str(tmp_path / "missing"), 24) == []
+    assert os.listdir(tmp_path) == ["old"]
+
+
+def test_discarded_chunk_keeps_other_chunks_rows(tmp_path):
+    ctx = JobContext("job", str(tmp_path))
+    ctx.stream_rows([{"n": 1}], chunk=1)
+    ctx.stream_rows([{"n": 0}], chunk=0)
+    ctx.stream_rows([{"n": 2}], chunk=1)
+    ctx.stream_rows(None, chunk=1)
+    assert read_partial_rows(str(tmp_path)) == [{"n": 0}]
+
+    ctx.stream_rows([{"n": 3}], chunk=1)
+    assert read_partial_rows(str(tmp_path)) == [{"n": 0}, {"n": 3}]
+
+
+def test_streamed_rows_stop_a_cancelled_job(tmp_path):
+    ctx = JobContext("job", str(tmp_path))
+    ctx.stream_rows([{"n": 0}])
+    (tmp_path / CANCEL_FILE).write_text("")
+    with pytest.raises(JobCancelled):
+        ctx.stream_rows([{"n": 1}])
+    assert read_partial_rows(str(tmp_path)) == [{"n": 0}]
@@ -0,0 +1,40 @@
+import os
+from api.ocr import llm_client
+from api.ocr.utils import llm_cache
+from api.ocr.utils.llm_cache import cache_key
+
+
+def test_key_ignores_whitespace_differences():
+    assert cache_key("prompt", "gpt-4o", "a  \r\nb\n") == cache_key(" prompt", "gpt-4o", "a\nb")
+
+
+def test_key_depends_on_provider_and_base_url(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setitem(llm_client.config, "llm_base_url", None)
+    openai = cache_key("prompt", "gpt-4o", "text")
+
+    monkeypatch.setitem(llm_client.config, "llm_base_url", "http://localhost:8000/v1")
+    local = cache_key("prompt", "gpt-4o", "text")
+
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    fake = cache_key("prompt", "gpt-4o", "text")
+    assert len({openai, local, fake}) == 3
+
+
+def test_writes_scan_the_directory_only_when_due(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(llm_cache, "_cache_bytes", None)
+    monkeypatch.setattr(llm_cache, "_writes_since_scan", 0)
+    scans = []
+    evict = llm_cache.evict
+    monkeypatch.setattr(llm_cache, "evict", lambda max_bytes=None: scans.append(1) or evict(max_bytes))
+
+    for index in range(llm_cache.EVICT_EVERY + 1):
+        llm_cache.put(f"key{index}", {"transactions": []})
+    # The first write measures the directory, then one scan per EVICT_EVERY writes
+    assert len(scans) == 2
+
+    monkeypatch.setitem(llm_cache.config, "llm_cache_max_mb", 0)
+    llm_cache.put("over", {"transactions": []})
+    assert len(scans) == 3
+    assert os.listdir(tmp_path) == []
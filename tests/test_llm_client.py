@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from api.ocr import llm_client
+
+
+@pytest.fixture(autouse=True)
+def fake_provider(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+
+
+def test_async_client_needs_a_scope():
+    with pytest.raises(RuntimeError):
+        llm_client.async_client()
+
+
+def test_each_event_loop_gets_its_own_client():
+    async def current():
+        return llm_client.async_client()
+
+    first = asyncio.run(llm_client.with_async_client(current()))
+    second = asyncio.run(llm_client.with_async_client(current()))
+    assert first is not second
+
+
+def test_scope_is_shared_by_tasks_and_nested_scopes():
+    async def current():
+        return llm_client.async_client()
+
+    async def main():
+        async with llm_client.async_client_scope() as client:
+            async with llm_client.async_client_scope() as nested:
+                assert nested is client
+            tasks = await asyncio.gather(current(), asyncio.create_task(current()))
+            return client, tasks
+
+    client, tasks = asyncio.run(main())
+    assert tasks == [client, client]
@@ -0,0 +1,58 @@
+import pytest
+from api.ocr.utils import llm_cache, llm_parse
+
+ROW = {"date": "2024-01-02", "description": "Coffee", "debit": 3.5, "credit": 0.0, "balance": 96.5}
+COLUMNAR = {"Account": "A", "Ledger": "B", "opening_balance": 100.0, "closing_balance": 96.5,
+            "columns": ["date", "description", "debit", "credit", "balance"],
+            "rows": [["2024-01-02", "Coffee", 3.5, 0.0, 96.5]]}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setitem(llm_parse.config, "llm_output_format", "columnar")
+
+
+class Preview:
+    """on_rows recording calls the way JobContext.stream_rows receives them"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows, chunk=0):
+        self.calls.append((chunk, rows))
+
+
+def _fake_request(responses):
+    calls = []
+
+    def request(prompt, text, on_rows=None, columnar=False):
+        calls.append(columnar)
+        response = responses[columnar]
+        if on_rows is not None:
+            on_rows([ROW])
+        return response
+    return request, calls
+
+
+def test_cache_hit_still_sends_rows(monkeypatch):
+    request, calls = _fake_request({True: COLUMNAR})
+    monkeypatch.setattr(llm_parse, "request", request)
+
+    first, second = Preview(), Preview()
+    llm_parse.parse_statement("statement", "system", "columnar", "csv", llm_parse.for_chunk(first, 2))
+    parsed = llm_parse.parse_statement("statement", "system", "columnar", "csv", llm_parse.for_chunk(second, 2))
+    assert calls == [True]
+    assert parsed["transactions"] == [ROW]
+    assert second.calls == [(2, [ROW])]
+
+
+def test_rejected_columnar_reply_discards_only_its_chunk(monkeypatch):
+    request, calls = _fake_request({True: {"columns": ["date"], "rows": []},
+                                    False: dict(COLUMNAR, transactions=[ROW])})
+    monkeypatch.setattr(llm_parse, "request", request)
+
+    preview = Preview()
+    llm_parse.parse_statement("statement", "system", "columnar", "ocr", llm_parse.for_chunk(preview, 1))
+    assert calls == [True, False]
+    assert preview.calls == [(1, [ROW]), (1, None), (1, [ROW])]
@@ -0,0 +1,46 @@
+import pytest
+from api.ocr.utils.llm_schema import columnar_prompt, decode_columnar, row_to_transaction, COLUMNS
+
+
+def test_columnar_prompt_mentions_schema():
+    prompt = columnar_prompt("  Parse this.  ")
+    assert prompt.startswith("Parse this.\n")
+    assert '"columns"' in prompt
+
+
+def test_decode_columnar():
+    payload = {
+        "Account": "ACME", "Ledger": "ENBD", "opening_balance": 100.0, "closing_balance": 87.5,
+        "columns": ["Date", "Description", "Debit", "Credit", "Balance"],
+        "rows": [["2024-01-01", "Card", "12.50", 0, 87.5], ["2024-01-02", None, "", "1,000.00", None]],
+    }
+    parsed = decode_columnar(payload)
+    assert parsed["Account"] == "ACME"
+    assert parsed["closing_balance"] == 87.5
+    assert parsed["transactions"] == [
+        {"date": "2024-01-01", "description": "Card", "debit": 12.5, "credit": 0.0, "balance": 87.5},
+        {"date": "2024-01-02", "description": "", "debit": 0.0, "credit": 1000.0, "balance": None},
+    ]
+
+
+def test_decode_columnar_without_balance_column():
+    payload = {"columns": ["date", "description", "debit", "credit"], "rows": [["2024-01-01", "x", 1, 0]]}
+    assert decode_columnar(payload)["transactions"][0]["balance"] is None
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"rows": []},
+    {"columns": ["date", "description", "debit"], "rows": []},
+    {"columns": COLUMNS, "rows": [["2024-01-01", "x", 1, 0]]},
+    {"columns": COLUMNS, "rows": [["2024-01-01", "x", "abc", 0, 1]]},
+])
+def test_decode_columnar_rejects_bad_responses(payload):
+    with pytest.raises(ValueError):
+        decode_columnar(payload)
+
+
+def test_row_to_transaction_nan_amount_uses_default():
+    row = row_to_transaction(COLUMNS, ["2024-01-01", "x", float("nan"), 2, float("nan")])
+    assert row["debit"] == 0.0
+    assert row["balance"] is None
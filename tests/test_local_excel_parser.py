@@ -0,0 +1,134 @@
+import datetime
+import pandas as pd
+from api.ocr.local_excel_parser import (
+    sniff_header, parse_amounts, parse_dates, parse_excel_locally, balance_chain_score
+)
+
+
+def _sheet(rows):
+    return pd.DataFrame(rows)
+
+
+def _statement():
+    return _sheet([
+        ["Account Name", "ACME TRADING LLC", None, None, None],
+        ["Bank Name", "Emirates NBD", None, None, None],
+        [None, None, None, None, None],
+        ["Date", "Description", "Withdrawal", "Deposit", "Balance"],
+        [None, "Opening Balance", None, None, 1000.0],
+        [datetime.datetime(2024, 1, 2), "CARD PAYMENT", 100.0, None, 900.0],
+        [None, "POS REF 1", None, None, None],
+        [datetime.datetime(2024, 1, 3), "SALARY", None, 500.0, 1400.0],
+        [datetime.datetime(2024, 1, 5), "ATM", 400.0, None, 1000.0],
+        [None, "Closing Balance", None, None, 1000.0],
+    ])
+
+
+def test_sniff_header():
+    row, mapping = sniff_header(_statement())
+    assert row == 3
+    assert mapping == {0: "date", 1: "description", 2: "debit", 3: "credit", 4: "balance"}
+
+
+def test_sniff_header_needs_date_and_amounts():
+    assert sniff_header(_sheet([["Date", "Description"], ["2024-01-01", "x"]])) == (None, {})
+
+
+def test_parse_amounts():
+    values = parse_amounts(pd.Series(["1,234.50", "(20.00)", "AED 5", "30.00 DR", "15.00 CR", None, "abc"]))
+    assert values.tolist()[:5] == [1234.5, -20.0, 5.0, -30.0, 15.0]
+    assert values.iloc[5:].isna().all()
+
+
+def test_parse_dates_prefers_the_reading_that_parses_and_orders():
+    parsed = parse_dates(pd.Series(["01/02/2024", "15/02/2024", "28/02/2024"]))
+    assert parsed.dt.month.tolist() == [2, 2, 2]
+    parsed = parse_dates(pd.Series(["01/02/2024", "01/15/2024"]), dayfirst=False)
+    assert parsed.dt.day.tolist() == [2, 15]
+
+
+def test_parse_excel_locally():
+    parsed, confidence = parse_excel_locally(_statement())
+    assert confidence == 1.0
+    assert parsed["Account"] == "ACME TRADING LLC"
+    assert parsed["Ledger"] == "Emirates NBD"
+    assert parsed["opening_balance"] == 1000.0
+    assert parsed["closing_balance"] == 1000.0
+    transactions = parsed["transactions"]
+    assert len(transactions) == 3
+    assert transactions[0]["description"] == "CARD PAYMENT POS REF 1"
+    assert (transactions[0]["debit"], transactions[0]["credit"]) == (100.0, 0.0)
+    assert (transactions[1]["debit"], transactions[1]["credit"]) == (0.0, 500.0)
+    # Same value types as an LLM parse
+    assert transactions[0] == {"date": "2024-01-02", "description": "CARD PAYMENT POS REF 1",
+                               "debit": 100.0, "credit": 0.0, "balance": 900.0}
+
+
+def test_parse_excel_locally_signed_amount_column():
+    raw = _sheet([
+        ["Date", "Details", "Amount", "Balance"],
+        ["2024-01-02", "Fee", "-10.00", "90.00"],
+        ["2024-01-03", "Refund", "5.00", "95.00"],
+    ])
+    parsed, confidence = parse_excel_locally(raw)
+    assert confidence == 1.0
+    assert [(t["debit"], t["credit"]) for t in parsed["transactions"]] == [(10.0, 0.0), (0.0, 5.0)]
+    # Derived from the first row when the sheet has no opening balance
+    assert parsed["opening_balance"] == 100.0
+
+
+def test_parse_excel_locally_low_confidence_when_chain_breaks():
+    raw = _sheet([
+        ["Date", "Description", "Debit", "Credit", "Balance"],
+        ["2024-01-02", "a", 10, None, 90],
+        ["2024-01-03", "b", 10, None, 10],
+        ["2024-01-04", "c", 10, None, 500],
+    ])
+    _, confidence = parse_excel_locally(raw)
+    assert confidence < 0.95
+
+
+def test_parse_excel_locally_without_header():
+    assert parse_excel_locally(_sheet([["foo", "bar"], [1, 2]])) == (None, 0.0)
+
+
+def test_balance_chain_score_accepts_newest_first():
+    df = pd.DataFrame({"debit": [10.0, 10.0, 0.0], "credit": [0.0, 0.0, 0.0], "balance": [80.0, 90.0, 100.0]})
+    assert balance_chain_score(df, 0.0) == 1.0
+
+
+def test_parse_excel_locally_text_preamble_balances():
+    raw = _sheet([
+        ["Opening Balance:", "AED 1,000.00", None, None, None],
+        ["Closing Balance", "1400", None, None, None],
+        ["Date", "Description", "Debit", "Credit", "Balance"],
+        ["2024-01-02", "CARD", "100.00", None, "900.00"],
+        ["2024-01-03", "SALARY", None, "500.00", "1,400.00"],
+    ])
+    parsed, confidence = parse_excel_locally(raw)
+    assert confidence == 1.0
+    assert parsed["opening_balance"] == 1000.0
+    assert parsed["closing_balance"] == 1400.0
+
+
+def test_parse_excel_locally_unparseable_preamble_balance():
+    raw = _sheet([
+        ["Opening Balance", "see attached", None, None, None],
+        ["Date", "Description", "Debit", "Credit", "Balance"],
+        ["2024-01-02", "CARD", "100.00", None, "900.00"],
+        ["2024-01-03", "SALARY", None, "500.00", "1,400.00"],
+    ])
+    parsed, _ = parse_excel_locally(raw)
+    # Falls back to the first row's balance
+    assert parsed["opening_balance"] == 1000.0
+
+
+def test_parse_excel_locally_missing_balances_are_none():
+    raw = _sheet([
+        ["Date", "Description", "Debit", "Credit", "Balance"],
+        ["2024-01-02", "a", 10, None, 90],
+        ["2024-01-03", "b", 10, None, None],
+    ])
+    parsed, _ = parse_excel_locally(raw)
+    assert [t["balance"] for t in parsed["transactions"]] == [90.0, None]
+    assert all(type(t["debit"]) is float for t in parsed["transactions"])
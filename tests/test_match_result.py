@@ -0,0 +1,81 @@
+import numpy as np
+from api.reconciler.match_result import (
+    MatchResult, MATCHED, FUZZY, SPLIT, RETURNED, ROUNDING, UNMATCHED, NO_GROUP
+)
+
+
+def _result():
+    result = MatchResult(4, 3)
+    result.add_pair(0, 1, MATCHED)
+    group = result.new_group()
+    result.add_pair(1, 0, SPLIT, group)
+    result.add_pair(2, 0, SPLIT, group)
+    result.add_pair(3, 2, ROUNDING, amount1=10.0, amount2=10.01)
+    result.balances = {"opening1": 100.0, "closing1": 90.5}
+    return result
+
+
+def test_pairs_and_categories():
+    result = _result()
+    assert result.category1.tolist() == [MATCHED, SPLIT, SPLIT, ROUNDING]
+    assert result.category2.tolist() == [SPLIT, MATCHED, ROUNDING]
+    assert result.pair_row1.tolist() == [0, 1, 2, 3]
+    assert result.pair_row2.tolist() == [1, 0, 0, 2]
+    assert result.group1.tolist() == [NO_GROUP, 0, 0, NO_GROUP]
+    assert result.rows(1, SPLIT).tolist() == [1, 2]
+    assert result.sheet_rows(2, MATCHED, 5) == [6]
+
+
+def test_mark_rows_and_counts():
+    result = MatchResult(3, 1)
+    group = result.new_group()
+    result.mark_rows(1, [0, 2], RETURNED, group)
+    assert result.category1.tolist() == [RETURNED, UNMATCHED, RETURNED]
+    assert result.group1.tolist() == [group, NO_GROUP, group]
+    counts = result.counts(1)
+    assert counts["returned"] == 2
+    assert counts["unmatched"] == 1
+    assert result.summary()["pairs"] == 0
+
+
+def test_remarks_include_rounding_amounts():
+    remarks = _result().remarks(1)
+    assert remarks[0] == "Matched"
+    assert remarks[3] == "Rounding Error: 10.00 vs 10.01"
+
+
+def test_invalid_side():
+    try:
+        MatchResult(1, 1).rows(3, MATCHED)
+    except ValueError:
+        return
+    raise AssertionError("side 3 should be rejected")
+
+
+def test_save_load_round_trip(tmp_path):
+    result = _result()
+    path = tmp_path / "result.npz"
+    result.save(path)
+    loaded = MatchResult.load(path)
+
+    for name, array in result.to_arrays().items():
+        np.testing.assert_array_equal(loaded.to_arrays()[name], array)
+    assert loaded.balances == result.balances
+    assert loaded.summary() == result.summary()
+    assert loaded.remarks(1) == result.remarks(1)
+    # Group ids keep counting from where the saved result left off
+    assert loaded.new_group() == result.new_group()
+
+
+def test_save_load_empty(tmp_path):
+    path = tmp_path / "empty.npz"
+    MatchResult(0, 0).save(path)
+    loaded = MatchResult.load(path)
+    assert len(loaded.pair_row1) == 0
+    assert loaded.counts(1)["unmatched"] == 0
+
+
+def test_fuzzy_label():
+    result = MatchResult(1, 1)
+    result.add_pair(0, 0, FUZZY)
+    assert result.remarks(2) == ["Matched but check date"]
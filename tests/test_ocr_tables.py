@@ -0,0 +1,39 @@
+from api.ocr.ocr_tables import parse_pages, merge_cells
+
+
+def _line(y, cells):
+    """One line of (left, bottom, right, top, text) runs at height y"""
+    return [(left, y, left + 6 * len(text), y + 10, text) for left, text in cells]
+
+
+def _page():
+    rows = [("02/01/2024", "CARD PAYMENT", "100.00", "", "900.00"),
+            ("03/01/2024", "SALARY", "", "500.00", "1,400.00"),
+            ("05/01/2024", "ATM", "400.00", "", "1,000.00")]
+    lines = [_line(800, [(40, "Account Name: ACME LLC")]),
+             _line(780, [(40, "Date"), (110, "Description"), (360, "Withdrawal"), (430, "Deposit"), (500, "Balance")]),
+             _line(765, [(110, "Opening Balance"), (500, "1,000.00")])]
+    for number, (date, description, debit, credit, balance) in enumerate(rows):
+        cells = [(40, date), (110, description), (360, debit), (430, credit), (500, balance)]
+        lines.append(_line(750 - 15 * number, [cell for cell in cells if cell[1]]))
+    return lines
+
+
+def test_merge_cells_joins_close_words():
+    line = [(0, 0, 20, 10, "CARD"), (24, 0, 60, 10, "PAYMENT"), (200, 0, 230, 10, "1.00")]
+    assert [run[4] for run in merge_cells(line)] == ["CARD PAYMENT", "1.00"]
+
+
+def test_parse_pages_rebuilds_the_table():
+    parsed, confidence, layout = parse_pages([_page()])
+    assert layout is not None
+    assert confidence == 1.0
+    assert parsed["Account"] == "ACME LLC"
+    assert parsed["opening_balance"] == 1000.0
+    assert parsed["transactions"][0] == {"date": "2024-01-02", "description": "CARD PAYMENT",
+                                         "debit": 100.0, "credit": 0.0, "balance": 900.0}
+    assert [t["credit"] for t in parsed["transactions"]] == [0.0, 500.0, 0.0]
+
+
+def test_parse_pages_without_header():
+    assert parse_pages([[_line(800, [(40, "hello")])]]) == (None, 0.0, None)
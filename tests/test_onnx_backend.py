@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+import pytest
+from api.ocr.onnx_backend import is_ctc_recognizer, to_onnx_predictor
+
+
+class CTCPostProcessor:
+    pass
+
+
+class PARSeqPostProcessor:
+    pass
+
+
+def _predictor(postprocessor):
+    return SimpleNamespace(det_predictor=SimpleNamespace(model=object()),
+                           reco_predictor=SimpleNamespace(model=SimpleNamespace(postprocessor=postprocessor)))
+
+
+def test_only_ctc_recognizers_are_supported():
+    assert is_ctc_recognizer(SimpleNamespace(postprocessor=CTCPostProcessor()))
+    assert not is_ctc_recognizer(SimpleNamespace(postprocessor=PARSeqPostProcessor()))
+
+
+def test_non_ctc_recognizer_is_refused():
+    with pytest.raises(ValueError):
+        to_onnx_predictor(_predictor(PARSeqPostProcessor()))
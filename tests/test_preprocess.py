@@ -0,0 +1,14 @@
+import numpy as np
+from api.ocr.utils.preprocess import downscale
+
+
+def test_downscale_limits_long_side():
+    image = np.zeros((300, 600, 3), dtype=np.uint8)
+    assert downscale(image, 200).shape[:2] == (100, 200)
+    assert downscale(image, 1000) is image
+
+
+def test_downscale_without_limit():
+    image = np.zeros((300, 600, 3), dtype=np.uint8)
+    assert downscale(image, None) is image
+    assert downscale(image, 0) is image
@@ -0,0 +1,34 @@
+import json
+import numpy as np
+from tornado.testing import AsyncHTTPTestCase
+from api.service import make_app
+from api.jobs import DONE
+
+JOB_ID = "0" * 32
+
+
+class FakeRunner:
+    def status(self, job_id):
+        if job_id != JOB_ID:
+            return None
+        return {"state": DONE, "result": {"transactions": np.int64(3)}, "traceback": "..."}
+
+    def files(self, job_id):
+        return ["statement.xlsx"]
+
+
+class JobStatusTest(AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(FakeRunner(), max_queued=1)
+
+    def test_status_is_json(self):
+        response = self.fetch(f"/jobs/{JOB_ID}")
+        assert response.code == 200
+        assert response.headers["Content-Type"].startswith("application/json")
+        status = json.loads(response.body)
+        assert status["result"] == {"transactions": "3"}
+        assert status["files"] == [f"/jobs/{JOB_ID}/files/statement.xlsx"]
+        assert "traceback" not in status
+
+    def test_unknown_job(self):
+        assert self.fetch(f"/jobs/{'1' * 32}").code == 404
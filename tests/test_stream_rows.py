@@ -0,0 +1,50 @@
+import json
+from api.ocr.utils.stream_rows import JsonArrayStream, TransactionStream
+
+
+def _pieces(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _feed_all(stream, text):
+    rows = []
+    for piece in _pieces(text):
+        rows.extend(stream.feed(piece))
+    return rows
+
+
+def test_json_array_stream_handles_brackets_in_strings():
+    payload = json.dumps({"other": [1], "items": [[1, "a ] b"], {"x": "}"}, "s\"q"]})
+    stream = JsonArrayStream("items")
+    assert _feed_all(stream, payload) == [[1, "a ] b"], {"x": "}"}, 's"q']
+    assert stream.done
+
+
+def test_transaction_stream_columnar():
+    payload = json.dumps({
+        "Account": "ACME",
+        "columns": ["date", "description", "debit", "credit", "balance"],
+        "rows": [["2024-01-01", "Card [POS]", 10, 0, 90], ["2024-01-02", "Salary", 0, 100, 190]],
+    })
+    rows = _feed_all(TransactionStream(columnar=True), payload)
+    assert [row["description"] for row in rows] == ["Card [POS]", "Salary"]
+    assert rows[1]["credit"] == 100.0
+
+
+def test_transaction_stream_uses_streamed_column_order():
+    payload = json.dumps({"columns": ["date", "debit", "credit", "balance", "description"],
+                          "rows": [["2024-01-01", 5, 0, 95, "Fee"]]})
+    assert _feed_all(TransactionStream(columnar=True), payload)[0]["description"] == "Fee"
+
+
+def test_transaction_stream_skips_malformed_rows():
+    payload = json.dumps({"columns": ["date", "description", "debit", "credit", "balance"],
+                          "rows": [["2024-01-01", "short"], ["2024-01-02", "ok", 1, 0, 9]]})
+    rows = _feed_all(TransactionStream(columnar=True), payload)
+    assert [row["description"] for row in rows] == ["ok"]
+
+
+def test_transaction_stream_verbose():
+    transactions = [{"date": "2024-01-01", "description": "a", "debit": 1, "credit": 0, "balance": 9}]
+    payload = json.dumps({"transactions": transactions, "closing_balance": 9})
+    assert _feed_all(TransactionStream(columnar=False), payload) == transactions